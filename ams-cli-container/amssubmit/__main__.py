@@ -0,0 +1,109 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+"""Lint and submit many AMS RFCs concurrently: python -m amssubmit MANIFEST
+
+The manifest lists the RFCs, a JSON list or one JSON object per line with the
+template, change type, title and execution parameters of each. One result is
+written per line as each RFC finishes, and a summary on stderr. Exits with 1
+on errors and 2 when any RFC fails its lint or does not succeed.
+"""
+
+import argparse
+import os
+import sys
+
+from amssubmit import api, pipeline, sigv4
+from amssubmit.connection import ConnectionPool
+
+DEFAULT_LINT_URL = "http://127.0.0.1:8765"
+
+# Stack from CloudFormation Template | Create, the change type ingesting templates
+DEFAULT_CHANGE_TYPE_ID = "ct-36cn2avfrrj9v"
+DEFAULT_CHANGE_TYPE_VERSION = "2.0"
+
+
+def add_arguments(parser):
+    parser.add_argument("manifest", help="RFCs to submit, JSON list or JSON lines")
+    parser.add_argument(
+        "--region",
+        default=os.environ.get("AWS_REGION") or os.environ.get("AWS_DEFAULT_REGION") or "us-east-1",
+    )
+    parser.add_argument("--profile", default=None, help="AWS CLI profile of the credentials")
+    parser.add_argument(
+        "--endpoint-url", default=None, help="amscm endpoint, e.g. the stub's http://127.0.0.1:8780"
+    )
+    parser.add_argument("--model-dir", default=None, help="directory of the amscm service model")
+    parser.add_argument("--change-type-id", default=DEFAULT_CHANGE_TYPE_ID)
+    parser.add_argument("--change-type-version", default=DEFAULT_CHANGE_TYPE_VERSION)
+    parser.add_argument(
+        "--template-parameter",
+        default="CloudFormationTemplate",
+        help="execution parameter receiving the template",
+    )
+    parser.add_argument("--concurrency", type=int, default=50, help="RFCs in flight at a time")
+    parser.add_argument("--connections", type=int, default=10, help="connections per endpoint")
+    parser.add_argument("--rate", type=float, default=5.0, help="API calls per second at most")
+    parser.add_argument("--poll-interval", type=float, default=30.0, help="seconds between GetRfc")
+    parser.add_argument(
+        "--timeout", type=float, default=None, help="stop following an RFC after this many seconds"
+    )
+    parser.add_argument("--request-timeout", type=float, default=60.0)
+    parser.add_argument(
+        "--no-wait", action="store_false", dest="wait", help="stop once the RFCs are submitted"
+    )
+    parser.add_argument("--dry-run", action="store_true", help="only lint the templates")
+    parser.add_argument("--lint-url", default=DEFAULT_LINT_URL, help="AMS lint server")
+    parser.add_argument("--lint-socket", default=None, help="AMS lint server Unix socket")
+    parser.add_argument("--skip-lint", action="store_true", help="submit without linting")
+    parser.add_argument("--output", default=None, help="write results to this file")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="amssubmit", description=__doc__.splitlines()[0])
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    if args.skip_lint:
+        args.lint_url = args.lint_socket = None
+    args.defaults = {
+        "change_type_id": args.change_type_id,
+        "change_type_version": args.change_type_version,
+        "template_parameter": args.template_parameter,
+    }
+
+    try:
+        entries = pipeline.load_manifest(args.manifest)
+    except (OSError, pipeline.ManifestError) as err:
+        sys.stderr.write("amssubmit: {0}\n".format(err))
+        return 1
+
+    metadata = api.load_service_metadata(args.model_dir)
+    endpoint_url = args.endpoint_url or "https://{0}.{1}.amazonaws.com".format(
+        metadata["endpointPrefix"], args.region
+    )
+    credentials = sigv4.CredentialsProvider(args.profile)
+    if not args.dry_run:
+        try:
+            credentials.get()
+        except sigv4.CredentialsError as err:
+            sys.stderr.write("amssubmit: {0}\n".format(err))
+            return 1
+
+    def client_factory():
+        return api.ChangeManagementClient(
+            ConnectionPool(endpoint_url, args.connections, args.request_timeout),
+            credentials,
+            args.region,
+            api.RateLimiter(args.rate),
+            metadata,
+        )
+
+    if args.output:
+        with open(args.output, "w") as out:
+            return pipeline.run(entries, client_factory, args, out)
+    return pipeline.run(entries, client_factory, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,199 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+"""Client of the AMS change management (amscm) API
+
+The endpoint prefix, JSON target prefix and signing name are read from the
+amscm service model the container copies to ~/.aws/models, so the client
+follows the model the AWS CLI uses. Every call goes through one shared rate
+limiter, which slows down when the API throttles and speeds up again as
+calls succeed, and retries throttled or failed calls with backoff.
+"""
+
+import asyncio
+import glob
+import json
+import os
+import random
+import time
+
+from amssubmit import sigv4
+
+MODEL_DIRS = ("~/.aws/models/amscm", "/root/.aws/models/amscm")
+
+# Used when no service model is found, e.g. against the local stub endpoint
+DEFAULT_METADATA = {
+    "endpointPrefix": "amscm",
+    "jsonVersion": "1.1",
+    "signingName": "amscm",
+    "targetPrefix": "AWSManagedServicesCMService",
+}
+
+# RFC statuses after which nothing changes any more
+TERMINAL_STATUSES = ("Success", "Failure", "Rejected", "Canceled")
+
+THROTTLING_ERRORS = (
+    "ThrottlingException",
+    "Throttling",
+    "TooManyRequestsException",
+    "RequestLimitExceeded",
+)
+
+
+class ApiError(Exception):
+    def __init__(self, code, message, status=None):
+        Exception.__init__(self, "{0}: {1}".format(code, message))
+        self.code = code
+        self.message = message
+        self.status = status
+
+    @property
+    def throttled(self):
+        return self.code in THROTTLING_ERRORS or self.status == 429
+
+    @property
+    def retryable(self):
+        return self.throttled or (self.status or 0) >= 500
+
+
+def load_service_metadata(model_dir=None):
+    """metadata of the newest amscm service model found, DEFAULT_METADATA otherwise"""
+
+    directories = [model_dir] if model_dir else MODEL_DIRS
+    for directory in directories:
+        pattern = os.path.join(os.path.expanduser(directory), "*", "service-2.json")
+        models = sorted(glob.glob(pattern))
+        if models:
+            with open(models[-1]) as model_file:
+                return dict(DEFAULT_METADATA, **json.load(model_file).get("metadata", {}))
+    return dict(DEFAULT_METADATA)
+
+
+class RateLimiter(object):
+    """Token bucket shared by all calls, with a rate that adapts to throttling
+
+    The rate is halved whenever the API throttles, down to min_rate, and
+    grows back by a tenth of a call per second on each success up to rate.
+    """
+
+    def __init__(self, rate, min_rate=0.5):
+        self.max_rate = float(rate)
+        self.min_rate = min(float(min_rate), self.max_rate)
+        self.rate = self.max_rate
+        self.tokens = 1.0
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                refill = (now - self.updated) * self.rate
+                self.tokens = min(max(self.rate, 1.0), self.tokens + refill)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def throttled(self):
+        self.rate = max(self.min_rate, self.rate / 2)
+
+    def succeeded(self):
+        self.rate = min(self.max_rate, self.rate + 0.1)
+
+
+def backoff(attempt, base=0.5, cap=30.0):
+    """Seconds to wait before retry number attempt, exponential with full jitter"""
+
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class ChangeManagementClient(object):
+    """JSON calls to the amscm API through a connection pool"""
+
+    def __init__(self, pool, credentials, region, limiter, metadata=None, max_attempts=8):
+        self.pool = pool
+        self.credentials = credentials
+        self.region = region
+        self.limiter = limiter
+        self.metadata = metadata or dict(DEFAULT_METADATA)
+        self.max_attempts = max_attempts
+        # Operation -> calls, and retries of any call, for the summary
+        self.calls = {}
+        self.retries = 0
+
+    async def call(self, operation, params, idempotent=True):
+        """Call an operation with params, returns the decoded response
+
+        Calls that are not idempotent are only retried when throttled, as the
+        API may have acted on a call whose response was lost.
+        """
+
+        body = json.dumps(params).encode("utf-8")
+        target = "{0}.{1}".format(self.metadata["targetPrefix"], operation)
+        self.calls[operation] = self.calls.get(operation, 0) + 1
+
+        for attempt in range(self.max_attempts):
+            await self.limiter.acquire()
+            headers = sigv4.sign(
+                "POST",
+                self.pool.netloc,
+                self.pool.base_path + "/",
+                {
+                    "Content-Type": "application/x-amz-json-{0}".format(
+                        self.metadata["jsonVersion"]
+                    ),
+                    "X-Amz-Target": target,
+                },
+                body,
+                self.credentials.get(),
+                self.region,
+                self.metadata.get("signingName") or self.metadata["endpointPrefix"],
+            )
+
+            retry_after = None
+            try:
+                response = await self.pool.request(
+                    "POST", "/", body, headers, idempotent=idempotent
+                )
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError) as err:
+                error = ApiError("ConnectionError", str(err) or type(err).__name__, 599)
+            else:
+                if response.status == 200:
+                    self.limiter.succeeded()
+                    return json.loads(response.body.decode("utf-8") or "{}")
+                error = parse_error(response)
+                retry_after = response.header("Retry-After")
+
+            retryable = error.retryable if idempotent else error.throttled
+            if not retryable or attempt == self.max_attempts - 1:
+                raise error
+            if error.throttled:
+                self.limiter.throttled()
+            self.retries += 1
+            delay = backoff(attempt)
+            if retry_after and retry_after.isdigit():
+                delay = max(delay, float(retry_after))
+            await asyncio.sleep(delay)
+
+    async def create_rfc(self, params):
+        return (await self.call("CreateRfc", params, idempotent=False))["RfcId"]
+
+    async def submit_rfc(self, rfc_id):
+        await self.call("SubmitRfc", {"RfcId": rfc_id})
+
+    async def get_rfc(self, rfc_id):
+        return (await self.call("GetRfc", {"RfcId": rfc_id}))["Rfc"]
+
+
+def parse_error(response):
+    try:
+        content = json.loads(response.body.decode("utf-8") or "{}")
+    except ValueError:
+        content = {}
+    code = content.get("__type") or response.header("X-Amzn-ErrorType") or "HttpError"
+    # "namespace#Code:details" -> "Code"
+    code = code.split("#")[-1].split(":")[0]
+    message = content.get("message") or content.get("Message") or response.reason
+    return ApiError(code, message, response.status)
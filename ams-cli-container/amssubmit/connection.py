@@ -0,0 +1,170 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+"""Keep-alive HTTP/1.1 connections over asyncio streams
+
+Only what the AMS API and the lint server need: requests with a body,
+responses with a Content-Length or chunked body, and a pool per host so the
+TCP and TLS handshakes are paid once per connection rather than per call.
+"""
+
+import asyncio
+import ssl
+from urllib.parse import urlsplit
+
+# Errors of a connection the server closed while it sat in the pool
+STALE_CONNECTION_ERRORS = (ConnectionError, asyncio.IncompleteReadError)
+# Seconds a connection may sit in the pool and still carry a request that is
+# not safe to resend, below the keep-alive timeout of common servers
+IDLE_TIMEOUT = 4
+
+
+class Response(object):
+    def __init__(self, status, reason, headers, body):
+        self.status = status
+        self.reason = reason
+        # Header names in lower case
+        self.headers = headers
+        self.body = body
+
+    def header(self, name, default=None):
+        return self.headers.get(name.lower(), default)
+
+
+class ConnectionPool(object):
+    """Connections to one server, at most size open and idle ones reused
+
+    url is the base URL of the server, socket_path a Unix socket to connect
+    to instead of its host and port. Create it inside the running event loop.
+    """
+
+    def __init__(self, url, size=10, timeout=60, socket_path=None, idle_timeout=IDLE_TIMEOUT):
+        parts = urlsplit(url)
+        self.secure = parts.scheme == "https"
+        self.host = parts.hostname or "localhost"
+        self.port = parts.port or (443 if self.secure else 80)
+        self.base_path = parts.path.rstrip("/")
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        # (reader, writer, loop time it was released)
+        self.idle = []
+        self.slots = asyncio.Semaphore(size)
+        self.ssl_context = ssl.create_default_context() if self.secure else None
+
+    @property
+    def netloc(self):
+        default_port = 443 if self.secure else 80
+        if self.port == default_port:
+            return self.host
+        return "{0}:{1}".format(self.host, self.port)
+
+    async def open(self):
+        if self.socket_path:
+            return await asyncio.open_unix_connection(self.socket_path)
+        return await asyncio.open_connection(
+            self.host,
+            self.port,
+            ssl=self.ssl_context,
+            server_hostname=self.host if self.secure else None,
+        )
+
+    async def request(self, method, path, body=b"", headers=None, idempotent=True):
+        """Send a request on a pooled connection and return the Response
+
+        An idempotent request failing on a reused connection, which the server
+        may have closed in the meantime, is sent once more on a new connection.
+        Others may have been carried out before the connection failed, so the
+        error is raised for the caller to decide; to make that unlikely they
+        are only sent on pooled connections idle for less than idle_timeout.
+        """
+
+        async with self.slots:
+            while True:
+                reused, reader, writer = await self.checkout(idempotent)
+                try:
+                    response = await asyncio.wait_for(
+                        self.exchange(reader, writer, method, path, body, headers or {}),
+                        self.timeout,
+                    )
+                except STALE_CONNECTION_ERRORS:
+                    writer.close()
+                    if reused and idempotent:
+                        continue
+                    raise
+                except BaseException:
+                    writer.close()
+                    raise
+
+                if response.header("Connection", "").lower() == "close":
+                    writer.close()
+                else:
+                    self.idle.append((reader, writer, asyncio.get_running_loop().time()))
+                return response
+
+    async def checkout(self, idempotent):
+        """Return (reused, reader, writer), closing pooled connections unfit for the request
+
+        Connections the server already closed are dropped, and for requests
+        that are not idempotent those idle long enough to be closed any moment.
+        """
+
+        now = asyncio.get_running_loop().time()
+        while self.idle:
+            reader, writer, released = self.idle.pop()
+            if reader.at_eof() or not idempotent and now - released >= self.idle_timeout:
+                writer.close()
+                continue
+            return True, reader, writer
+        reader, writer = await self.open()
+        return False, reader, writer
+
+    async def exchange(self, reader, writer, method, path, body, headers):
+        lines = ["{0} {1}{2} HTTP/1.1".format(method, self.base_path, path)]
+        headers = dict(headers)
+        headers.setdefault("Host", self.netloc)
+        headers["Content-Length"] = str(len(body))
+        lines.extend("{0}: {1}".format(name, value) for name, value in headers.items())
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+        status_line = (await reader.readline()).decode("latin-1")
+        if not status_line:
+            raise asyncio.IncompleteReadError(b"", None)
+        _, status, reason = (status_line.rstrip("\r\n").split(" ", 2) + [""])[:3]
+
+        response_headers = {}
+        while True:
+            line = (await reader.readline()).decode("latin-1").rstrip("\r\n")
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            response_headers[name.strip().lower()] = value.strip()
+
+        if response_headers.get("transfer-encoding", "").lower() == "chunked":
+            response_body = await read_chunked(reader)
+        elif "content-length" in response_headers:
+            response_body = await reader.readexactly(int(response_headers["content-length"]))
+        else:
+            # Body delimited by the server closing the connection
+            response_body = await reader.read()
+            response_headers["connection"] = "close"
+        return Response(int(status), reason, response_headers, response_body)
+
+    def close(self):
+        while self.idle:
+            _, writer, _ = self.idle.pop()
+            writer.close()
+
+
+async def read_chunked(reader):
+    chunks = []
+    while True:
+        size = int((await reader.readline()).split(b";", 1)[0].strip() or b"0", 16)
+        if size == 0:
+            # Trailers, up to the final empty line
+            while (await reader.readline()).strip():
+                pass
+            return b"".join(chunks)
+        chunks.append(await reader.readexactly(size))
+        await reader.readexactly(2)
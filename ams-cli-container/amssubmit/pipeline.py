@@ -0,0 +1,215 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+"""Lint, create, submit and follow many RFCs concurrently
+
+Each manifest entry goes through the AMS lint server, CreateRfc, SubmitRfc
+and GetRfc polling as one coroutine; up to `concurrency` entries are in
+flight at a time and all share the connection pools and the rate limiter.
+A result record is written as soon as its entry is done.
+"""
+
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from urllib.parse import quote
+
+from amssubmit.api import TERMINAL_STATUSES, ApiError
+from amssubmit.connection import ConnectionPool
+
+# Statuses counting as done well, everything else fails the run
+OK_STATUSES = ("Success", "Submitted", "Linted")
+
+
+class ManifestError(Exception):
+    pass
+
+
+def load_manifest(path):
+    """Entries of a manifest, a JSON list or one JSON object per line"""
+
+    with open(path, encoding="utf-8") as manifest_file:
+        text = manifest_file.read()
+    try:
+        entries = json.loads(text)
+    except ValueError:
+        try:
+            entries = [json.loads(line) for line in text.splitlines() if line.strip()]
+        except ValueError as err:
+            raise ManifestError("{0}: {1}".format(path, err))
+    if isinstance(entries, dict):
+        entries = [entries]
+
+    base = os.path.dirname(os.path.abspath(path))
+    for number, entry in enumerate(entries, 1):
+        if not isinstance(entry, dict):
+            raise ManifestError("{0}: entry {1} is not an object".format(path, number))
+        entry.setdefault("name", entry.get("title") or entry.get("template") or str(number))
+        if entry.get("template"):
+            entry["template"] = os.path.join(base, entry["template"])
+    return entries
+
+
+def rfc_parameters(entry, template_text, defaults):
+    """CreateRfc parameters for an entry, the template put in its execution parameters"""
+
+    execution_parameters = dict(entry.get("execution_parameters") or {})
+    if template_text is not None:
+        name = entry.get("template_parameter") or defaults["template_parameter"]
+        execution_parameters[name] = template_text
+
+    parameters = {
+        "ChangeTypeId": entry.get("change_type_id") or defaults["change_type_id"],
+        "ChangeTypeVersion": entry.get("change_type_version") or defaults["change_type_version"],
+        "Title": entry.get("title") or entry["name"],
+        "ExecutionParameters": json.dumps(execution_parameters),
+    }
+    # Any other CreateRfc fields, e.g. RequestedStartTime
+    parameters.update(entry.get("rfc") or {})
+    if not parameters["ChangeTypeId"] or not parameters["ChangeTypeVersion"]:
+        raise ManifestError("{0}: no change type id or version".format(entry["name"]))
+    return parameters
+
+
+async def lint(pool, filename, content):
+    """Records of the lint server for a template"""
+
+    response = await pool.request(
+        "POST",
+        "/lint?filename={0}&format=json".format(quote(filename)),
+        content,
+        {"Content-Type": "application/octet-stream"},
+    )
+    if response.status != 200:
+        raise ApiError("LintError", response.body.decode("utf-8").strip(), response.status)
+    return json.loads(response.body.decode("utf-8"))
+
+
+async def follow(client, rfc_id, poll_interval, timeout=None):
+    """GetRfc until the RFC reaches a terminal status, returns the RFC"""
+
+    deadline = time.monotonic() + timeout if timeout else None
+    while True:
+        rfc = await client.get_rfc(rfc_id)
+        if rfc.get("Status", {}).get("Id") in TERMINAL_STATUSES:
+            return rfc
+        if deadline and time.monotonic() >= deadline:
+            return rfc
+        # Jitter keeps the polls of RFCs submitted together from bunching up
+        await asyncio.sleep(poll_interval * random.uniform(0.8, 1.2))
+
+
+async def process(entry, client, lint_pool, options):
+    """Run one manifest entry through the pipeline, returns its result record"""
+
+    result = {"name": entry["name"], "template": entry.get("template"), "rfc_id": None}
+    started = time.monotonic()
+    try:
+        template_text = None
+        if entry.get("template"):
+            with open(entry["template"], "rb") as template_file:
+                content = template_file.read()
+            template_text = content.decode("utf-8")
+
+            if lint_pool is not None:
+                records = await lint(lint_pool, entry["template"], content)
+                result["violations"] = len(records)
+                if records:
+                    result["status"] = "LintFailed"
+                    result["lint"] = records
+                    return result
+
+        parameters = rfc_parameters(entry, template_text, options.defaults)
+        if options.dry_run:
+            result["status"] = "Linted"
+            return result
+
+        rfc_id = result["rfc_id"] = await client.create_rfc(parameters)
+        await client.submit_rfc(rfc_id)
+        if not options.wait:
+            result["status"] = "Submitted"
+            return result
+
+        rfc = await follow(client, rfc_id, options.poll_interval, options.timeout)
+        status = rfc.get("Status", {}).get("Id")
+        result["status"] = status if status in TERMINAL_STATUSES else "TimedOut"
+        for field in ("StatusReason", "ExecutionOutput"):
+            if rfc.get(field):
+                result[field[0].lower() + field[1:]] = rfc[field]
+    except (OSError, ValueError, asyncio.TimeoutError, ApiError, ManifestError) as err:
+        result["status"] = "Error"
+        result["error"] = str(err)
+    finally:
+        result["seconds"] = round(time.monotonic() - started, 3)
+    return result
+
+
+async def run_pipeline(entries, client_factory, options, out):
+    """Process entries concurrently, writing a JSON line per result as it completes"""
+
+    lint_pool = None
+    if options.lint_url or options.lint_socket:
+        lint_pool = ConnectionPool(
+            options.lint_url or "http://localhost",
+            size=options.connections,
+            timeout=options.request_timeout,
+            socket_path=options.lint_socket,
+        )
+    client = client_factory()
+    slots = asyncio.Semaphore(options.concurrency)
+
+    async def bounded(entry):
+        async with slots:
+            return await process(entry, client, lint_pool, options)
+
+    results = []
+    try:
+        for finished in asyncio.as_completed([bounded(entry) for entry in entries]):
+            result = await finished
+            results.append(result)
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+    finally:
+        client.pool.close()
+        if lint_pool is not None:
+            lint_pool.close()
+    return results, client
+
+
+def summary(results, client, seconds):
+    counts = {}
+    for result in results:
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+    return "amssubmit: {0} entries in {1:.1f}s: {2}; API calls {3}, retries {4}\n".format(
+        len(results),
+        seconds,
+        ", ".join("{0} {1}".format(status, count) for status, count in sorted(counts.items())),
+        ", ".join(
+            "{0} {1}".format(operation, count) for operation, count in sorted(client.calls.items())
+        )
+        or "none",
+        client.retries,
+    )
+
+
+def exit_code(results):
+    """1 on errors, 2 when an entry did not succeed, 0 otherwise"""
+
+    statuses = set(result["status"] for result in results)
+    if "Error" in statuses:
+        return 1
+    return 0 if statuses.issubset(OK_STATUSES) else 2
+
+
+def run(entries, client_factory, options, out=None):
+    """Process entries and report a summary on stderr, returns exit code"""
+
+    started = time.monotonic()
+    results, client = asyncio.run(
+        run_pipeline(entries, client_factory, options, out or sys.stdout)
+    )
+    sys.stderr.write(summary(results, client, time.monotonic() - started))
+    return exit_code(results)
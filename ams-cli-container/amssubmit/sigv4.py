@@ -0,0 +1,135 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+"""AWS Signature Version 4 signing and credentials for the AMS API
+
+Credentials come from the AWS_* environment variables or else from the AWS
+CLI of the container (aws configure export-credentials), so profiles, SSO and
+assumed roles work as they do for the CLI. Temporary credentials are fetched
+again shortly before they expire.
+"""
+
+import datetime
+import hashlib
+import hmac
+import json
+import os
+import subprocess
+from urllib.parse import quote
+
+# Temporary credentials are renewed this long before they expire
+REFRESH_MARGIN = datetime.timedelta(minutes=5)
+
+
+class CredentialsError(Exception):
+    pass
+
+
+class Credentials(object):
+    def __init__(self, access_key, secret_key, token=None, expiration=None):
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.token = token
+        self.expiration = expiration
+
+
+class CredentialsProvider(object):
+    """Current credentials, from the environment or the AWS CLI"""
+
+    def __init__(self, profile=None, aws_command="aws"):
+        self.profile = profile
+        self.aws_command = aws_command
+        self.credentials = None
+
+    def get(self):
+        credentials = self.credentials
+        now = datetime.datetime.now(datetime.timezone.utc)
+        if credentials is None or (
+            credentials.expiration is not None and credentials.expiration - REFRESH_MARGIN <= now
+        ):
+            credentials = self.credentials = self.load()
+        return credentials
+
+    def load(self):
+        if os.environ.get("AWS_ACCESS_KEY_ID") and not self.profile:
+            return Credentials(
+                os.environ["AWS_ACCESS_KEY_ID"],
+                os.environ.get("AWS_SECRET_ACCESS_KEY", ""),
+                os.environ.get("AWS_SESSION_TOKEN"),
+            )
+
+        command = [self.aws_command, "configure", "export-credentials", "--format", "process"]
+        if self.profile:
+            command.extend(["--profile", self.profile])
+        try:
+            output = subprocess.run(
+                command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True
+            ).stdout
+        except (OSError, subprocess.CalledProcessError) as err:
+            raise CredentialsError("no AWS credentials found: {0}".format(err))
+
+        exported = json.loads(output.decode("utf-8"))
+        expiration = exported.get("Expiration")
+        if expiration:
+            expiration = datetime.datetime.fromisoformat(expiration.replace("Z", "+00:00"))
+        return Credentials(
+            exported["AccessKeyId"],
+            exported["SecretAccessKey"],
+            exported.get("SessionToken"),
+            expiration or None,
+        )
+
+
+def hmac_sha256(key, message):
+    return hmac.new(key, message.encode("utf-8"), hashlib.sha256).digest()
+
+
+def sign(method, host, path, headers, body, credentials, region, service, now=None):
+    """Return headers with the SigV4 Authorization, X-Amz-Date and token headers added"""
+
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+    date = amz_date[:8]
+
+    headers = dict(headers)
+    headers["Host"] = host
+    headers["X-Amz-Date"] = amz_date
+    if credentials.token:
+        headers["X-Amz-Security-Token"] = credentials.token
+
+    canonical = sorted(
+        (name.lower(), " ".join(str(value).split())) for name, value in headers.items()
+    )
+    signed_headers = ";".join(name for name, _ in canonical)
+    canonical_request = "\n".join(
+        [
+            method,
+            quote(path or "/", safe="/~"),
+            "",
+            "".join("{0}:{1}\n".format(name, value) for name, value in canonical),
+            signed_headers,
+            hashlib.sha256(body).hexdigest(),
+        ]
+    )
+
+    scope = "{0}/{1}/{2}/aws4_request".format(date, region, service)
+    string_to_sign = "\n".join(
+        [
+            "AWS4-HMAC-SHA256",
+            amz_date,
+            scope,
+            hashlib.sha256(canonical_request.encode("utf-8")).hexdigest(),
+        ]
+    )
+
+    key = ("AWS4" + credentials.secret_key).encode("utf-8")
+    for part in (date, region, service, "aws4_request"):
+        key = hmac_sha256(key, part)
+    signature = hmac.new(key, string_to_sign.encode("utf-8"), hashlib.sha256).hexdigest()
+
+    headers["Authorization"] = (
+        "AWS4-HMAC-SHA256 Credential={0}/{1}, SignedHeaders={2}, Signature={3}".format(
+            credentials.access_key, scope, signed_headers, signature
+        )
+    )
+    return headers
@@ -0,0 +1,160 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+"""Local stand-in for the amscm API: python -m amssubmit.stub [--port 8780]
+
+Answers CreateRfc, SubmitRfc and GetRfc. A submitted RFC moves through
+Scheduled and InProgress to Success, or to Failure when its title contains
+"fail", over --duration seconds. Calls beyond --rate per second are throttled
+like the real API, so the retries and the rate limiter of amssubmit can be
+tried out without an AMS account. Signatures are not checked.
+"""
+
+import argparse
+import itertools
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class Bucket(object):
+    def __init__(self, rate):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+class ChangeManagementStub(object):
+    def __init__(self, rate, duration, latency):
+        self.bucket = Bucket(rate) if rate else None
+        self.duration = duration
+        self.latency = latency
+        self.rfcs = {}
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.throttled = 0
+
+    def status(self, rfc):
+        if rfc["submitted"] is None:
+            return "Editing"
+        elapsed = time.monotonic() - rfc["submitted"]
+        if elapsed >= self.duration:
+            return "Failure" if "fail" in rfc["Title"].lower() else "Success"
+        return "InProgress" if elapsed >= self.duration / 3 else "Scheduled"
+
+    def call(self, operation, params):
+        """(status, response) of an operation"""
+
+        if self.latency:
+            time.sleep(self.latency)
+        with self.lock:
+            self.calls += 1
+            if self.bucket is not None and not self.bucket.take():
+                self.throttled += 1
+                return 400, {"__type": "ThrottlingException", "message": "Rate exceeded"}
+
+            if operation == "CreateRfc":
+                for field in ("ChangeTypeId", "ChangeTypeVersion", "Title"):
+                    if not params.get(field):
+                        return 400, validation_error("{0} is required".format(field))
+                rfc_id = "{0:08x}-stub-rfc".format(next(self.ids))
+                self.rfcs[rfc_id] = dict(params, RfcId=rfc_id, submitted=None)
+                return 200, {"RfcId": rfc_id}
+
+            rfc = self.rfcs.get(params.get("RfcId"))
+            if rfc is None:
+                return 400, {"__type": "ResourceNotFoundException", "message": "No such RFC"}
+            if operation == "SubmitRfc":
+                if rfc["submitted"] is None:
+                    rfc["submitted"] = time.monotonic()
+                return 200, {"RfcId": rfc["RfcId"]}
+            if operation == "GetRfc":
+                status = self.status(rfc)
+                result = {
+                    "RfcId": rfc["RfcId"],
+                    "Title": rfc["Title"],
+                    "ChangeTypeId": rfc["ChangeTypeId"],
+                    "Status": {"Id": status, "Name": status},
+                }
+                if status == "Failure":
+                    result["StatusReason"] = "The stack failed to create"
+                elif status == "Success":
+                    result["ExecutionOutput"] = json.dumps({"StackId": "stack-" + rfc["RfcId"]})
+                return 200, {"Rfc": result}
+        return 400, {"__type": "UnknownOperationException", "message": operation}
+
+
+def validation_error(message):
+    return {"__type": "InvalidArgumentException", "message": message}
+
+
+def handler_class(stub):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            operation = (self.headers.get("X-Amz-Target") or "").rpartition(".")[2]
+            try:
+                params = json.loads(body.decode("utf-8") or "{}")
+            except ValueError:
+                status, response = 400, {"__type": "SerializationException", "message": "Bad JSON"}
+            else:
+                status, response = stub.call(operation, params)
+
+            content = json.dumps(response).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/x-amz-json-1.1")
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="amssubmit.stub", description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8780)
+    parser.add_argument("--rate", type=float, default=10.0, help="calls per second, 0 unlimited")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds an RFC runs")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to each call")
+    args = parser.parse_args(argv)
+
+    stub = ChangeManagementStub(args.rate, args.duration, args.latency)
+    server = ThreadingHTTPServer((args.host, args.port), handler_class(stub))
+    server.daemon_threads = True
+    sys.stderr.write("amssubmit.stub: listening on http://{0}:{1}\n".format(args.host, args.port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        sys.stderr.write(
+            "amssubmit.stub: {0} calls, {1} throttled, {2} RFCs\n".format(
+                stub.calls, stub.throttled, len(stub.rfcs)
+            )
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+"""Command line entry point: python -m amslint <command>"""
+
+import argparse
+import sys
+
+from amslint import aggregate, batch, incremental, server, stacks
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="amslint", description=__doc__)
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+
+    batch.add_arguments(
+        commands.add_parser("batch", help="lint many templates with a process pool")
+    )
+
+    incremental.add_arguments(
+        commands.add_parser("relint", help="re-lint only the resources changed since a run")
+    )
+
+    stacks.add_arguments(
+        commands.add_parser("stacks", help="lint nested stacks per stack and across stacks")
+    )
+
+    server.add_arguments(
+        commands.add_parser("serve", help="serve lint requests with the rules kept loaded")
+    )
+
+    aggregate.add_arguments(
+        commands.add_parser("report", help="merge violation summaries of batch runs")
+    )
+
+    args = parser.parse_args(argv)
+
+    if args.command == "batch":
+        return batch.run(
+            args.sources,
+            rules_dir=args.rules_dir,
+            regions=args.regions,
+            workers=args.workers,
+            output_format=args.output_format,
+            out=sys.stdout,
+            cache=batch.cache_from_args(args),
+            metrics_file=args.metrics_file,
+            stream=args.stream,
+            top=args.top,
+            first=args.first,
+        )
+
+    if args.command == "relint":
+        return incremental.run(
+            args.template,
+            args.previous,
+            changed=args.changed,
+            previous_template_file=args.previous_template,
+            rules_dir=args.rules_dir,
+            regions=args.regions,
+            out=sys.stdout,
+        )
+
+    if args.command == "stacks":
+        return stacks.run(
+            args.templates,
+            rules_dir=args.rules_dir,
+            regions=args.regions,
+            workers=args.workers,
+            search_paths=args.search_paths,
+            output_format=args.output_format,
+            out=sys.stdout,
+            metrics_file=args.metrics_file,
+        )
+
+    if args.command == "serve":
+        return server.run(
+            rules_dir=args.rules_dir,
+            regions=args.regions,
+            workers=args.workers,
+            cache=batch.cache_from_args(args),
+            metrics=args.metrics,
+            host=args.host,
+            port=args.port,
+            socket_path=args.socket_path,
+            verbose=args.verbose,
+        )
+
+    if args.command == "report":
+        return aggregate.run(
+            args.summaries, output_format=args.output_format, out=sys.stdout, top=args.top
+        )
+
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,216 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+"""Fleet-wide violation counts per rule, resource type and attribute
+
+Batch runs with --format summary fold each template's records into an
+Aggregate rather than keeping them, workers each aggregating their share of
+the templates, and print the most common violations. --format summary-json
+writes the aggregate itself, and `python -m amslint report` merges such files,
+e.g. of runs over shards of a fleet.
+"""
+
+import json
+from array import array
+
+# Bits per code in the packed (rule, type, attribute) key of a row
+CODE_BITS = 21
+
+
+class Aggregate(object):
+    """Violation counts per (rule, resource type, attribute), stored column-wise
+
+    Each column's strings are interned into a table, and every distinct
+    combination is a row of packed integer arrays: its rule, type and
+    attribute codes, its violations, and the number of templates it occurs in.
+    """
+
+    COLUMNS = ("rules", "types", "attributes")
+
+    def __init__(self):
+        self.templates = 0
+        self.failing = 0
+        self.tables = {column: [] for column in self.COLUMNS}
+        self.codes = {column: {} for column in self.COLUMNS}
+        # Packed codes -> row
+        self.rows = {}
+        self.rule_codes = array("I")
+        self.type_codes = array("I")
+        self.attribute_codes = array("I")
+        self.violations = array("Q")
+        self.template_counts = array("I")
+
+    def code(self, column, value):
+        codes = self.codes[column]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(self.tables[column])
+            self.tables[column].append(value)
+        return code
+
+    def row(self, rule_code, type_code, attribute_code):
+        key = (((rule_code << CODE_BITS) | type_code) << CODE_BITS) | attribute_code
+        row = self.rows.get(key)
+        if row is None:
+            row = self.rows[key] = len(self.violations)
+            self.rule_codes.append(rule_code)
+            self.type_codes.append(type_code)
+            self.attribute_codes.append(attribute_code)
+            self.violations.append(0)
+            self.template_counts.append(0)
+        return row
+
+    def add_template(self, records):
+        """Count the records of one template"""
+
+        rows = set()
+        for record in records:
+            row = self.row(
+                self.code("rules", record["rule"]),
+                self.code("types", record.get("resource_type")),
+                self.code("attributes", record.get("attribute")),
+            )
+            self.violations[row] += 1
+            rows.add(row)
+
+        for row in rows:
+            self.template_counts[row] += 1
+        self.templates += 1
+        if rows:
+            self.failing += 1
+
+    def merge(self, other):
+        """Add the counts of another aggregate, e.g. a worker's partial one"""
+
+        recode = {
+            column: [self.code(column, value) for value in other.tables[column]]
+            for column in self.COLUMNS
+        }
+        for row in range(len(other.violations)):
+            own_row = self.row(
+                recode["rules"][other.rule_codes[row]],
+                recode["types"][other.type_codes[row]],
+                recode["attributes"][other.attribute_codes[row]],
+            )
+            self.violations[own_row] += other.violations[row]
+            self.template_counts[own_row] += other.template_counts[row]
+        self.templates += other.templates
+        self.failing += other.failing
+
+    def entries(self):
+        """(rule, type, attribute, violations, templates), most violations first"""
+
+        entries = [
+            (
+                self.tables["rules"][self.rule_codes[row]],
+                self.tables["types"][self.type_codes[row]],
+                self.tables["attributes"][self.attribute_codes[row]],
+                self.violations[row],
+                self.template_counts[row],
+            )
+            for row in range(len(self.violations))
+        ]
+        entries.sort(key=lambda entry: (-entry[3], entry[0], entry[1] or "", entry[2] or ""))
+        return entries
+
+    def to_dict(self):
+        return {
+            "templates": self.templates,
+            "failing_templates": self.failing,
+            "tables": self.tables,
+            "rows": {
+                "rule": self.rule_codes.tolist(),
+                "type": self.type_codes.tolist(),
+                "attribute": self.attribute_codes.tolist(),
+                "violations": self.violations.tolist(),
+                "templates": self.template_counts.tolist(),
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        aggregate = cls()
+        aggregate.templates = data["templates"]
+        aggregate.failing = data["failing_templates"]
+        for column in cls.COLUMNS:
+            for value in data["tables"][column]:
+                aggregate.code(column, value)
+
+        rows = data["rows"]
+        for rule_code, type_code, attribute_code, violations, templates in zip(
+            rows["rule"], rows["type"], rows["attribute"], rows["violations"], rows["templates"]
+        ):
+            row = aggregate.row(rule_code, type_code, attribute_code)
+            aggregate.violations[row] += violations
+            aggregate.template_counts[row] += templates
+        return aggregate
+
+
+def format_table(aggregate, top=None):
+    """Summary lines and a table of the most common violations"""
+
+    entries = aggregate.entries()
+    lines = [
+        "Templates: {0}, with violations: {1}, violations: {2}".format(
+            aggregate.templates, aggregate.failing, sum(aggregate.violations)
+        )
+    ]
+    if not entries:
+        return "\n".join(lines) + "\n"
+
+    header = ("RULE", "RESOURCE TYPE", "ATTRIBUTE", "VIOLATIONS", "TEMPLATES")
+    rows = [header]
+    rows.extend(
+        (rule, resource_type or "-", attribute or "-", str(violations), str(templates))
+        for rule, resource_type, attribute, violations, templates in entries[:top]
+    )
+    widths = [max(len(row[column]) for row in rows) for column in range(len(header))]
+
+    lines.append("")
+    for row in rows:
+        cells = [row[column].ljust(widths[column]) for column in range(3)]
+        cells.extend(row[column].rjust(widths[column]) for column in range(3, 5))
+        lines.append("  ".join(cells).rstrip())
+    if top is not None and len(entries) > top:
+        lines.append("... {0} more".format(len(entries) - top))
+    return "\n".join(lines) + "\n"
+
+
+def write(aggregate, output_format, out, top=None):
+    if output_format == "summary-json":
+        json.dump(aggregate.to_dict(), out, separators=(",", ":"))
+        out.write("\n")
+    else:
+        out.write(format_table(aggregate, top))
+
+
+def run(summaries, output_format="summary", out=None, top=None):
+    """Merge summary-json files and write the result, returns exit code"""
+
+    aggregate = Aggregate()
+    for summary in summaries:
+        with open(summary) as summary_file:
+            aggregate.merge(Aggregate.from_dict(json.load(summary_file)))
+    write(aggregate, output_format, out, top)
+    return 2 if aggregate.failing else 0
+
+
+def add_arguments(parser):
+    """Arguments of the report command"""
+
+    parser.add_argument("summaries", nargs="+", help="files written by batch --format summary-json")
+    add_output_arguments(parser, "summary")
+
+
+def add_output_arguments(parser, default=None):
+    if default is not None:
+        parser.add_argument(
+            "--format",
+            choices=["summary", "summary-json"],
+            default=default,
+            dest="output_format",
+            help="summary-json writes an aggregate report can merge",
+        )
+    parser.add_argument(
+        "--top", type=int, default=None, help="list only the most common violations in summaries"
+    )
@@ -0,0 +1,424 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+"""Lint many templates with the AMS rules, spread across a process pool"""
+
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice, repeat
+
+from amslint import aggregate
+from amslint.cache import (
+    DEFAULT_MAX_BYTES,
+    PolicyEntries,
+    ResultCache,
+    rule_pack_version,
+    template_key,
+)
+from amslint.rules import RULES_DIR, import_rules_module, iter_lint_file, lint_file, load_rules
+from amslint.streaming import iter_stream_file
+
+TEMPLATE_EXTENSIONS = (".yaml", ".yml", ".json", ".template")
+
+# Added to the rule pack version in cache keys of first violation results
+FIRST_VIOLATION_SUFFIX = ":first-violation"
+
+# Formats counting violations per rule, resource type and attribute
+SUMMARY_FORMATS = ("summary", "summary-json")
+
+# Rules loaded once per worker process by init_worker
+_worker_rules = None
+_worker_regions = None
+_worker_metrics = None
+_worker_stream = False
+
+
+def available_cores():
+    """Number of cores this process may run on"""
+
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def read_manifest(manifest):
+    """Template paths listed one per line, relative to the manifest, # for comments"""
+
+    base = os.path.dirname(os.path.abspath(manifest))
+    with open(manifest) as manifest_file:
+        for line in manifest_file:
+            line = line.split("#", 1)[0].strip()
+            if line:
+                yield os.path.normpath(os.path.join(base, line))
+
+
+def find_templates(sources):
+    """Expand directories and manifests into a sorted, de-duplicated list of templates"""
+
+    templates = []
+    for source in sources:
+        if os.path.isdir(source):
+            for root, dirs, filenames in os.walk(source):
+                dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+                templates.extend(
+                    os.path.join(root, filename)
+                    for filename in sorted(filenames)
+                    if filename.endswith(TEMPLATE_EXTENSIONS)
+                )
+        elif source.endswith(TEMPLATE_EXTENSIONS):
+            templates.append(source)
+        else:
+            templates.extend(read_manifest(source))
+
+    seen = set()
+    return [t for t in templates if not (t in seen or seen.add(t))]
+
+
+def init_worker(rules_dir, regions, metrics_enabled=False, stream=False):
+    """Load the AMS rules once in each worker process"""
+
+    # pylint: disable=global-statement
+    global _worker_rules, _worker_regions, _worker_metrics, _worker_stream
+    _worker_rules = load_rules(rules_dir)
+    _worker_regions = regions
+    _worker_stream = stream
+    if metrics_enabled:
+        _worker_metrics = import_rules_module("_ams_metrics", rules_dir)
+        _worker_metrics.enable()
+        # Forked workers start with the parent's metrics, which it reports itself
+        _worker_metrics.drain()
+
+
+def worker_records(filename, content=None, first=False):
+    """Records of one template, linted with the rules loaded by init_worker"""
+
+    if _worker_stream and content is None:
+        records = iter_stream_file(
+            _worker_rules, filename, _worker_regions, _worker_metrics is None
+        )
+        return list(islice(records, 1) if first else records)
+    return lint_file(_worker_rules, filename, _worker_regions, content, first)
+
+
+def lint_worker(filename, content=None, first=False):
+    """Lint one template with the rules loaded by init_worker, returns (records, metrics)
+
+    With first, only the first violation is looked for, see iter_rule_records().
+    """
+
+    records = worker_records(filename, content, first)
+    return records, _worker_metrics.drain() if _worker_metrics else None
+
+
+def aggregate_worker(filenames, first=False):
+    """Lint a chunk of templates and aggregate their records, returns (aggregate, metrics)"""
+
+    partial = aggregate.Aggregate()
+    for filename in filenames:
+        partial.add_template(worker_records(filename, first=first))
+    return partial, _worker_metrics.drain() if _worker_metrics else None
+
+
+def lint_uncached(
+    templates,
+    rules_dir=None,
+    regions=None,
+    workers=None,
+    metrics=None,
+    lazy=False,
+    stream=False,
+    first=False,
+):
+    """Lint templates and yield their records in input order
+
+    metrics is the rules' _ams_metrics module when instrumentation is wanted;
+    metrics recorded by worker processes are merged into it. With lazy and a
+    single worker, each template's records are yielded as an iterator that
+    lints while it is consumed, and must be consumed before the next one. With
+    stream, templates are read resource by resource, see amslint.streaming.
+    With first, each template stops at its first violation.
+    """
+
+    workers = min(workers or available_cores(), len(templates)) or 1
+
+    if workers == 1:
+        rules = load_rules(rules_dir)
+        for filename in templates:
+            if stream:
+                records = iter_stream_file(rules, filename, regions, metrics is None)
+                if first:
+                    records = islice(records, 1)
+                yield records if lazy else list(records)
+            elif lazy and metrics is None:
+                yield iter_lint_file(rules, filename, regions, lazy=True, first=first)
+            else:
+                yield lint_file(rules, filename, regions, first=first)
+        return
+
+    chunksize = max(1, len(templates) // (workers * 8))
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=init_worker,
+        initargs=(rules_dir, regions, metrics is not None, stream),
+    ) as executor:
+        for records, worker_metrics in executor.map(
+            lint_worker, templates, repeat(None), repeat(first), chunksize=chunksize
+        ):
+            if worker_metrics:
+                metrics.merge(worker_metrics)
+            yield records
+
+
+def lint_templates(
+    templates,
+    rules_dir=None,
+    regions=None,
+    workers=None,
+    cache=None,
+    metrics=None,
+    lazy=False,
+    stream=False,
+    first=False,
+):
+    """Lint templates and yield (filename, records) in input order
+
+    With a cache, templates whose content and rule pack are unchanged, and
+    whose policy dependencies are too, are answered from it and only the
+    remaining ones are sent to the workers.
+    Records are only lazy (see lint_uncached) without a cache.
+    """
+
+    if cache is None:
+        for filename, records in zip(
+            templates,
+            lint_uncached(templates, rules_dir, regions, workers, metrics, lazy, stream, first),
+        ):
+            yield filename, records
+        return
+
+    version = rule_pack_version(rules_dir or RULES_DIR)
+    if first:
+        # First violations are cached apart from full results
+        version += FIRST_VIOLATION_SUFFIX
+    policy = PolicyEntries(rules_dir or RULES_DIR)
+    keys = {}
+    dependencies = {}
+    cached = {}
+    for filename in templates:
+        try:
+            with open(filename, "rb") as template_file:
+                content = template_file.read()
+        except OSError:
+            # Let the linter report the unreadable file
+            continue
+        keys[filename] = template_key(content, version, regions)
+        stale = cache.stale
+        records = cache.get(keys[filename], policy)
+        if records is not None:
+            for record in records:
+                record["filename"] = filename
+            cached[filename] = records
+            continue
+
+        dependencies[filename] = policy.dependencies(content)
+        if metrics and cache.stale > stale:
+            metrics.record("policy-invalidated", calls=1)
+
+    misses = [filename for filename in templates if filename not in cached]
+    linted = lint_uncached(misses, rules_dir, regions, workers, metrics, stream=stream, first=first)
+
+    for filename in templates:
+        if filename in cached:
+            if metrics:
+                metrics.record("result-cache", calls=1, cache_hits=1)
+            yield filename, cached[filename]
+            continue
+
+        records = next(linted)
+        if filename in keys:
+            cache.put(keys[filename], records, dependencies[filename])
+        yield filename, records
+
+
+def aggregate_templates(
+    templates,
+    rules_dir=None,
+    regions=None,
+    workers=None,
+    cache=None,
+    metrics=None,
+    stream=False,
+    first=False,
+):
+    """Lint templates and return the Aggregate of their records
+
+    Without a cache, each worker process aggregates chunks of templates and
+    sends back only its partial aggregates, which are merged here.
+    """
+
+    result = aggregate.Aggregate()
+    workers = min(workers or available_cores(), len(templates)) or 1
+    if cache is not None or workers == 1:
+        for _, records in lint_templates(
+            templates,
+            rules_dir,
+            regions,
+            workers,
+            cache,
+            metrics,
+            lazy=True,
+            stream=stream,
+            first=first,
+        ):
+            result.add_template(records)
+        return result
+
+    size = max(1, len(templates) // (workers * 8))
+    chunks = [templates[start : start + size] for start in range(0, len(templates), size)]
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=init_worker,
+        initargs=(rules_dir, regions, metrics is not None, stream),
+    ) as executor:
+        for partial, worker_metrics in executor.map(aggregate_worker, chunks, repeat(first)):
+            if worker_metrics:
+                metrics.merge(worker_metrics)
+            result.merge(partial)
+    return result
+
+
+def format_text(record):
+    """Format a record the way cfn-lint prints a match"""
+
+    return "{rule} {message}\n{filename}:{line}:{column}\n".format(**record)
+
+
+def run(
+    sources,
+    rules_dir=None,
+    regions=None,
+    workers=None,
+    output_format="text",
+    out=None,
+    cache=None,
+    metrics_file=None,
+    stream=False,
+    top=None,
+    first=False,
+):
+    """Lint every template found in sources and write merged results, returns exit code
+
+    The ndjson format writes one JSON record per line as soon as it is found,
+    so consumers can process results while linting is still running. The
+    summary formats write violation counts instead, see amslint.aggregate.
+    With stream, templates are read resource by resource, see amslint.streaming.
+    With first, each template stops at its first violation, for pass/fail gates.
+    """
+
+    templates = find_templates(sources)
+    results = []
+    failed = False
+
+    metrics = None
+    if metrics_file:
+        metrics = import_rules_module("_ams_metrics", rules_dir)
+        metrics.enable()
+
+    if output_format in SUMMARY_FORMATS:
+        result = aggregate_templates(
+            templates, rules_dir, regions, workers, cache, metrics, stream, first
+        )
+        aggregate.write(result, output_format, out, top)
+        failed = result.failing > 0
+        if metrics:
+            metrics.write(metrics_file)
+        return 2 if failed else 0
+
+    ndjson = output_format == "ndjson"
+    for _, records in lint_templates(
+        templates,
+        rules_dir,
+        regions,
+        workers,
+        cache,
+        metrics,
+        lazy=ndjson,
+        stream=stream,
+        first=first,
+    ):
+        for record in records:
+            failed = True
+            if output_format == "json":
+                results.append(record)
+            elif ndjson:
+                out.write(json.dumps(record, separators=(",", ":")) + "\n")
+                out.flush()
+            else:
+                out.write(format_text(record) + "\n")
+
+    if output_format == "json":
+        json.dump(results, out, indent=1)
+        out.write("\n")
+
+    if metrics:
+        metrics.write(metrics_file)
+
+    return 2 if failed else 0
+
+
+def add_arguments(parser):
+    """Arguments of the batch command"""
+
+    parser.add_argument(
+        "sources", nargs="+", help="template files, directories or manifests listing templates"
+    )
+    parser.add_argument("--rules-dir", default=RULES_DIR, help="directory with the AMS rules")
+    parser.add_argument(
+        "--regions", nargs="+", default=None, help="regions to validate templates against"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=None, help="worker processes (default: available cores)"
+    )
+    parser.add_argument(
+        "--format",
+        choices=["text", "json", "ndjson"] + list(SUMMARY_FORMATS),
+        default="text",
+        dest="output_format",
+        help="ndjson writes one record per line while linting, summary counts violations",
+    )
+    aggregate.add_output_arguments(parser)
+    parser.add_argument(
+        "--cache-dir", default=None, help="reuse results of unchanged templates from this directory"
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=DEFAULT_MAX_BYTES // (1024 * 1024),
+        help="cache size cap in MiB",
+    )
+    parser.add_argument(
+        "--metrics",
+        default=None,
+        dest="metrics_file",
+        help="write per-rule timing and match counts to this file (.prom for Prometheus text)",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="read templates one resource at a time, for very large templates",
+    )
+    parser.add_argument(
+        "--fail-fast",
+        action="store_true",
+        dest="first",
+        help="stop each template at its first violation, cheapest checks first",
+    )
+
+
+def cache_from_args(args):
+    """ResultCache configured by the command line, or None"""
+
+    if not args.cache_dir:
+        return None
+    return ResultCache(args.cache_dir, args.cache_size * 1024 * 1024)
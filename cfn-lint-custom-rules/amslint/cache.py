@@ -0,0 +1,197 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+"""On-disk cache of lint results keyed by template content and rule pack version
+
+The rule pack version covers the rule sources but not the policy file. Each
+result instead records the policy entries its template can depend on, and is
+only reused while none of them changed, so a policy update re-lints just the
+templates it can affect.
+"""
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+
+from amslint.rules import import_rules_module
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Versioned per entry by PolicyEntries rather than by rule_pack_version
+POLICY_FILENAME = "ams_policy.json"
+
+# Strings shaped like resource types, "AWS::EC2::Instance" or "Custom::Thing"
+RESOURCE_TYPE_TOKEN = re.compile(rb"[A-Za-z0-9]+(?:::[A-Za-z0-9]+)+")
+# Escapes spelling letters in JSON or YAML strings, which could hide a type
+CHARACTER_ESCAPE = re.compile(rb"\\[xuU]")
+
+# Dependency entries standing for the whole policy and for its set of tables,
+# as a new table counts as used by every template
+WHOLE_POLICY = "*"
+POLICY_TABLES = "*tables"
+
+
+def rule_pack_version(rules_dir):
+    """Hash of the source files in the rules directory, changes with any rule"""
+
+    digest = hashlib.sha256()
+    for root, dirs, filenames in os.walk(rules_dir):
+        dirs[:] = sorted(d for d in dirs if d != "__pycache__")
+        for filename in sorted(filenames):
+            if filename.endswith((".pyc", ".pyo")) or filename == POLICY_FILENAME:
+                continue
+            path = os.path.join(root, filename)
+            digest.update(os.path.relpath(path, rules_dir).encode("utf-8"))
+            with open(path, "rb") as rule_file:
+                digest.update(rule_file.read())
+    return digest.hexdigest()
+
+
+def template_key(content, version, regions=None):
+    """Cache key of a template's raw bytes for a rule pack version and region list"""
+
+    digest = hashlib.sha256(content)
+    digest.update(version.encode("utf-8"))
+    digest.update(",".join(regions or []).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class PolicyEntries(object):
+    """Digests of the current policy entries, to record and check what results depend on
+
+    The resource types of a template are taken from its raw content, any string
+    shaped like a type counting, so checking a cached result needs no parsing.
+    This over-approximates, which can only invalidate more results, not fewer.
+    """
+
+    def __init__(self, rules_dir):
+        self.policy_module = import_rules_module("_ams_policy", rules_dir)
+        policy = self.policy_module.load_policy()
+        self.tables = tuple(policy)
+        self.digests = self.policy_module.entry_digests(policy)
+        self.digests[(WHOLE_POLICY, None)] = self.policy_module.digest(
+            sorted(self.digests.items(), key=str)
+        )
+        self.digests[(POLICY_TABLES, None)] = self.policy_module.digest(sorted(self.tables))
+
+    def current(self, table, key):
+        return self.digests.get((table, key))
+
+    def dependencies(self, content):
+        """[table, key, digest] of every entry a template's raw content can depend on"""
+
+        if CHARACTER_ESCAPE.search(content):
+            entries = [(WHOLE_POLICY, None)]
+        else:
+            resource_types = set(
+                token.decode("ascii") for token in RESOURCE_TYPE_TOKEN.findall(content)
+            )
+            entries = [(POLICY_TABLES, None)]
+            entries.extend(self.policy_module.dependencies(self.tables, resource_types))
+        return [[table, key, self.current(table, key)] for table, key in entries]
+
+    def unchanged(self, dependencies):
+        """Whether every entry recorded by dependencies() still has the same digest"""
+
+        return all(self.current(table, key) == value for table, key, value in dependencies)
+
+
+class ResultCache(object):
+    """Result records stored as one JSON file per key, evicted least recently used first
+
+    Entries are sharded into sub directories by the first two characters of the
+    key. A hit refreshes the entry's modification time, which is what eviction
+    orders on once the total size goes over max_bytes. Entries whose policy
+    dependencies changed count as stale misses, and are replaced when the
+    template is linted again.
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        os.makedirs(directory, exist_ok=True)
+        self.size = sum(size for _, size, _ in self.entries())
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    def entries(self):
+        """Yield (path, size, mtime) of every cached entry"""
+
+        for root, _, filenames in os.walk(self.directory):
+            for filename in filenames:
+                if not filename.endswith(".json"):
+                    continue
+                path = os.path.join(root, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+
+    def get(self, key, policy=None):
+        """Cached records for key, or None, also None when stale for policy (PolicyEntries)"""
+
+        path = self.path(key)
+        try:
+            with open(path) as entry:
+                cached = json.load(entry)
+            records = cached["records"]
+            dependencies = cached["policy"]
+        except (OSError, ValueError, TypeError, KeyError):
+            self.misses += 1
+            return None
+
+        if policy is not None and not policy.unchanged(dependencies):
+            self.misses += 1
+            self.stale += 1
+            return None
+
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return records
+
+    def put(self, key, records, dependencies=()):
+        """Store records for key and the policy entries they depend on
+
+        Old entries are evicted when over the size cap.
+        """
+
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        cached = {"records": records, "policy": dependencies}
+        data = json.dumps(cached, separators=(",", ":")).encode("utf-8")
+
+        # Write to a temporary file first so readers never see a partial entry
+        handle, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(handle, "wb") as entry:
+            entry.write(data)
+        os.replace(temporary, path)
+
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """Remove least recently used entries until the cache is below 90% of its cap"""
+
+        entries = sorted(self.entries(), key=lambda entry: entry[2])
+        self.size = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+
+        for path, size, _ in entries:
+            if self.size <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self.size -= size
@@ -0,0 +1,113 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+"""Client of the lint server: python -m amslint.client [--socket PATH] TEMPLATE...
+
+Only uses the standard library, so starting it does not import cfn-lint.
+Exits with code 2 when any template has AMS violations, like the batch command.
+"""
+
+import argparse
+import http.client
+import json
+import socket
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote, urlparse
+
+DEFAULT_URL = "http://127.0.0.1:8765"
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTP connection over a Unix socket"""
+
+    def __init__(self, socket_path, timeout):
+        http.client.HTTPConnection.__init__(self, "localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+def connect(url=DEFAULT_URL, socket_path=None, timeout=60):
+    if socket_path:
+        return UnixHTTPConnection(socket_path, timeout)
+    url = urlparse(url)
+    return http.client.HTTPConnection(url.hostname, url.port or 80, timeout=timeout)
+
+
+def lint(
+    filename, url=DEFAULT_URL, socket_path=None, output_format="json", timeout=60, first=False
+):
+    """Send one template to the server, returns (violation count, response body)
+
+    With first, the server stops at the template's first violation.
+    """
+
+    with open(filename, "rb") as template_file:
+        content = template_file.read()
+
+    connection = connect(url, socket_path, timeout)
+    try:
+        connection.request(
+            "POST",
+            "/lint?filename={0}&format={1}{2}".format(
+                quote(filename), output_format, "&fail_fast=1" if first else ""
+            ),
+            body=content,
+            headers={"Content-Type": "application/octet-stream"},
+        )
+        response = connection.getresponse()
+        body = response.read().decode("utf-8")
+        if response.status != 200:
+            message = "{0}: server answered {1}: {2}"
+            raise RuntimeError(message.format(filename, response.status, body.strip()))
+        return int(response.getheader("X-AMS-Violations", "0")), body
+    finally:
+        connection.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="amslint.client", description=__doc__.splitlines()[0])
+    parser.add_argument("templates", nargs="+", help="template files to lint")
+    parser.add_argument("--url", default=DEFAULT_URL, help="lint server address")
+    parser.add_argument(
+        "--socket", default=None, dest="socket_path", help="lint server Unix socket"
+    )
+    parser.add_argument("--format", choices=["text", "json"], default="text", dest="output_format")
+    parser.add_argument("--parallel", type=int, default=4, help="templates sent at a time")
+    parser.add_argument(
+        "--fail-fast",
+        action="store_true",
+        dest="first",
+        help="stop each template at its first violation",
+    )
+    args = parser.parse_args(argv)
+
+    def send(filename):
+        return lint(filename, args.url, args.socket_path, args.output_format, first=args.first)
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, args.parallel)) as executor:
+            responses = list(executor.map(send, args.templates))
+    except (OSError, RuntimeError) as err:
+        sys.stderr.write("amslint.client: {0}\n".format(err))
+        return 1
+
+    if args.output_format == "json":
+        records = []
+        for _, body in responses:
+            records.extend(json.loads(body))
+        json.dump(records, sys.stdout, indent=1)
+        sys.stdout.write("\n")
+    else:
+        for _, body in responses:
+            sys.stdout.write(body)
+
+    return 2 if any(violations for violations, _ in responses) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
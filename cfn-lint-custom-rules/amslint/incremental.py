@@ -0,0 +1,139 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+"""Re-lint only the resources that changed since a previous run"""
+
+import json
+
+from amslint.rules import RULES_DIR, decode_template, load_rules, locate, run_rules
+from amslint.streaming import CONTEXT_SECTIONS
+
+
+# (rule, attribute) of records reported on a resource that depend on others,
+# recomputed like the checks on the whole template: E2599's exposure of a
+# security group by all of its ingress rules
+TEMPLATE_RECORDS = (("E2599", "SecurityGroupIngress"),)
+
+
+def resource_scope(record):
+    """Logical id a record is about, or None for checks on the whole template"""
+
+    if (record["rule"], record.get("attribute")) in TEMPLATE_RECORDS:
+        return None
+    path = record["path"]
+    if len(path) >= 2 and path[0] == "Resources":
+        return path[1]
+    return None
+
+
+def changed_resources(previous_template, template):
+    """Logical ids added, removed or modified between two parsed templates
+
+    Every resource counts as changed when the Parameters, Mappings or
+    Conditions its intrinsic functions are evaluated against differ.
+    """
+
+    previous_template = previous_template or {}
+    template = template or {}
+    previous_resources = previous_template.get("Resources", {})
+    resources = template.get("Resources", {})
+    if not isinstance(previous_resources, dict) or not isinstance(resources, dict):
+        return None
+
+    if any(
+        previous_template.get(section) != template.get(section) for section in CONTEXT_SECTIONS
+    ):
+        return set(previous_resources) | set(resources)
+    return set(
+        name
+        for name in set(previous_resources) | set(resources)
+        if previous_resources.get(name) != resources.get(name)
+    )
+
+
+def relint(rules, filename, template, previous_records, changed, regions=None):
+    """Update previous_records for a template in which only `changed` resources differ
+
+    Records about unchanged resources are kept, located again in template as
+    resources before them may have moved. The changed resources are evaluated
+    again, and every check on the template as a whole
+    (root keys, resource type combinations, security group exposure) is
+    recomputed.
+    """
+
+    resources = template.get("Resources", {}) if isinstance(template, dict) else {}
+    if changed is None or not isinstance(resources, dict):
+        return run_rules(rules, filename, template, regions)
+
+    changed = set(changed)
+    kept = []
+    keys = {}
+    for record in previous_records:
+        name = resource_scope(record)
+        if name is None or name in changed or name not in resources:
+            continue
+        location = locate(template, record["path"], keys)
+        kept.append(
+            dict(
+                record,
+                filename=filename,
+                line=location[0] + 1 if location else 1,
+                column=location[1] + 1 if location else 1,
+            )
+        )
+
+    fresh = run_rules(rules, filename, template, regions, resource_names=changed)
+    return sorted(
+        kept + fresh, key=lambda record: (record["rule"], record["line"], record["column"])
+    )
+
+
+def run(
+    filename,
+    previous_file,
+    changed=None,
+    previous_template_file=None,
+    rules_dir=None,
+    regions=None,
+    out=None,
+):
+    """Re-lint filename given the JSON records of the last run, returns exit code"""
+
+    with open(previous_file) as records_file:
+        previous_records = json.load(records_file)
+
+    template, records = decode_template(filename)
+    if template is None:
+        json.dump(records, out, indent=1)
+        out.write("\n")
+        return 2
+
+    if changed is None and previous_template_file:
+        previous_template, _ = decode_template(previous_template_file)
+        changed = changed_resources(previous_template, template)
+
+    records = relint(
+        load_rules(rules_dir), filename, template, previous_records, changed, regions
+    )
+    json.dump(records, out, indent=1)
+    out.write("\n")
+    return 2 if records else 0
+
+
+def add_arguments(parser):
+    """Arguments of the relint command"""
+
+    parser.add_argument("template", help="template to lint")
+    parser.add_argument(
+        "--previous", required=True, help="JSON records of the last run, from --format json"
+    )
+    parser.add_argument("--changed", nargs="*", default=None, help="changed logical ids")
+    parser.add_argument(
+        "--previous-template",
+        default=None,
+        help="last linted version of the template, to work out the changed resources",
+    )
+    parser.add_argument("--rules-dir", default=RULES_DIR, help="directory with the AMS rules")
+    parser.add_argument(
+        "--regions", nargs="+", default=None, help="regions to validate templates against"
+    )
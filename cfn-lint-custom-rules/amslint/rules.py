@@ -0,0 +1,231 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+"""Loading and running the AMS rules outside of the cfn-lint command line"""
+
+import importlib
+import os
+import sys
+
+from cfnlint.decode import decode, decode_str
+from cfnlint.helpers import load_plugins
+from cfnlint.template import Template
+
+RULES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "rules")
+DEFAULT_REGIONS = ["us-east-1"]
+
+# Cost of the rules without a first_violation_cost class attribute, between the
+# cheap rules (the root keys, the resource types) and the expensive ones (the
+# security group ingress rules and their exposure analysis)
+DEFAULT_FIRST_VIOLATION_COST = 50
+
+
+def load_rules(rules_dir=None):
+    """Instantiate every AMS rule in rules_dir, sorted by rule id"""
+
+    rules = load_plugins(os.path.abspath(rules_dir or RULES_DIR))
+    return sorted(rules, key=lambda rule: rule.id)
+
+
+def first_violation_order(rules):
+    """rules sorted cheapest first by their first_violation_cost, then by id"""
+
+    def position(rule):
+        return getattr(rule, "first_violation_cost", DEFAULT_FIRST_VIOLATION_COST), rule.id
+
+    return sorted(rules, key=position)
+
+
+def import_rules_module(name, rules_dir=None):
+    """Import a helper module of the rules directory, the same instance the rules use"""
+
+    rules_dir = os.path.abspath(rules_dir or RULES_DIR)
+    if rules_dir not in sys.path:
+        sys.path.append(rules_dir)
+    return importlib.import_module(name)
+
+
+def plain(value):
+    """Template strings as plain str, parsed ones carry their location and do not pickle"""
+
+    return str(value) if isinstance(value, str) else value
+
+
+def to_record(
+    filename, rule_id, message, path=(), location=None, resource_type=None, attribute=None
+):
+    """Build a plain, picklable result record"""
+
+    return {
+        "filename": filename,
+        "rule": rule_id,
+        "message": plain(message),
+        "path": [plain(part) for part in path],
+        "line": location[0] + 1 if location else 1,
+        "column": location[1] + 1 if location else 1,
+        "resource_type": plain(resource_type),
+        "attribute": plain(attribute),
+    }
+
+
+def locate(template, path, keys=None):
+    """(line, column) of path in a parsed template, as Template.get_location_yaml() finds it
+
+    The deepest part of path present in the template is located by the marks
+    the decoder puts on keys and list items, None when there is none. keys
+    caches the keys of the mappings walked, pass the same dict for many paths.
+    """
+
+    keys = {} if keys is None else keys
+    location = None
+    node = template
+    for position, part in enumerate(path):
+        if isinstance(node, dict):
+            node_keys = keys.get(id(node))
+            if node_keys is None:
+                # The mapping is kept along so its id is not reused
+                node_keys = keys[id(node)] = (node, {key: key for key in node})
+            key = node_keys[1].get(part)
+            if key is None:
+                break
+            location = key
+            node = node[key]
+        elif isinstance(node, list) and isinstance(part, int) and -len(node) <= part < len(node):
+            node = node[part]
+            if position == len(path) - 1:
+                location = node
+        else:
+            break
+
+    mark = getattr(location, "start_mark", None)
+    return (mark.line, mark.column) if mark else None
+
+
+def decode_template(filename, content=None):
+    """Parse a template, or its content when given, returning (template, error records)"""
+
+    template, errors = decode(filename) if content is None else decode_str(content)
+    records = [
+        {
+            "filename": filename,
+            "rule": error.rule.id,
+            "message": error.message,
+            "path": [],
+            "line": error.linenumber,
+            "column": error.columnnumber,
+            "resource_type": None,
+            "attribute": None,
+        }
+        for error in errors or []
+    ]
+    return template, records
+
+
+def match_details(resources, rule_match):
+    """Resource type and offending attribute of a rule match, where known"""
+
+    path = rule_match.path
+    attribute = getattr(rule_match, "attribute", None)
+    if len(path) < 2 or path[0] != "Resources":
+        return None, attribute
+
+    resource = resources.get(path[1])
+    resource_type = resource.get("Type") if isinstance(resource, dict) else None
+    if attribute is None and len(path) > 2:
+        attribute = path[3] if path[2] == "Properties" and len(path) > 3 else path[2]
+    return resource_type, attribute
+
+
+def iter_rule_records(
+    rules,
+    filename,
+    template,
+    regions=None,
+    resource_names=None,
+    lazy=False,
+    first=False,
+    partial=False,
+):
+    """Run rules over a parsed template and yield result records
+
+    With lazy, rules providing iter_matches() are consumed as they produce
+    matches, bypassing the match() instrumentation. With resource_names the
+    rules only evaluate those resources, besides the checks that apply to the
+    template as a whole. With first, only the first violation is yielded and
+    the rules stop evaluating there, the cheapest rules running first. With
+    partial, template holds only some of the resources of filename and the
+    checks spanning several resources are skipped.
+    """
+
+    cfn = Template(filename, template, regions or DEFAULT_REGIONS)
+    if first:
+        rules = first_violation_order(rules)
+        lazy = True
+        resource_visitor = import_rules_module("_ams_visitor")
+        setattr(cfn, resource_visitor.FIRST_VIOLATION_ATTRIBUTE, True)
+    if resource_names is not None or partial:
+        resource_index = import_rules_module("_ams_index")
+        setattr(
+            cfn,
+            resource_index.INDEX_ATTRIBUTE,
+            resource_index.ResourceIndex(template, resource_names, partial),
+        )
+
+    resources = template.get("Resources", {}) if isinstance(template, dict) else {}
+    if not isinstance(resources, dict):
+        resources = {}
+
+    for rule in rules:
+        rule_matches = rule.match
+        if lazy and hasattr(rule, "iter_matches"):
+            rule_matches = rule.iter_matches
+        try:
+            for rule_match in rule_matches(cfn):
+                location = cfn.get_location_yaml(cfn.template, rule_match.path)
+                resource_type, attribute = match_details(resources, rule_match)
+                yield to_record(
+                    filename,
+                    rule.id,
+                    rule_match.message,
+                    rule_match.path,
+                    location,
+                    resource_type,
+                    attribute,
+                )
+                if first:
+                    return
+        except Exception as err:  # pylint: disable=broad-except
+            message = "Unknown exception while processing rule {0}: {1}"
+            yield to_record(filename, "E0002", message.format(rule.id, err))
+            if first:
+                return
+
+
+def run_rules(rules, filename, template, regions=None, resource_names=None):
+    """Run rules over a parsed template and return result records"""
+
+    return list(iter_rule_records(rules, filename, template, regions, resource_names))
+
+
+def iter_lint_file(rules, filename, regions=None, lazy=False, content=None, first=False):
+    """Parse a single template file and yield its records, see iter_rule_records()"""
+
+    template, records = decode_template(filename, content)
+    for record in records:
+        yield record
+        if first:
+            return
+    if template is not None:
+        for record in iter_rule_records(
+            rules, filename, template, regions, lazy=lazy, first=first
+        ):
+            yield record
+
+
+def lint_file(rules, filename, regions=None, content=None, first=False):
+    """Parse and lint a single template file, or the template content given for it
+
+    With first, stop at the first violation, see iter_rule_records().
+    """
+
+    return list(iter_lint_file(rules, filename, regions, content=content, first=first))
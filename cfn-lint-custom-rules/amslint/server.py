@@ -0,0 +1,270 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+"""Resident lint server keeping the AMS rules, policy tables and caches warm
+
+Templates are POSTed to /lint over local HTTP or a Unix socket and answered
+with their records, so clients skip importing cfn-lint and loading the rules.
+See amslint.client for a client that does not import cfn-lint at all.
+"""
+
+import json
+import os
+import socketserver
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from amslint import batch
+from amslint.cache import DEFAULT_MAX_BYTES, PolicyEntries, rule_pack_version, template_key
+from amslint.rules import RULES_DIR, import_rules_module, lint_file, load_rules
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Largest template accepted, CloudFormation itself stops at 1 MB
+MAX_TEMPLATE_BYTES = 8 * 1024 * 1024
+
+# Seconds an idle keep-alive connection is kept open
+KEEP_ALIVE_TIMEOUT = 60
+
+
+class Linter(object):
+    """Lints template content with rules loaded once
+
+    With one worker templates are linted in the server process, one at a time
+    since the rule instances are shared. With more, they are spread over a pool
+    of worker processes that each keep the rules loaded.
+    """
+
+    def __init__(self, rules_dir=None, regions=None, workers=1, cache=None, metrics=False):
+        self.rules_dir = rules_dir or RULES_DIR
+        self.regions = regions
+        self.rules = load_rules(self.rules_dir)
+        self.cache = cache
+        self.version = rule_pack_version(self.rules_dir)
+        self.policy = PolicyEntries(self.rules_dir)
+        self.lock = threading.Lock()
+
+        self.metrics = None
+        if metrics:
+            self.metrics = import_rules_module("_ams_metrics", self.rules_dir)
+            self.metrics.enable()
+
+        self.executor = None
+        if workers > 1:
+            self.executor = ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=batch.init_worker,
+                initargs=(self.rules_dir, regions, metrics),
+            )
+
+    def lint(self, filename, content, first=False):
+        """Records for a template's content, content being bytes
+
+        With first, only its first violation, see iter_rule_records().
+        """
+
+        key = None
+        if self.cache is not None:
+            version = self.version + batch.FIRST_VIOLATION_SUFFIX if first else self.version
+            key = template_key(content, version, self.regions)
+            with self.lock:
+                stale = self.cache.stale
+                records = self.cache.get(key, self.policy)
+                if self.metrics and self.cache.stale > stale:
+                    self.metrics.record("policy-invalidated", calls=1)
+            if records is not None:
+                for record in records:
+                    record["filename"] = filename
+                if self.metrics:
+                    with self.lock:
+                        self.metrics.record("result-cache", calls=1, cache_hits=1)
+                return records
+
+        text = content.decode("utf-8")
+        if self.executor is not None:
+            records, worker_metrics = self.executor.submit(
+                batch.lint_worker, filename, text, first
+            ).result()
+            if worker_metrics:
+                with self.lock:
+                    self.metrics.merge(worker_metrics)
+        else:
+            with self.lock:
+                records = lint_file(self.rules, filename, self.regions, text, first)
+
+        if key is not None:
+            dependencies = self.policy.dependencies(content)
+            with self.lock:
+                self.cache.put(key, records, dependencies)
+        return records
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+
+
+class LintRequestHandler(BaseHTTPRequestHandler):
+    """POST /lint?filename=NAME&format=json|text[&fail_fast=1], GET /health and GET /metrics
+
+    Connections are kept alive between requests, as pooling clients such as
+    amssubmit expect. A request whose body is not read closes its connection.
+    """
+
+    server_version = "amslint"
+    protocol_version = "HTTP/1.1"
+    timeout = KEEP_ALIVE_TIMEOUT
+
+    def do_GET(self):
+        linter = self.server.linter
+        path = urlparse(self.path).path
+        if path == "/health":
+            body = {"status": "ok", "rules": [rule.id for rule in linter.rules]}
+            self.respond(200, json.dumps(body) + "\n")
+        elif path == "/metrics" and linter.metrics:
+            with linter.lock:
+                text = linter.metrics.to_prometheus()
+            self.respond(200, text, "text/plain; version=0.0.4")
+        else:
+            self.respond(404, json.dumps({"error": "not found"}) + "\n")
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/lint":
+            self.respond(404, json.dumps({"error": "not found"}) + "\n", close=True)
+            return
+
+        query = parse_qs(url.query)
+        filename = query.get("filename", ["template"])[0]
+        output_format = query.get("format", ["json"])[0]
+        first = query.get("fail_fast", ["0"])[0].lower() not in ("0", "false", "")
+
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.respond(400, json.dumps({"error": "invalid Content-Length"}) + "\n", close=True)
+            return
+        if length > MAX_TEMPLATE_BYTES:
+            self.respond(413, json.dumps({"error": "template too large"}) + "\n", close=True)
+            return
+
+        try:
+            records = self.server.linter.lint(filename, self.rfile.read(length), first)
+        except UnicodeDecodeError:
+            self.respond(400, json.dumps({"error": "template is not UTF-8"}) + "\n")
+            return
+
+        if output_format == "text":
+            body = "".join(batch.format_text(record) + "\n" for record in records)
+            self.respond(200, body, "text/plain", violations=len(records))
+        else:
+            body = json.dumps(records, indent=1) + "\n"
+            self.respond(200, body, violations=len(records))
+
+    def respond(
+        self, status, body, content_type="application/json", violations=None, close=False
+    ):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        if violations is not None:
+            self.send_header("X-AMS-Violations", str(violations))
+        if close:
+            # Also sets close_connection
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def address_string(self):
+        # Unix socket clients have no address
+        return self.client_address[0] if self.client_address else "unix"
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        if self.server.verbose:
+            BaseHTTPRequestHandler.log_message(self, format, *args)
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(linter, host=DEFAULT_HOST, port=DEFAULT_PORT, socket_path=None, verbose=False):
+    """HTTP server answering lint requests with linter, on a TCP port or a Unix socket"""
+
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = ThreadingUnixHTTPServer(socket_path, LintRequestHandler)
+    else:
+        server = ThreadingHTTPServer((host, port), LintRequestHandler)
+    server.linter = linter
+    server.verbose = verbose
+    return server
+
+
+def run(
+    rules_dir=None,
+    regions=None,
+    workers=1,
+    cache=None,
+    metrics=False,
+    host=DEFAULT_HOST,
+    port=DEFAULT_PORT,
+    socket_path=None,
+    verbose=False,
+):
+    """Serve lint requests until interrupted, returns exit code"""
+
+    linter = Linter(rules_dir, regions, workers, cache, metrics)
+    server = make_server(linter, host, port, socket_path, verbose)
+    print(
+        "Serving {0} AMS rules on {1}".format(
+            len(linter.rules), socket_path or "http://{0}:{1}".format(host, port)
+        ),
+        flush=True,
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        linter.close()
+        if socket_path and os.path.exists(socket_path):
+            os.remove(socket_path)
+    return 0
+
+
+def add_arguments(parser):
+    """Arguments of the serve command"""
+
+    parser.add_argument("--rules-dir", default=RULES_DIR, help="directory with the AMS rules")
+    parser.add_argument(
+        "--regions", nargs="+", default=None, help="regions to validate templates against"
+    )
+    parser.add_argument("--host", default=DEFAULT_HOST, help="address to listen on")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="port to listen on")
+    parser.add_argument(
+        "--socket", default=None, dest="socket_path", help="listen on this Unix socket instead"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=1, help="worker processes linting templates in parallel"
+    )
+    parser.add_argument(
+        "--cache-dir", default=None, help="reuse results of unchanged templates from this directory"
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=DEFAULT_MAX_BYTES // (1024 * 1024),
+        help="cache size cap in MiB",
+    )
+    parser.add_argument(
+        "--metrics", action="store_true", help="record rule metrics, served on GET /metrics"
+    )
+    parser.add_argument("--verbose", action="store_true", help="log every request")
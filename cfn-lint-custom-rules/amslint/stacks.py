@@ -0,0 +1,283 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+"""Lint a parent stack together with its nested stacks and stack sets
+
+The parent and child templates form one graph, built as the templates are
+linted: each template is parsed once, by the worker that lints it, which also
+reports the child templates it refers to. Checks spanning the whole
+application, such as the AMS Patch restriction on EC2 instances and Auto
+Scaling groups, are then run over the graph.
+"""
+
+import json
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from urllib.parse import urlparse
+
+from amslint import batch
+from amslint.rules import (
+    RULES_DIR,
+    decode_template,
+    import_rules_module,
+    load_rules,
+    run_rules,
+    to_record,
+)
+
+STACK_TYPES = ("AWS::CloudFormation::Stack", "AWS::CloudFormation::StackSet")
+
+# The AMS Patch system supports either of these in an application, not both
+PATCH_CONFLICT = ("AWS::EC2::Instance", "AWS::AutoScaling::AutoScalingGroup")
+
+
+def locate_template(url, parent, search_paths=()):
+    """Local file a TemplateURL refers to, or None
+
+    Relative paths are taken from the parent template's directory. For S3 and
+    HTTPS URLs a file with the same name is looked for next to the parent and
+    in search_paths.
+    """
+
+    parsed = urlparse(url)
+    base = os.path.dirname(os.path.abspath(parent))
+    if parsed.scheme in ("", "file"):
+        candidate = os.path.join(base, parsed.path if parsed.scheme else url)
+        if os.path.isfile(candidate):
+            return os.path.normpath(candidate)
+
+    name = os.path.basename(parsed.path)
+    if not name:
+        return None
+    for directory in [base] + list(search_paths):
+        candidate = os.path.join(directory, name)
+        if os.path.isfile(candidate):
+            return os.path.normpath(os.path.abspath(candidate))
+    return None
+
+
+def analyse_template(rules, filename, regions=None, search_paths=(), rules_dir=None):
+    """Parse and lint one template, returns its node of the stack graph
+
+    The node holds the records, the resource types and the child templates as
+    (logical id, TemplateURL, local file or None).
+    """
+
+    node = {"records": [], "types": [], "children": []}
+    template, records = decode_template(filename)
+    node["records"] = records
+    if template is None:
+        return node
+
+    node["records"].extend(run_rules(rules, filename, template, regions))
+
+    resources = template.get("Resources", {}) if isinstance(template, dict) else {}
+    if not isinstance(resources, dict):
+        return node
+
+    resolver = import_rules_module("_ams_resolve", rules_dir).Resolver(
+        template, regions[0] if regions else None
+    )
+    types = set()
+    for name, resource in resources.items():
+        if not isinstance(resource, dict) or not isinstance(resource.get("Type"), str):
+            continue
+        types.add(str(resource["Type"]))
+        properties = resource.get("Properties")
+        if resource["Type"] not in STACK_TYPES or not isinstance(properties, dict):
+            continue
+        urls = resolver.values(properties.get("TemplateURL"))
+        for url in urls or [None]:
+            if isinstance(url, str):
+                path = locate_template(url, filename, search_paths)
+                node["children"].append((str(name), str(url), path))
+            else:
+                node["children"].append((str(name), None, None))
+
+    node["types"] = sorted(types)
+    return node
+
+
+def stack_worker(filename, search_paths, rules_dir):
+    """analyse_template() with the rules loaded by batch.init_worker, returns (node, metrics)"""
+
+    node = analyse_template(
+        batch._worker_rules, filename, batch._worker_regions, search_paths, rules_dir
+    )
+    return node, batch._worker_metrics.drain() if batch._worker_metrics else None
+
+
+def build_graph(
+    roots, rules_dir=None, regions=None, workers=None, search_paths=(), metrics=None
+):
+    """Lint roots and every template they nest, returns {filename: node}
+
+    Templates are dispatched to the workers as soon as a parent reports them, and
+    a template nested by several parents is only analysed once.
+    """
+
+    rules_dir = rules_dir or RULES_DIR
+    roots = list(dict.fromkeys(os.path.normpath(os.path.abspath(root)) for root in roots))
+    graph = {}
+
+    workers = workers or batch.available_cores()
+    if workers == 1:
+        rules = load_rules(rules_dir)
+        pending = list(roots)
+        while pending:
+            filename = pending.pop(0)
+            if filename in graph:
+                continue
+            graph[filename] = analyse_template(rules, filename, regions, search_paths, rules_dir)
+            pending.extend(path for _, _, path in graph[filename]["children"] if path)
+        return graph
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=batch.init_worker,
+        initargs=(rules_dir, regions, metrics is not None),
+    ) as executor:
+        futures = {}
+
+        def submit(filename):
+            futures[executor.submit(stack_worker, filename, search_paths, rules_dir)] = filename
+
+        for filename in roots:
+            submit(filename)
+        submitted = set(roots)
+
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                filename = futures.pop(future)
+                graph[filename], worker_metrics = future.result()
+                if worker_metrics:
+                    metrics.merge(worker_metrics)
+                for _, _, path in graph[filename]["children"]:
+                    if path and path not in submitted:
+                        submitted.add(path)
+                        submit(path)
+    return graph
+
+
+def application(graph, root):
+    """Templates reachable from root, in breadth first order"""
+
+    order = [root]
+    for filename in order:
+        for _, _, path in graph[filename]["children"]:
+            if path and path in graph and path not in order:
+                order.append(path)
+    return order
+
+
+def cross_stack_records(graph, root):
+    """Records for checks spanning every stack of the application rooted at root"""
+
+    templates = application(graph, root)
+    instances = [f for f in templates if PATCH_CONFLICT[0] in graph[f]["types"]]
+    groups = [f for f in templates if PATCH_CONFLICT[1] in graph[f]["types"]]
+
+    # A single template with both is reported by E3095 itself
+    if not any(instance != group for instance in instances for group in groups):
+        return []
+
+    base = os.path.dirname(root)
+    # noqa: E501
+    message = "AMS - Resources 'AWS::EC2::Instance' (in {0}) and 'AWS::AutoScaling::AutoScalingGroup' (in {1}) are not supported in the same application by the AMS Patch system"
+    return [
+        to_record(
+            root,
+            "E3095",
+            message.format(
+                ", ".join(os.path.relpath(f, base) for f in instances),
+                ", ".join(os.path.relpath(f, base) for f in groups),
+            ),
+            ["Resources"],
+        )
+    ]
+
+
+def unresolved_children(graph):
+    """Yield (parent, logical id, TemplateURL) of nested stacks without a local template"""
+
+    for filename, node in graph.items():
+        for name, url, path in node["children"]:
+            if path is None:
+                yield filename, name, url
+
+
+def run(
+    roots,
+    rules_dir=None,
+    regions=None,
+    workers=None,
+    search_paths=(),
+    output_format="text",
+    out=None,
+    metrics_file=None,
+):
+    """Lint applications rooted at roots per stack and across stacks, returns exit code"""
+
+    metrics = None
+    if metrics_file:
+        metrics = import_rules_module("_ams_metrics", rules_dir)
+        metrics.enable()
+
+    graph = build_graph(roots, rules_dir, regions, workers, search_paths, metrics)
+
+    records = []
+    reported = set()
+    for root in [os.path.normpath(os.path.abspath(root)) for root in roots]:
+        for filename in application(graph, root):
+            if filename not in reported:
+                reported.add(filename)
+                records.extend(graph[filename]["records"])
+        records.extend(cross_stack_records(graph, root))
+
+    for parent, name, url in unresolved_children(graph):
+        sys.stderr.write(
+            "amslint: {0}: template of nested stack {1} not found locally ({2})\n".format(
+                parent, name, url or "TemplateURL could not be resolved"
+            )
+        )
+
+    if output_format == "json":
+        json.dump(records, out, indent=1)
+        out.write("\n")
+    else:
+        for record in records:
+            out.write(batch.format_text(record) + "\n")
+
+    if metrics:
+        metrics.write(metrics_file)
+
+    return 2 if records else 0
+
+
+def add_arguments(parser):
+    """Arguments of the stacks command"""
+
+    parser.add_argument("templates", nargs="+", help="parent templates of the applications")
+    parser.add_argument(
+        "--search-path",
+        nargs="+",
+        default=[],
+        dest="search_paths",
+        help="directories holding the child templates of S3 or HTTPS TemplateURLs",
+    )
+    parser.add_argument("--rules-dir", default=RULES_DIR, help="directory with the AMS rules")
+    parser.add_argument(
+        "--regions", nargs="+", default=None, help="regions to validate templates against"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=None, help="worker processes (default: available cores)"
+    )
+    parser.add_argument("--format", choices=["text", "json"], default="text", dest="output_format")
+    parser.add_argument(
+        "--metrics",
+        default=None,
+        dest="metrics_file",
+        help="write per-rule timing and match counts to this file (.prom for Prometheus text)",
+    )
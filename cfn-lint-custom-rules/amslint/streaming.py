@@ -0,0 +1,191 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+"""Lint very large templates one resource at a time
+
+The template file is read as a stream of YAML events (JSON templates parse as
+YAML too). A first pass keeps every top-level section except Resources, which
+it skips without building anything. The second pass builds one resource at a
+time and runs the rules over a template holding just that resource and the
+sections intrinsic functions refer to. Peak memory therefore depends on the
+largest resource, not on the size of the template, and records come out
+while the file is still being read. Checks on the template as a whole run
+last, over the sections, one resource per type and the security groups with
+their ingress resources, whose rules together can expose a group.
+"""
+
+import yaml
+from cfnlint.decode.cfn_yaml import CfnParseError, NodeConstructor, multi_constructor
+from yaml.composer import Composer
+from yaml.events import (
+    CollectionEndEvent,
+    CollectionStartEvent,
+    MappingEndEvent,
+    MappingStartEvent,
+)
+from yaml.resolver import Resolver
+
+from amslint.rules import iter_lint_file, iter_rule_records, to_record
+
+# Sections intrinsic functions in a resource may refer to
+CONTEXT_SECTIONS = ("Parameters", "Mappings", "Conditions")
+
+# Resources kept for the last pass, E2599 checks the ingress rules of a
+# security group together wherever in the template they are
+GROUP_RESOURCE_TYPES = ("AWS::EC2::SecurityGroup", "AWS::EC2::SecurityGroupIngress")
+
+if yaml.__with_libyaml__:
+    from yaml.cyaml import CParser as EventParser
+else:
+    from yaml.parser import Parser
+    from yaml.reader import Reader
+    from yaml.scanner import Scanner
+
+    class EventParser(Reader, Scanner, Parser):
+        def __init__(self, stream):
+            Reader.__init__(self, stream)
+            Scanner.__init__(self)
+            Parser.__init__(self)
+
+
+class StreamLoader(EventParser, Composer, NodeConstructor, Resolver):
+    """YAML event stream building cfn-lint's located nodes one value at a time"""
+
+    def __init__(self, stream, filename):
+        EventParser.__init__(self, stream)
+        Composer.__init__(self)
+        NodeConstructor.__init__(self, filename)
+        Resolver.__init__(self)
+
+    def next_value(self):
+        """Build the next value of the stream"""
+
+        return self.construct_document(self.compose_node(None, None))
+
+    def skip_value(self):
+        """Skip the next value of the stream without building it"""
+
+        depth = 0
+        while True:
+            event = self.get_event()
+            if isinstance(event, CollectionStartEvent):
+                depth += 1
+            elif isinstance(event, CollectionEndEvent):
+                depth -= 1
+            if depth == 0:
+                return
+
+    def top_level(self):
+        """Yield the top-level keys, the caller consumes or skips each value"""
+
+        # Stream and document start
+        self.get_event()
+        self.get_event()
+        if not self.check_event(MappingStartEvent):
+            raise yaml.YAMLError("template is not a mapping")
+        self.get_event()
+        while not self.check_event(MappingEndEvent):
+            yield self.next_value()
+
+
+StreamLoader.add_multi_constructor("!", multi_constructor)
+
+
+def read_sections(filename):
+    """Top-level sections other than Resources, and the Resources key, in one pass"""
+
+    sections = {}
+    resources_key = None
+    with open(filename, encoding="utf-8") as stream:
+        loader = StreamLoader(stream, filename)
+        try:
+            for key in loader.top_level():
+                if key == "Resources":
+                    resources_key = key
+                    loader.skip_value()
+                else:
+                    sections[key] = loader.next_value()
+        finally:
+            loader.dispose()
+    return sections, resources_key
+
+
+def iter_resources(filename):
+    """Yield (logical id, resource) of the Resources section, one at a time"""
+
+    with open(filename, encoding="utf-8") as stream:
+        loader = StreamLoader(stream, filename)
+        try:
+            for key in loader.top_level():
+                if key != "Resources" or not loader.check_event(MappingStartEvent):
+                    loader.skip_value()
+                    continue
+                loader.get_event()
+                while not loader.check_event(MappingEndEvent):
+                    name = loader.next_value()
+                    yield name, loader.next_value()
+                loader.get_event()
+        finally:
+            loader.dispose()
+
+
+def error_record(filename, err):
+    """Record for a template that could not be parsed"""
+
+    if isinstance(err, CfnParseError):
+        match = err.matches[0]
+        location = (match.linenumber - 1, match.columnnumber - 1)
+        return to_record(filename, match.rule.id, match.message, (), location)
+    mark = getattr(err, "problem_mark", None)
+    message = getattr(err, "problem", None) or str(err)
+    return to_record(filename, "E0000", message, (), (mark.line, mark.column) if mark else None)
+
+
+def iter_stream_file(rules, filename, regions=None, lazy=True):
+    """Lint a template file resource by resource and yield records as they are found
+
+    lazy is passed on to iter_rule_records(), turn it off to keep the rules'
+    match() instrumentation. JSON the YAML parser rejects, e.g. indented with
+    tabs, is linted whole instead.
+    """
+
+    try:
+        sections, resources_key = read_sections(filename)
+    except (yaml.YAMLError, CfnParseError) as err:
+        if filename.endswith(".json"):
+            for record in iter_lint_file(rules, filename, regions, lazy=lazy):
+                yield record
+        else:
+            yield error_record(filename, err)
+        return
+
+    context = {key: value for key, value in sections.items() if key in CONTEXT_SECTIONS}
+    # One resource per type, for the checks on the combination of types
+    types = {}
+    groups = {}
+    if resources_key is not None:
+        try:
+            for name, resource in iter_resources(filename):
+                template = dict(context)
+                template[resources_key] = {name: resource}
+                for record in iter_rule_records(
+                    rules, filename, template, regions, lazy=lazy, partial=True
+                ):
+                    yield record
+
+                resource_type = resource.get("Type") if isinstance(resource, dict) else None
+                if isinstance(resource_type, str) and resource_type not in types:
+                    types[resource_type] = (name, {"Type": resource_type})
+                if resource_type in GROUP_RESOURCE_TYPES:
+                    groups[name] = resource
+        except (yaml.YAMLError, CfnParseError) as err:
+            yield error_record(filename, err)
+            return
+
+    # No resource is evaluated again, only the checks on the template as a whole
+    template = dict(sections)
+    if resources_key is not None:
+        template[resources_key] = dict(types.values())
+        template[resources_key].update(groups)
+    for record in iter_rule_records(rules, filename, template, regions, resource_names=()):
+        yield record
@@ -0,0 +1,172 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+"""Synthetic CloudFormation templates for benchmarking the AMS rules
+
+Run as `python benchmarks/generator.py OUT_DIR --templates 100 --resources 500`
+to write templates for the batch driver, or import generate_template().
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+
+# Resource type -> relative weight, covering every AMS rule plus plain supported types
+DEFAULT_TYPE_MIX = {
+    "AWS::S3::Bucket": 10,
+    "AWS::Lambda::Function": 10,
+    "AWS::EC2::SecurityGroup": 8,
+    "AWS::EC2::SecurityGroupIngress": 4,
+    "AWS::EC2::Instance": 4,
+    "AWS::AutoScaling::LaunchConfiguration": 4,
+    "AWS::RDS::DBInstance": 3,
+    "AWS::SecretsManager::Secret": 3,
+    "AWS::Elasticsearch::Domain": 2,
+    "AWS::S3::BucketPolicy": 2,
+    "AWS::SQS::Queue": 2,
+    "AWS::IoT::Thing": 1,
+}
+
+
+def ingress_rule(rng, violation_rate):
+    """A single ingress rule, violating the AMS allow-list with violation_rate"""
+
+    if rng.random() < violation_rate:
+        port = rng.choice([22, 3389, 8080])
+        return {"IpProtocol": "tcp", "FromPort": port, "ToPort": port, "CidrIp": "0.0.0.0/0"}
+    if rng.random() < 0.5:
+        port = rng.choice([80, 443])
+        return {"IpProtocol": "tcp", "FromPort": port, "ToPort": port, "CidrIp": "0.0.0.0/0"}
+    port = rng.randint(1024, 65535)
+    return {
+        "IpProtocol": "tcp",
+        "FromPort": port,
+        "ToPort": port,
+        "CidrIp": "10.{0}.{1}.0/24".format(rng.randint(0, 255), rng.randint(0, 255)),
+    }
+
+
+def nested_properties(depth, width=2):
+    """Nested mapping `depth` levels deep, to exercise property walkers"""
+
+    if depth <= 0:
+        return "leaf"
+    return {"Level{0}".format(i): nested_properties(depth - 1, width) for i in range(width)}
+
+
+def resource_properties(rng, resource_type, ingress_rules, violation_rate):
+    """Properties for resource_type, with AMS violations at violation_rate"""
+
+    violate = rng.random() < violation_rate
+
+    if resource_type == "AWS::EC2::SecurityGroup":
+        return {
+            "GroupDescription": "generated",
+            "SecurityGroupIngress": [
+                ingress_rule(rng, violation_rate) for _ in range(ingress_rules)
+            ],
+        }
+    if resource_type == "AWS::EC2::SecurityGroupIngress":
+        properties = ingress_rule(rng, violation_rate)
+        properties["GroupId"] = "sg-12345678"
+        return properties
+    if resource_type in ("AWS::EC2::Instance", "AWS::AutoScaling::LaunchConfiguration"):
+        profile = "ec2-default" if violate else "customer-ec2-profile"
+        return {"ImageId": "ami-12345678", "IamInstanceProfile": profile}
+    if resource_type == "AWS::RDS::DBInstance":
+        password = "plaintext" if violate else "{{resolve:secretsmanager:db-secret}}"
+        return {"DBInstanceClass": "db.t3.micro", "Engine": "mysql", "MasterUserPassword": password}
+    if resource_type == "AWS::SecretsManager::Secret":
+        if violate:
+            return {"SecretString": "plaintext"}
+        return {"GenerateSecretString": {"PasswordLength": 32}}
+    if resource_type == "AWS::Elasticsearch::Domain":
+        if violate:
+            return {"DomainName": "generated"}
+        return {"DomainName": "generated", "VPCOptions": {"SubnetIds": ["subnet-1"]}}
+    if resource_type == "AWS::S3::BucketPolicy":
+        return {"Bucket": "generated", "PolicyDocument": {"Statement": []}}
+    return {"Name": "generated"}
+
+
+def generate_template(
+    resources=100,
+    type_mix=None,
+    ingress_rules=5,
+    depth=0,
+    violation_rate=0.1,
+    seed=0,
+):
+    """Build a synthetic template
+
+    resources -- number of resources
+    type_mix -- resource type -> weight, defaults to DEFAULT_TYPE_MIX
+    ingress_rules -- ingress rules on each AWS::EC2::SecurityGroup
+    depth -- depth of an extra nested mapping added to every resource's Properties
+    violation_rate -- share of resources and ingress rules that violate AMS policy
+    seed -- random seed, the same arguments always produce the same template
+    """
+
+    rng = random.Random(seed)
+    type_mix = type_mix or DEFAULT_TYPE_MIX
+    types = sorted(type_mix)
+    weights = [type_mix[resource_type] for resource_type in types]
+
+    template = {
+        "AWSTemplateFormatVersion": "2010-09-09",
+        "Description": "Generated AMS benchmark template",
+        "Resources": {},
+    }
+    for number, resource_type in enumerate(rng.choices(types, weights, k=resources)):
+        properties = resource_properties(rng, resource_type, ingress_rules, violation_rate)
+        if depth:
+            properties["Nested"] = nested_properties(depth)
+        template["Resources"]["Resource{0}".format(number)] = {
+            "Type": resource_type,
+            "Properties": properties,
+        }
+    return template
+
+
+def parse_type_mix(value):
+    """Parse "Type=weight,Type=weight" into a type mix"""
+
+    type_mix = {}
+    for item in value.split(","):
+        resource_type, _, weight = item.partition("=")
+        type_mix[resource_type.strip()] = float(weight or 1)
+    return type_mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("out_dir", help="directory to write templates to")
+    parser.add_argument("--templates", type=int, default=10)
+    parser.add_argument("--resources", type=int, default=100)
+    parser.add_argument("--ingress-rules", type=int, default=5)
+    parser.add_argument("--depth", type=int, default=0)
+    parser.add_argument("--violation-rate", type=float, default=0.1)
+    parser.add_argument("--type-mix", type=parse_type_mix, default=None, help="Type=weight,...")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    for number in range(args.templates):
+        template = generate_template(
+            args.resources,
+            args.type_mix,
+            args.ingress_rules,
+            args.depth,
+            args.violation_rate,
+            args.seed + number,
+        )
+        path = os.path.join(args.out_dir, "template-{0:05d}.json".format(number))
+        with open(path, "w") as template_file:
+            json.dump(template, template_file, indent=1)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,184 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+"""Time and memory-profile each AMS rule's match() on synthetic templates
+
+Results are compared with benchmarks/baseline.json and regressions fail the
+run. Baseline numbers depend on the machine, so regenerate them with
+--save-baseline on the machine that runs the comparison.
+"""
+
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+from cfnlint.helpers import load_plugins
+from cfnlint.template import Template
+
+from generator import generate_template
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+RULES_DIR = os.path.join(os.path.dirname(BENCHMARKS_DIR), "rules")
+BASELINE_FILE = os.path.join(BENCHMARKS_DIR, "baseline.json")
+
+SCENARIOS = {
+    "small": {"resources": 100},
+    "large": {"resources": 3000},
+    "ingress-heavy": {
+        "resources": 200,
+        "ingress_rules": 200,
+        "type_mix": {"AWS::EC2::SecurityGroup": 1},
+    },
+    "nested": {"resources": 500, "depth": 6},
+}
+
+# Differences below these are noise whatever the relative change
+MIN_SECONDS_DELTA = 0.0005
+MIN_BYTES_DELTA = 16 * 1024
+
+
+def measure(function, repeat):
+    """Best wall time over repeat calls, and peak traced memory of one more call"""
+
+    best = None
+    gc.collect()
+    # Like timeit, keep garbage collection out of the timed runs
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+    finally:
+        gc.enable()
+
+    gc.collect()
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"seconds": best, "peak_bytes": peak}
+
+
+def run_scenario(rules, settings, repeat):
+    """Measure the resource index, the visitor and every rule on one scenario's template"""
+
+    # Imported late: the rules put their own directory on sys.path when loaded
+    from _ams_index import ResourceIndex, get_resource_index
+    from _ams_visitor import VISIT_ATTRIBUTE, Visit
+
+    cfn = Template("benchmark.json", generate_template(**settings))
+    results = {"index": measure(lambda: ResourceIndex(cfn.template), repeat)}
+
+    # Rules share the index in a real run, so it is built before the rest is measured
+    get_resource_index(cfn)
+    results["visitor"] = measure(lambda: Visit(cfn).complete(), repeat)
+
+    def match(rule):
+        # A fresh visit running only this rule's callbacks, so match() evaluates
+        # the rule rather than reading back matches found for another one
+        setattr(cfn, VISIT_ATTRIBUTE, Visit(cfn, [rule.id]))
+        rule.match(cfn)
+
+    for rule in rules:
+        results[rule.id] = measure(lambda: match(rule), repeat)
+    return results
+
+
+def compare(results, baseline, time_tolerance, memory_tolerance):
+    """Return a line for every measurement that regressed against the baseline
+
+    A measurement missing from the baseline fails too, it would otherwise
+    never be checked.
+    """
+
+    regressions = []
+    for scenario, measurements in sorted(results.items()):
+        for name, current in sorted(measurements.items()):
+            previous = baseline.get(scenario, {}).get(name)
+            if not previous:
+                regressions.append(
+                    "{0} {1}: not in the baseline, regenerate it with --save-baseline".format(
+                        scenario, name
+                    )
+                )
+                continue
+            seconds_delta = current["seconds"] - previous["seconds"]
+            if (
+                current["seconds"] > previous["seconds"] * (1 + time_tolerance)
+                and seconds_delta > MIN_SECONDS_DELTA
+            ):
+                regressions.append(
+                    "{0} {1}: {2:.2f}ms, baseline {3:.2f}ms".format(
+                        scenario, name, current["seconds"] * 1e3, previous["seconds"] * 1e3
+                    )
+                )
+            bytes_delta = current["peak_bytes"] - previous["peak_bytes"]
+            if (
+                current["peak_bytes"] > previous["peak_bytes"] * (1 + memory_tolerance)
+                and bytes_delta > MIN_BYTES_DELTA
+            ):
+                regressions.append(
+                    "{0} {1}: peak {2} bytes, baseline {3} bytes".format(
+                        scenario, name, current["peak_bytes"], previous["peak_bytes"]
+                    )
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--scenarios", nargs="+", choices=sorted(SCENARIOS), default=sorted(SCENARIOS)
+    )
+    parser.add_argument("--rules", nargs="+", default=None, help="rule ids to measure")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per measurement")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument(
+        "--save-baseline", action="store_true", help="store results as the new baseline"
+    )
+    parser.add_argument("--time-tolerance", type=float, default=0.5)
+    parser.add_argument("--memory-tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    rules = sorted(load_plugins(os.path.abspath(RULES_DIR)), key=lambda rule: rule.id)
+    if args.rules:
+        rules = [rule for rule in rules if rule.id in args.rules]
+
+    results = {}
+    print("{0:<14} {1:<8} {2:>10} {3:>14}".format("scenario", "rule", "ms", "peak bytes"))
+    for scenario in args.scenarios:
+        results[scenario] = run_scenario(rules, SCENARIOS[scenario], args.repeat)
+        for name, current in sorted(results[scenario].items()):
+            print(
+                "{0:<14} {1:<8} {2:>10.3f} {3:>14}".format(
+                    scenario, name, current["seconds"] * 1e3, current["peak_bytes"]
+                )
+            )
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as baseline_file:
+            json.dump(results, baseline_file, indent=2, sort_keys=True)
+            baseline_file.write("\n")
+        print("Saved baseline to {0}".format(args.baseline))
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("No baseline at {0}, run with --save-baseline".format(args.baseline))
+        return 0
+
+    with open(args.baseline) as baseline_file:
+        baseline = json.load(baseline_file)
+    regressions = compare(results, baseline, args.time_tolerance, args.memory_tolerance)
+    for regression in regressions:
+        print("REGRESSION " + regression)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
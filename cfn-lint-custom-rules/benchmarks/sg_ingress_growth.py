@@ -0,0 +1,148 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+"""Regression benchmark: lint many templates in one process with SecurityGroupIngress
+
+Memory and time per template must stay flat as the number of templates grows.
+Run as `python benchmarks/sg_ingress_growth.py --templates 2000`.
+"""
+
+import argparse
+import gc
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+from cfnlint.helpers import load_plugins
+from cfnlint.template import Template
+
+RULES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "rules")
+
+
+def build_template(violations):
+    """Return a template with one security group carrying `violations` bad ingress rules"""
+
+    ingress = [
+        {"IpProtocol": "tcp", "FromPort": 443, "ToPort": 443, "CidrIp": "0.0.0.0/0"},
+    ]
+    for port in range(violations):
+        ingress.append(
+            {"IpProtocol": "tcp", "FromPort": 1000 + port, "ToPort": 1000 + port, "CidrIp": "0.0.0.0/0"}
+        )
+
+    return {
+        "Resources": {
+            "SecurityGroup": {
+                "Type": "AWS::EC2::SecurityGroup",
+                "Properties": {"GroupDescription": "bench", "SecurityGroupIngress": ingress},
+            }
+        }
+    }
+
+
+def load_rule(rule_id):
+    """Load a single AMS rule from the rules directory"""
+
+    for rule in load_plugins(os.path.abspath(RULES_DIR)):
+        if rule.id == rule_id:
+            return rule
+    raise SystemExit("Rule {0} not found in {1}".format(rule_id, RULES_DIR))
+
+
+def lint_batches(rule, templates, batch, violations, measure):
+    """Lint `templates` templates, calling measure(elapsed) after every batch"""
+
+    elapsed = 0.0
+    for count in range(1, templates + 1):
+        cfn = Template("bench-{0}.yaml".format(count), build_template(violations))
+        start = time.perf_counter()
+        matches = rule.match(cfn)
+        elapsed += time.perf_counter() - start
+
+        if len(matches) != violations:
+            raise SystemExit(
+                "Template {0} produced {1} matches, expected {2}".format(
+                    count, len(matches), violations
+                )
+            )
+        del cfn, matches
+
+        if count % batch == 0:
+            measure(elapsed / batch)
+            elapsed = 0.0
+
+
+def run(templates, batch, violations, tolerance, memory_slack):
+    """Lint `templates` templates and report memory/time per batch"""
+
+    if templates // batch < 3:
+        raise SystemExit("At least 3 batches are needed, the first one only warms up")
+
+    rule = load_rule("E2599")
+
+    # Time and memory are measured in separate passes as tracemalloc slows down allocations
+    times = []
+    lint_batches(rule, templates, batch, violations, times.append)
+
+    memory = []
+
+    def measure_memory(_):
+        gc.collect()
+        memory.append(tracemalloc.get_traced_memory()[0])
+
+    tracemalloc.start()
+    lint_batches(rule, templates, batch, violations, measure_memory)
+    tracemalloc.stop()
+
+    batches = [
+        (batch * (number + 1), current, per_template)
+        for number, (current, per_template) in enumerate(zip(memory, times))
+    ]
+
+    print("{0:>10} {1:>14} {2:>16}".format("templates", "traced bytes", "us per template"))
+    for count, current, per_template in batches:
+        print("{0:>10} {1:>14} {2:>16.1f}".format(count, current, per_template * 1e6))
+
+    # The first batch includes warm-up allocations and is left out. Times are
+    # noisy, the median of the earlier half of the batches is compared with
+    # that of the later half.
+    measured = batches[1:]
+    half = len(measured) // 2
+    first_memory = measured[0][1]
+    last_memory = measured[-1][1]
+    first_time = statistics.median(per_template for _, _, per_template in measured[:half])
+    last_time = statistics.median(per_template for _, _, per_template in measured[-half:])
+    failed = False
+    if last_memory > max(first_memory * tolerance, first_memory + memory_slack):
+        print("Memory grew from {0} to {1} bytes".format(first_memory, last_memory))
+        failed = True
+    if last_time > first_time * tolerance:
+        print(
+            "Time per template grew from {0:.1f}us to {1:.1f}us".format(
+                first_time * 1e6, last_time * 1e6
+            )
+        )
+        failed = True
+
+    return 1 if failed else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--templates", type=int, default=2000, help="templates to lint")
+    parser.add_argument("--batch", type=int, default=200, help="templates per measurement")
+    parser.add_argument("--violations", type=int, default=5, help="bad ingress rules per template")
+    parser.add_argument(
+        "--tolerance", type=float, default=1.5, help="allowed later/earlier batches ratio"
+    )
+    parser.add_argument(
+        "--memory-slack", type=int, default=65536, help="allowed memory growth in bytes"
+    )
+    args = parser.parse_args()
+    return run(args.templates, args.batch, args.violations, args.tolerance, args.memory_slack)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,18 @@
 # Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
 # SPDX-License-Identifier: Apache-2.0
 
+import os
+import sys
 from cfnlint.rules import CloudFormationLintRule
-from cfnlint.rules import RuleMatch
+
+RULES_DIR = os.path.dirname(os.path.abspath(__file__))
+if RULES_DIR not in sys.path:
+    sys.path.append(RULES_DIR)
+
+from _ams_metrics import instrument  # noqa: E402
+from _ams_policy import load_policy  # noqa: E402
+from _ams_violation import Violation  # noqa: E402
+
 
 class AMSAllowedRootKeys(CloudFormationLintRule):
     """Check Base Template Settings"""
@@ -12,29 +22,23 @@ class AMSAllowedRootKeys(CloudFormationLintRule):
     description = "Ensure that only AMS approved top-level template keys are used"
     source_url = "https://aws.amazon.com/managed-services/features"
     tags = ["approved", "root", "keys"]
+    # Relative cost when only the first violation matters, cheapest rules run first
+    first_violation_cost = 10
 
-    required_keys = set(
-        [
-            "AWSTemplateFormatVersion",
-            "Description",
-            "Mappings",
-            "Parameters",
-            "Conditions",
-            "Resources",
-            "Outputs",
-            "Metadata",
-        ]
-    )
+    required_keys = load_policy()["allowed_root_keys"]
 
+    @instrument()
     def match(self, cfn):
         """AMS Supported Root Keys Matching"""
-        matches = []
+
+        return [violation.to_rule_match() for violation in self.iter_matches(cfn)]
+
+    def iter_matches(self, cfn):
+        """Yield a match per top-level key AMS does not support"""
 
         top_level = [section for section in cfn.template]
 
         for section in top_level:
             if section not in self.required_keys:
                 message = "AMS - Top level item {0} not supported by AMS"
-                matches.append(RuleMatch([section], message.format(section)))
-
-        return matches
+                yield Violation(self.id, [section], message, section)
@@ -1,8 +1,19 @@
 # Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
 # SPDX-License-Identifier: Apache-2.0
 
+import logging
+import os
+import sys
 from cfnlint.rules import CloudFormationLintRule
-from cfnlint.rules import RuleMatch
+
+RULES_DIR = os.path.dirname(os.path.abspath(__file__))
+if RULES_DIR not in sys.path:
+    sys.path.append(RULES_DIR)
+
+from _ams_metrics import instrument  # noqa: E402
+from _ams_policy import load_policy  # noqa: E402
+from _ams_violation import Violation  # noqa: E402
+from _ams_visitor import get_matches, register  # noqa: E402
 
 
 class AMSManualVerificationRequired(CloudFormationLintRule):
@@ -16,27 +27,36 @@ class AMSManualVerificationRequired(CloudFormationLintRule):
     source_url = "https://aws.amazon.com/managed-services/features"
     tags = ["resources", "support", "AMS", "review", "verification"]
 
+    resources_requiring_verification = load_policy()["manual_verification_resource_types"]
+
+    def __init__(self):
+        CloudFormationLintRule.__init__(self)
+        register(
+            self.id,
+            [
+                (resource_type, None, self.check_resource)
+                for resource_type in self.resources_requiring_verification
+            ],
+        )
+
+    @instrument()
     def match(self, cfn):
         """Check CloudFormation Resources"""
 
-        matches = []
+        return [violation.to_rule_match() for violation in self.iter_matches(cfn)]
 
-        resources_requiring_verification = (
-            "AWS::S3::BucketPolicy",
-            "AWS::SQS::QueuePolicy",
-            "AWS::SNS::TopicPolicy",
-        )
+    def iter_matches(self, cfn):
+        """Yield a match per resource needing manual verification"""
 
-        resources = cfn.get_resources()
+        return get_matches(cfn, self.id)
 
-        for resource_name, resource_values in resources.items():
-            path = ["Resources", resource_name]
-            res_type = resource_values.get("Type")
+    def check_resource(self, resource, attribute, visit):
+        """Match for a resource of a type needing manual verification"""
+
+        path = ["Resources", resource.name]
+        if self.logger.isEnabledFor(logging.DEBUG):
             self.logger.debug(
-                "Checking if %s resource requires manual verification by AMS", resource_name
+                "Checking if %s resource requires manual verification by AMS", resource.name
             )
-            if res_type in resources_requiring_verification:
-                message = "AMS - Template contains resource {0}. The permissions defined in this resource will be manually validated by the AMS Security Operations team"
-                matches.append(RuleMatch(path, message.format("/".join(map(str, path)))))
-
-        return matches
+        message = "AMS - Template contains resource {0}. The permissions defined in this resource will be manually validated by the AMS Security Operations team"
+        return [Violation(self.id, path, message, "/".join(map(str, path)))]
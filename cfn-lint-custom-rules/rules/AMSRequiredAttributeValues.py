@@ -1,11 +1,44 @@
 # Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
 # SPDX-License-Identifier: Apache-2.0
 
+import logging
+import os
 import re
+import sys
+from functools import lru_cache
 from cfnlint.rules import CloudFormationLintRule
-from cfnlint.rules import RuleMatch
 from cfnlint.helpers import REGEX_DYN_REF
 
+RULES_DIR = os.path.dirname(os.path.abspath(__file__))
+if RULES_DIR not in sys.path:
+    sys.path.append(RULES_DIR)
+
+from _ams_metrics import instrument  # noqa: E402
+from _ams_policy import load_policy  # noqa: E402
+from _ams_violation import SharedText, Violation  # noqa: E402
+from _ams_visitor import get_matches, register  # noqa: E402
+
+
+def compile_attribute_values(required_attribute_values):
+    """Compile the patterns of each (type, attribute) into one case-insensitive alternation"""
+
+    return {
+        resource_type: {
+            attribute: re.compile(
+                "|".join("(?:{0})".format(pattern) for pattern in patterns), re.IGNORECASE
+            )
+            for attribute, patterns in attributes.items()
+        }
+        for resource_type, attributes in required_attribute_values.items()
+    }
+
+
+@lru_cache(maxsize=8192)
+def value_allowed(pattern, attribute_value):
+    """Memoized check of a value against a compiled pattern, dynamic references always pass"""
+
+    return bool(REGEX_DYN_REF.match(attribute_value) or pattern.match(attribute_value))
+
 
 class AMSRequiredAttributeValues(CloudFormationLintRule):
     """Check Base Resource Configuration"""
@@ -16,21 +49,29 @@ class AMSRequiredAttributeValues(CloudFormationLintRule):
     source_url = "https://aws.amazon.com/managed-services/features"
     tags = ["resources", "attributes", "value", "support", "ams"]
 
-    required_attribute_values = {
-        "AWS::EC2::Instance": {
-            "IamInstanceProfile": [
-                r"customer[^ \n]*",
-                r"arn:aws:iam::[\\$\\{AWS::AccountId\\}|[0-9]+:instance-profile\/customer[^ \n]*",
-            ]
-        },
-        "AWS::AutoScaling::LaunchConfiguration": {
-            "IamInstanceProfile": [
-                r"customer[^ \n]*",
-                r"arn:aws:iam::[\\$\\{AWS::AccountId\\}|[0-9]+:instance-profile\/customer[^ \n]*",
-            ]
-        },
+    required_attribute_values = load_policy()["required_attribute_values"]
+
+    compiled_attribute_values = compile_attribute_values(required_attribute_values)
+
+    # Rendered into messages once, however many values do not match
+    attribute_value_texts = {
+        resource_type: {
+            attribute: SharedText(list(patterns)) for attribute, patterns in attributes.items()
+        }
+        for resource_type, attributes in required_attribute_values.items()
     }
 
+    def __init__(self):
+        CloudFormationLintRule.__init__(self)
+        register(
+            self.id,
+            [
+                (resource_type, attribute, self.check_attribute)
+                for resource_type, attributes in self.compiled_attribute_values.items()
+                for attribute in attributes
+            ],
+        )
+
     def match_allowed_values(self, attribute, attribute_value, resource_type):
         """Validate attribute as matching AMS rules
 
@@ -42,47 +83,45 @@ class AMSRequiredAttributeValues(CloudFormationLintRule):
 
         """
 
-        check_attributes = set(self.required_attribute_values[resource_type])
+        pattern = self.compiled_attribute_values[resource_type].get(attribute)
 
-        # Don't verify parameters or dynamic references
-        if (
-            attribute not in check_attributes
-            or not isinstance(attribute_value, str)
-            or re.match(REGEX_DYN_REF, attribute_value)
-        ):
+        # Don't verify values unresolved by get_resolver() or dynamic references
+        if pattern is None or not isinstance(attribute_value, str):
             return True
 
-        for pattern in self.required_attribute_values[resource_type][attribute]:
-            p = re.compile(pattern, re.IGNORECASE)
-            m = p.match(attribute_value)
-            if m:
-                return True
-
-        return False
+        return value_allowed(pattern, attribute_value)
 
+    @instrument(value_allowed)
     def match(self, cfn):
         """Check CloudFormation Resources"""
 
-        matches = []
-
-        for resource_name, resource_values in cfn.template.get("Resources", {}).items():
-            self.logger.debug("Validating Properties for %s resource", resource_name)
-
-            resource_type = resource_values.get("Type", "")
-
-            if resource_type in self.required_attribute_values.keys():
-                for attribute, attribute_value in resource_values["Properties"].items():
-                    if not self.match_allowed_values(attribute, attribute_value, resource_type):
-                        message = "AMS - Property {0} in {1} does not match with one of: {2}"
-                        matches.append(
-                            RuleMatch(
-                                ["Resources", resource_name, attribute],
-                                message.format(
-                                    attribute,
-                                    resource_values.get("Type", ""),
-                                    str(self.required_attribute_values[resource_type][attribute]),
-                                ),
-                            )
-                        )
-
-        return matches
+        return [violation.to_rule_match() for violation in self.iter_matches(cfn)]
+
+    def iter_matches(self, cfn):
+        """Yield a match per attribute value not in an AMS required format"""
+
+        return get_matches(cfn, self.id)
+
+    def check_attribute(self, resource, attribute, visit):
+        """Match if a value of the attribute is not in a required format, else None"""
+
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("Validating %s of %s resource", attribute, resource.name)
+
+        attribute_values = visit.resolver.values(resource.properties[attribute])
+        if not all(
+            self.match_allowed_values(attribute, value, resource.type)
+            for value in attribute_values
+        ):
+            message = "AMS - Property {0} in {1} does not match with one of: {2}"
+            return [
+                Violation(
+                    self.id,
+                    ["Resources", resource.name, attribute],
+                    message,
+                    attribute,
+                    resource.type,
+                    self.attribute_value_texts[resource.type][attribute],
+                )
+            ]
+        return None
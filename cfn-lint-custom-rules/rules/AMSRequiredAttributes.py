@@ -1,8 +1,19 @@
 # Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
 # SPDX-License-Identifier: Apache-2.0
 
+import logging
+import os
+import sys
 from cfnlint.rules import CloudFormationLintRule
-from cfnlint.rules import RuleMatch
+
+RULES_DIR = os.path.dirname(os.path.abspath(__file__))
+if RULES_DIR not in sys.path:
+    sys.path.append(RULES_DIR)
+
+from _ams_metrics import instrument  # noqa: E402
+from _ams_policy import load_policy  # noqa: E402
+from _ams_violation import SharedText, Violation  # noqa: E402
+from _ams_visitor import get_matches, register  # noqa: E402
 
 
 class AMSRequiredAttributes(CloudFormationLintRule):
@@ -14,37 +25,50 @@ class AMSRequiredAttributes(CloudFormationLintRule):
     source_url = "https://aws.amazon.com/managed-services/features"
     tags = ["resources", "attributes", "format", "support", "ams"]
 
+    required_attributes = load_policy()["required_attributes"]
+
+    # Rendered into messages once, however many resources miss them
+    required_attribute_texts = {
+        resource_type: SharedText(list(attributes))
+        for resource_type, attributes in required_attributes.items()
+    }
+
+    def __init__(self):
+        CloudFormationLintRule.__init__(self)
+        register(
+            self.id,
+            [
+                (resource_type, None, self.check_resource)
+                for resource_type in self.required_attributes
+            ],
+        )
+
+    @instrument()
     def match(self, cfn):
         """Check CloudFormation Resources"""
 
-        matches = []
-        required_attributes = {"AWS::Elasticsearch::Domain": ["VPCOptions"]}
+        return [violation.to_rule_match() for violation in self.iter_matches(cfn)]
 
-        for resource_name, resource_values in cfn.template.get("Resources", {}).items():
+    def iter_matches(self, cfn):
+        """Yield a match per resource missing required attributes"""
 
-            self.logger.debug("Validating Properties for %s resource", resource_name)
+        return get_matches(cfn, self.id)
 
-            matched = False
-            resource_type = resource_values.get("Type", "")
+    def check_resource(self, resource, attribute, visit):
+        """Match if the resource misses required attributes, else None"""
 
-            if resource_type in required_attributes.keys():
-                check_attributes = required_attributes[resource_type]
-                resource_attributes = set(
-                    [attribute for attribute, _ in resource_values["Properties"].items()]
-                )
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("Validating Properties for %s resource", resource.name)
 
-                for attribute in check_attributes:
-                    if attribute not in resource_attributes:
-                        matched = True
-                        break
-
-                if matched:
-                    message = "AMS - Resource {} missing one of required property attributes: {}."
-                    matches.append(
-                        RuleMatch(
-                            ["Resources", resource_name],
-                            message.format(resource_type, check_attributes),
-                        )
-                    )
-
-        return matches
+        if not resource.property_keys.issuperset(self.required_attributes[resource.type]):
+            message = "AMS - Resource {} missing one of required property attributes: {}."
+            return [
+                Violation(
+                    self.id,
+                    ["Resources", resource.name],
+                    message,
+                    resource.type,
+                    self.required_attribute_texts[resource.type],
+                )
+            ]
+        return None
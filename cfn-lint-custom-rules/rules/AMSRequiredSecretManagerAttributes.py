@@ -1,8 +1,70 @@
 # Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
 # SPDX-License-Identifier: Apache-2.0
 
+import logging
+import os
+import re
+import sys
 from cfnlint.rules import CloudFormationLintRule
-from cfnlint.rules import RuleMatch
+
+RULES_DIR = os.path.dirname(os.path.abspath(__file__))
+if RULES_DIR not in sys.path:
+    sys.path.append(RULES_DIR)
+
+from _ams_metrics import instrument  # noqa: E402
+from _ams_policy import load_policy  # noqa: E402
+from _ams_resolve import REGEX_SUB_VARIABLE, UNRESOLVED  # noqa: E402
+from _ams_violation import Violation  # noqa: E402
+from _ams_visitor import get_matches, register  # noqa: E402
+
+# Dynamic references, compiled once:
+#   {{resolve:secretsmanager:secret-id[:SecretString[:json-key[:version-stage[:version-id]]]]}}
+#   {{resolve:ssm-secure:parameter-name[:version]}}
+# where secret-id is a secret name or ARN
+REGEX_SECRET_REFERENCE = re.compile(
+    r"\{\{resolve:(?:"
+    r"secretsmanager:(?:arn:[\w-]+:secretsmanager:[\w-]*:\d*:secret:)?[^:{}\s]+"
+    r"(?::(?:SecretString)?(?::[^:{}]*){0,3})?"
+    r"|ssm-secure:[^:{}\s]+(?::\d+)?"
+    r")\}\}"
+)
+
+# Stands in for the variables of an Fn::Sub reference only known at deployment,
+# digits being valid wherever a variable can be in the grammar: names, account
+# ids and versions
+SUB_PLACEHOLDER = "0"
+
+# Separates the property names of a nested attribute path, "*" standing for
+# every item of a list or value of a map
+PATH_SEPARATOR = "."
+ANY_ITEM = "*"
+
+
+def is_secret_reference(value):
+    """True if value is a Secrets Manager or SSM SecureString dynamic reference
+
+    An Fn::Sub is one when its template string is, whatever its variables hold.
+    """
+
+    if isinstance(value, dict) and len(value) == 1 and "Fn::Sub" in value:
+        value = value["Fn::Sub"]
+        if isinstance(value, list) and value:
+            value = value[0]
+        if isinstance(value, str):
+            value = REGEX_SUB_VARIABLE.sub(SUB_PLACEHOLDER, value)
+    return isinstance(value, str) and REGEX_SECRET_REFERENCE.fullmatch(value) is not None
+
+
+def compile_paths(attributes_by_type):
+    """Resource type -> top-level property -> [(attribute path, remaining steps)]"""
+
+    index = {}
+    for resource_type, attribute_paths in attributes_by_type.items():
+        by_property = index.setdefault(resource_type, {})
+        for attribute_path in attribute_paths:
+            steps = tuple(attribute_path.split(PATH_SEPARATOR))
+            by_property.setdefault(steps[0], []).append((attribute_path, steps[1:]))
+    return index
 
 
 class AMSRequiredSecretManagerAttributes(CloudFormationLintRule):
@@ -14,45 +76,104 @@ class AMSRequiredSecretManagerAttributes(CloudFormationLintRule):
     source_url = "https://aws.amazon.com/managed-services/features"
     tags = ["resources", "attributes", "secrets", "manager", "support", "AMS"]
 
+    resources_require_secrets_manager = load_policy()["secrets_manager_attributes"]
+
+    # Attribute paths, "Users.*.Password", split once and keyed by their first property
+    attribute_paths = compile_paths(resources_require_secrets_manager)
+
+    def __init__(self):
+        CloudFormationLintRule.__init__(self)
+        register(
+            self.id,
+            [
+                (resource_type, attribute, self.check_attribute)
+                for resource_type, paths in self.attribute_paths.items()
+                for attribute in paths
+            ],
+        )
+
+    @instrument()
     def match(self, cfn):
         """Check CloudFormation Resources"""
 
-        matches = []
-
-        resources_require_secrets_manager = {
-            "AWS::RDS::DBInstance": ["MasterUserPassword", "TdeCredentialPassword"],
-            "AWS::RDS::DBCluster": ["MasterUserPassword"],
-            "AWS::ElastiCache::ReplicationGroup": ["AuthToken"],
-            "AWS::DMS::Certificate": ["CertificatePem", "CertificateWallet"],
-            "AWS::DMS::Endpoint": ["Password"],
-            "AWS::DocDB::DBCluster": ["MasterUserPassword"],
-            "AWS::CodePipeline::Webhook": ["SecretToken"],
-        }
-
-        for resource_name, resource_values in cfn.template.get("Resources", {}).items():
-            self.logger.debug("Validating Properties for %s resource", resource_name)
-
-            resource_type = resource_values.get("Type", "")
-
-            if resource_type in resources_require_secrets_manager.keys():
-                check_attributes = set(resources_require_secrets_manager[resource_type])
-
-                for attribute, attribute_property in resource_values["Properties"].items():
-                    if attribute in check_attributes and any(
-                        [
-                            not isinstance(attribute_property, str),
-                            not attribute_property.startswith(
-                                ("{{resolve:secretsmanager:", "{{resolve:ssm-secure:")
-                            ),
-                            not attribute_property.endswith("}}"),
-                        ]
-                    ):
-                        # noqa: E501
-                        message = "AMS - Property {0} is only allowed with Secrets Manager/Systems Manager Parameter Store(Secure String Parameter)"
-                        matches.append(
-                            RuleMatch(
-                                ["Resources", resource_name, attribute], message.format(attribute)
-                            )
+        return [violation.to_rule_match() for violation in self.iter_matches(cfn)]
+
+    def iter_matches(self, cfn):
+        """Yield a match per secret attribute not using a dynamic reference"""
+
+        return get_matches(cfn, self.id)
+
+    def check_attribute(self, resource, attribute, visit):
+        """Matches for the values at the attribute's paths that are not dynamic references"""
+
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("Validating %s of %s resource", attribute, resource.name)
+
+        violations = None
+        seen = set()
+        resolver = visit.resolver
+        for attribute_path, steps in self.attribute_paths[resource.type][attribute]:
+            # Every value the path can be deployed with must be a reference
+            for path, value in self.path_values(
+                resolver, (attribute,), resource.properties[attribute], steps
+            ):
+                if is_secret_reference(value) or path in seen:
+                    continue
+                seen.add(path)
+                # noqa: E501
+                message = "AMS - Property {0} is only allowed with Secrets Manager/Systems Manager Parameter Store(Secure String Parameter)"
+                name = PATH_SEPARATOR.join(map(str, path))
+                if violations is None:
+                    violations = []
+                if steps:
+                    violations.append(
+                        Violation(
+                            self.id,
+                            ("Resources", resource.name) + path,
+                            message,
+                            name,
+                            attribute=attribute_path,
                         )
+                    )
+                else:
+                    violations.append(
+                        Violation(self.id, ("Resources", resource.name) + path, message, name)
+                    )
+                if visit.first:
+                    return violations
+        return violations
+
+    def path_values(self, resolver, path, value, steps):
+        """Yield (path, value) for the values at steps below value, resolving intrinsics
+
+        Each value is visited at most once per step, so the walk is linear in
+        the size of the property. A value only known at deployment is yielded
+        as is, an Fn::Sub for is_secret_reference() to check and anything else
+        a violation.
+        """
+
+        for candidate in resolver.candidates(value):
+            if candidate is UNRESOLVED:
+                yield path, value
+                continue
+            if not steps:
+                yield path, candidate
+                continue
+
+            step = steps[0]
+            if step == ANY_ITEM:
+                if isinstance(candidate, list):
+                    items = enumerate(candidate)
+                elif isinstance(candidate, dict):
+                    items = candidate.items()
+                else:
+                    continue
+            elif isinstance(candidate, dict) and step in candidate:
+                items = ((step, candidate[step]),)
+            else:
+                # Absent, not a secret to check
+                continue
 
-        return matches
+            for key, item in items:
+                for found in self.path_values(resolver, path + (key,), item, steps[1:]):
+                    yield found
@@ -1,8 +1,32 @@
 # Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
 # SPDX-License-Identifier: Apache-2.0
 
+import logging
+import os
+import sys
 from cfnlint.rules import CloudFormationLintRule
-from cfnlint.rules import RuleMatch
+
+RULES_DIR = os.path.dirname(os.path.abspath(__file__))
+if RULES_DIR not in sys.path:
+    sys.path.append(RULES_DIR)
+
+from _ams_index import get_resource_index  # noqa: E402
+from _ams_metrics import instrument, record  # noqa: E402
+from _ams_policy import load_policy  # noqa: E402
+from _ams_violation import Violation  # noqa: E402
+
+
+def compile_resource_types(resource_types):
+    """Split an allow-list into exact types and wildcard ("Service::*") services"""
+
+    exact_types = set()
+    services = set()
+    for resource_type in resource_types:
+        if resource_type.endswith("::*"):
+            services.add(resource_type[: -len("::*")])
+        else:
+            exact_types.add(resource_type)
+    return frozenset(exact_types), frozenset(services)
 
 
 class AMSResourceSupported(CloudFormationLintRule):
@@ -13,155 +37,64 @@ class AMSResourceSupported(CloudFormationLintRule):
     description = "Verify that resources are supported by AMS"
     source_url = "https://aws.amazon.com/managed-services/features"
     tags = ["resources", "support", "AMS"]
+    # One lookup per resource type, run right after the root keys
+    first_violation_cost = 20
+
+    valid_resource_types = load_policy()["valid_resource_types"]
 
+    supported_resource_types, supported_services = compile_resource_types(valid_resource_types)
+
+    def is_supported(self, resource_type):
+        """Check a resource type against the compiled allow-list"""
+
+        if not isinstance(resource_type, str):
+            return False
+        if resource_type.startswith("AWS::"):
+            resource_type = resource_type[len("AWS::"):]
+        return (
+            resource_type in self.supported_resource_types
+            or resource_type.split("::", 1)[0] in self.supported_services
+        )
+
+    @instrument()
     def match(self, cfn):
         """Check CloudFormation Resources"""
 
-        matches = []
-        resources_to_check = []
-
-        valid_resource_types = [
-            'AmazonMQ::*',
-            'ApiGateway::*',
-            'ApiGatewayV2::*',
-            'AppSync::*',
-            'Athena::*',
-            'ApplicationAutoScaling::*',
-            'AutoScaling::AutoScalingGroup',
-            'AutoScaling::LaunchConfiguration',
-            'AutoScaling::LifecycleHook',
-            'AutoScaling::ScalingPolicy',
-            'AutoScaling::ScheduledAction',
-            'Batch::ComputeEnvironment',
-            'Batch::JobDefinition',
-            'Batch::JobQueue',
-            'CertificateManager::*',
-            'CloudFormation::CustomResource',
-            'CloudFormation::Designer',
-            'CloudFormation::WaitCondition',
-            'CloudFormation::WaitConditionHandle',
-            'CloudFront::CloudFrontOriginAccessIdentity',
-            'CloudFront::Distribution',
-            'CloudFront::StreamingDistribution',
-            'CloudWatch::*',
-            'CodeBuild::*',
-            'CodeCommit::*',
-            'CodeDeploy::*',
-            'CodePipeline::*',
-            'Cognito::*',
-            'Custom::*',
-            'DMS::Certificate',
-            'DMS::Endpoint',
-            'DMS::EventSubscription',
-            'DMS::ReplicationInstance',
-            'DMS::ReplicationSubnetGroup',
-            'DMS::ReplicationTask',
-            'DocDB::*',
-            'DynamoDB::*',
-            'EC2::EIP',
-            'EC2::EIPAssociation',
-            'EC2::Host',
-            'EC2::Instance',
-            'EC2::LaunchTemplate',
-            'EC2::NetworkInterface',
-            'EC2::NetworkInterfaceAttachment',
-            'EC2::SecurityGroup',
-            'EC2::SecurityGroupEgress',
-            'EC2::SecurityGroupIngress',
-            'EC2::Volume',
-            'EC2::VolumeAttachment',
-            'ECR::*',
-            'ECS::*',
-            'EFS::FileSystem',
-            'EFS::MountTarget',
-            'ElastiCache::*',
-            'ElasticLoadBalancing::LoadBalancer',
-            'ElasticLoadBalancingV2::Listener',
-            'ElasticLoadBalancingV2::ListenerCertificate',
-            'ElasticLoadBalancingV2::ListenerRule',
-            'ElasticLoadBalancingV2::LoadBalancer',
-            'ElasticLoadBalancingV2::TargetGroup',
-            'Elasticsearch::*',
-            'Events::*',
-            'FSx::*',
-            'Glue::*',
-            'Inspector::*',
-            'KMS::Alias',
-            'KMS::Key',
-            'Kinesis::*',
-            'KinesisAnalytics::*',
-            'KinesisFirehose::*',
-            'LakeFormation::*',
-            'Lambda::*',
-            'Logs::LogGroup',
-            'Logs::LogStream',
-            'Logs::MetricFilter',
-            'Logs::SubscriptionFilter',
-            'MediaConvert::*',
-            'MediaStore::*',
-            'MSK::Cluster',
-            'RDS::DBCluster',
-            'RDS::DBClusterParameterGroup',
-            'RDS::DBInstance',
-            'RDS::DBParameterGroup',
-            'RDS::DBSubnetGroup',
-            'RDS::EventSubscription',
-            'RDS::OptionGroup',
-            'Redshift::Cluster',
-            'Redshift::ClusterParameterGroup',
-            'Redshift::ClusterSubnetGroup',
-            'Route53::*',
-            'S3::Bucket',
-            'S3::BucketPolicy',
-            'SageMaker::*',
-            'SDB::*',
-            'SES::*',
-            'SNS::*',
-            'SQS::Queue',
-            'SQS::QueuePolicy',
-            'SSM::Parameter',
-            'SecretsManager::*',
-            'SecurityHub::*',
-            'StepFunctions::*',
-            'Synthetics::Canary',
-            'Transfer::*',
-            'WAF::*',
-            'WAFRegional::*',
-            'WAFv2::*',
-            'WorkSpaces::*',
-        ]
-
-        resources = cfn.get_resources()
-
-        for resource_name, resource_values in resources.items():
+        return [violation.to_rule_match() for violation in self.iter_matches(cfn)]
 
+    def iter_matches(self, cfn):
+        """Yield a match per unsupported resource and resource combination"""
+
+        index = get_resource_index(cfn)
+        record(self.id, resources=len(index.resources) + len(index.untyped))
+        debug = self.logger.isEnabledFor(logging.DEBUG)
+
+        for resource_name in index.untyped:
             path = ["Resources", resource_name]
+            message = "AMS - {0} Type key is missing"
+            yield Violation(self.id, path, message, "/".join(map(str, path)))
 
-            if "Type" not in resource_values:
-                message = "AMS - {0} Type key is missing"
-                matches.append(RuleMatch(path, message.format("/".join(map(str, path)))))
-                continue
+        # One decision per distinct type rather than per resource
+        unsupported = set(
+            resource_type for resource_type in index.types if not self.is_supported(resource_type)
+        )
 
-            self.logger.debug("Validating %s as supported by AMS", resource_name)
+        for resource in index.resources:
 
-            current_resource_type = resource_values.get("Type").replace("AWS::", "")
-            resources_to_check.append(current_resource_type)
+            path = ["Resources", resource.name]
 
-            if valid_resource_types or resources_to_check:
-                resources = set(resources_to_check) - set(valid_resource_types)
+            if debug:
+                self.logger.debug("Validating %s as supported by AMS", resource.name)
 
-                if resources:
-                    for resource in resources:
-                        if (
-                            (resource.split("::"))[0]
-                        ) + "::*" not in valid_resource_types and resource == current_resource_type:
-                            message = "AMS - {0} Resource not supported"
-                            matches.append(RuleMatch(path, message.format("/".join(map(str, path)))))
+            if not isinstance(resource.type, str) or resource.type in unsupported:
+                message = "AMS - {0} Resource not supported"
+                yield Violation(self.id, path, message, "/".join(map(str, path)))
 
-        # Patch system does not support combinations of EC2+ASG
-        if "EC2::Instance" in resources_to_check and "AutoScaling::AutoScalingGroup" in resources_to_check:
+        # Patch system does not support combinations of EC2+ASG, a check on the whole template
+        if (
+            "AWS::EC2::Instance" in index.all_types
+            and "AWS::AutoScaling::AutoScalingGroup" in index.all_types
+        ):
             # noqa: E501
             message = "AMS - Resources 'AWS::EC2::Instance' and 'AWS::AutoScaling::AutoScalingGroup' are not supported in the same stack by the AMS Patch system"
-            matches.append(RuleMatch(path, message))
-
-        return matches
+            yield Violation(self.id, ["Resources"], message)
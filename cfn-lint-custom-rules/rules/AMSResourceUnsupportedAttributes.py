@@ -1,8 +1,19 @@
 # Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
 # SPDX-License-Identifier: Apache-2.0
 
+import logging
+import os
+import sys
 from cfnlint.rules import CloudFormationLintRule
-from cfnlint.rules import RuleMatch
+
+RULES_DIR = os.path.dirname(os.path.abspath(__file__))
+if RULES_DIR not in sys.path:
+    sys.path.append(RULES_DIR)
+
+from _ams_metrics import instrument  # noqa: E402
+from _ams_policy import load_policy  # noqa: E402
+from _ams_violation import Violation  # noqa: E402
+from _ams_visitor import get_matches, register  # noqa: E402
 
 
 class AMSResourceUnsupportedAttributes(CloudFormationLintRule):
@@ -14,33 +25,39 @@ class AMSResourceUnsupportedAttributes(CloudFormationLintRule):
     source_url = "https://aws.amazon.com/managed-services/features"
     tags = ["resources", "attributes", "support", "AMS"]
 
+    invalid_resource_attributes = load_policy()["unsupported_attributes"]
+
+    def __init__(self):
+        CloudFormationLintRule.__init__(self)
+        register(
+            self.id,
+            [
+                (resource_type, attribute, self.check_attribute)
+                for resource_type, attributes in self.invalid_resource_attributes.items()
+                for attribute in attributes
+            ],
+        )
+
+    @instrument()
     def match(self, cfn):
         """Check CloudFormation Resources"""
 
-        matches = []
-
-        invalid_resource_attributes = {
-            "AWS::SecretsManager::Secret": ["SecretString"],
-            "AWS::DMS::Endpoint": ["MongoDbSettings"],
-            "AWS::EC2::LaunchTemplate": ["KeyName"]
-        }
+        return [violation.to_rule_match() for violation in self.iter_matches(cfn)]
 
-        for resource_name, resource_values in cfn.template.get("Resources", {}).items():
-            self.logger.debug("Validating Properties for %s resource", resource_name)
+    def iter_matches(self, cfn):
+        """Yield a match per attribute AMS does not support"""
 
-            resource_type = resource_values.get("Type", "")
+        return get_matches(cfn, self.id)
 
-            if resource_type in invalid_resource_attributes.keys():
-                check_attributes = set(invalid_resource_attributes[resource_type])
+    def check_attribute(self, resource, attribute, visit):
+        """Match for an unsupported attribute the resource has"""
 
-                for attribute, _ in resource_values["Properties"].items():
-                    if attribute in check_attributes:
-                        message = "AMS - Attribute {0} for resource {1} is not supported by AMS"
-                        matches.append(
-                            RuleMatch(
-                                ["Resources", resource_name, attribute],
-                                message.format(attribute, resource_name),
-                            )
-                        )
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("Validating %s of %s resource", attribute, resource.name)
 
-        return matches
+        message = "AMS - Attribute {0} for resource {1} is not supported by AMS"
+        return [
+            Violation(
+                self.id, ["Resources", resource.name, attribute], message, attribute, resource.name
+            )
+        ]
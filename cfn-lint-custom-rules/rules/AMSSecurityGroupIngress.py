@@ -2,8 +2,197 @@
 # SPDX-License-Identifier: Apache-2.0
 
 import ipaddress
+import itertools
+import os
+import re
+import sys
+from array import array
+from bisect import bisect_left
+from functools import lru_cache
 from cfnlint.rules import CloudFormationLintRule
-from cfnlint.rules import RuleMatch
+
+RULES_DIR = os.path.dirname(os.path.abspath(__file__))
+if RULES_DIR not in sys.path:
+    sys.path.append(RULES_DIR)
+
+from _ams_index import get_resource_index  # noqa: E402
+from _ams_metrics import instrument  # noqa: E402
+from _ams_policy import load_policy  # noqa: E402
+from _ams_resolve import UNRESOLVED, get_resolver  # noqa: E402
+from _ams_visitor import get_matches, register  # noqa: E402
+from _ams_violation import SharedText, Violation  # noqa: E402
+
+INGRESS_KEY_FIELDS = ("IpProtocol", "FromPort", "ToPort")
+# Source attributes checked for "any IP" exposure, in the order they are evaluated
+INGRESS_CIDR_FIELDS = ("CidrIp", "CidrIpv6")
+
+PROTOCOL_NUMBERS = {"tcp": "6", "udp": "17", "icmp": "1", "icmpv6": "58", "all": "-1"}
+ALL_PORTS = (0, 65535)
+REGEX_IPV4_CIDR = re.compile(
+    r"([0-9]{1,3})\.([0-9]{1,3})\.([0-9]{1,3})\.([0-9]{1,3})/([0-9]{1,2})$"
+)
+# Last address of each IP version
+ADDRESS_SPACE_END = {4: 2 ** 32 - 1, 6: 2 ** 128 - 1}
+
+
+def compile_ingress_rules(allowed_rules):
+    """Compile an allow-list into (protocol, from, to) lookup tables
+
+    A customer rule missing one of the key fields matches any allowed value for
+    it, so one table is built per combination of present fields. Each table maps
+    the present fields (allowed value or "*") to whether any IP is allowed.
+    """
+
+    tables = {}
+    for present in itertools.product((True, False), repeat=len(INGRESS_KEY_FIELDS)):
+        table = {}
+        for allowed_rule in allowed_rules:
+            key = tuple(
+                allowed_rule[field]
+                for field, is_present in zip(INGRESS_KEY_FIELDS, present)
+                if is_present
+            )
+            table[key] = table.get(key, False) or allowed_rule["AllowAnyIp"]
+        tables[present] = table
+    return tables
+
+
+@lru_cache(maxsize=4096)
+def is_any_ip(cidr):
+    """Return True if cidr covers every address, None if it is not a valid network"""
+
+    try:
+        return ipaddress.ip_network(cidr.strip(), False).prefixlen == 0
+    except ValueError:
+        return None
+
+
+@lru_cache(maxsize=4096)
+def cidr_interval(cidr):
+    """(IP version, first address, last address) of cidr as integers, None if invalid"""
+
+    # Plain IPv4 CIDRs, by far the most common, skip the ipaddress objects
+    ipv4 = REGEX_IPV4_CIDR.match(cidr.strip())
+    if ipv4:
+        octets = ipv4.group(1, 2, 3, 4)
+        prefix = int(ipv4.group(5))
+        if prefix <= 32 and all(
+            int(octet) <= 255 and (octet == "0" or octet[0] != "0") for octet in octets
+        ):
+            address = 0
+            for octet in octets:
+                address = address << 8 | int(octet)
+            host_mask = (1 << (32 - prefix)) - 1
+            return 4, address & ~host_mask, address | host_mask
+
+    try:
+        network = ipaddress.ip_network(cidr.strip(), False)
+    except ValueError:
+        return None
+    return network.version, int(network.network_address), int(network.broadcast_address)
+
+
+def covers_address_space(intervals, end):
+    """True if the (first, last) address intervals together cover 0 to end"""
+
+    covered = -1
+    for first, last in sorted(intervals):
+        if first > covered + 1:
+            return False
+        covered = max(covered, last)
+        if covered >= end:
+            return True
+    return False
+
+
+class CoverageTree(object):
+    """Segment tree counting how many intervals cover each address range
+
+    Addresses are compressed to the interval end points, counts are kept in
+    packed integer arrays. Adding or removing an interval and asking whether
+    every address is covered take O(log n).
+    """
+
+    def __init__(self, points):
+        self.points = points
+        self.size = len(points) - 1
+        self.minimum = array("l", [0]) * (4 * self.size)
+        self.pending = array("l", [0]) * (4 * self.size)
+
+    def add(self, first, last, count):
+        """Add count to the addresses first to last"""
+
+        low = bisect_left(self.points, first)
+        high = bisect_left(self.points, last + 1)
+        self.update(1, 0, self.size, low, high, count)
+
+    def update(self, node, node_low, node_high, low, high, count):
+        if high <= node_low or node_high <= low:
+            return
+        if low <= node_low and node_high <= high:
+            self.minimum[node] += count
+            self.pending[node] += count
+            return
+        middle = (node_low + node_high) // 2
+        self.update(2 * node, node_low, middle, low, high, count)
+        self.update(2 * node + 1, middle, node_high, low, high, count)
+        self.minimum[node] = self.pending[node] + min(
+            self.minimum[2 * node], self.minimum[2 * node + 1]
+        )
+
+    def covered(self):
+        """True if every address is covered by at least one interval"""
+
+        return self.minimum[1] > 0
+
+
+def exposed_port_ranges(entries, end):
+    """Port ranges on which entries together cover the address space up to end
+
+    entries are (from port, to port, first address, last address). Ports are
+    swept from boundary to boundary, adding the address intervals of the
+    entries opening and removing those closing; adjacent exposed segments are
+    joined.
+    """
+
+    if not covers_address_space([(first, last) for _, _, first, last in entries], end):
+        return []
+
+    points = sorted(set([0, end + 1] + [e[2] for e in entries] + [e[3] + 1 for e in entries]))
+    tree = CoverageTree(points)
+
+    # Port -> entries opening or closing there
+    changes = {}
+    for entry in entries:
+        changes.setdefault(entry[0], []).append((entry, 1))
+        changes.setdefault(entry[1] + 1, []).append((entry, -1))
+    boundaries = sorted(changes)
+
+    ranges = []
+    for low, high in zip(boundaries, boundaries[1:]):
+        for entry, count in changes[low]:
+            tree.add(entry[2], entry[3], count)
+        if not tree.covered():
+            continue
+        if ranges and ranges[-1][1] == low - 1:
+            ranges[-1] = (ranges[-1][0], high - 1)
+        else:
+            ranges.append((low, high - 1))
+    return ranges
+
+
+def port_range(protocol, from_port, to_port):
+    """Inclusive port range of a rule, every port unless TCP or UDP ports are given"""
+
+    if protocol not in ("6", "17"):
+        return ALL_PORTS
+    try:
+        from_port, to_port = int(from_port), int(to_port)
+    except (TypeError, ValueError):
+        return ALL_PORTS
+    if from_port < 0 or to_port < 0:
+        return ALL_PORTS
+    return from_port, to_port
 
 
 class SecurityGroupIngress(CloudFormationLintRule):
@@ -16,117 +205,317 @@ class SecurityGroupIngress(CloudFormationLintRule):
     )
     source_url = "https://aws.amazon.com/managed-services/features/"
     tags = ["resources", "securitygroup", "ams"]
+    # Resolves every ingress rule and analyses group exposure, run last
+    first_violation_cost = 90
 
     allowed_security_group_ingress_rules = [
-        {"IpProtocol": "tcp", "FromPort": "80", "ToPort": "80", "AllowAnyIp": True},
-        {"IpProtocol": "tcp", "FromPort": "443", "ToPort": "443", "AllowAnyIp": True},
-        {"IpProtocol": "6", "FromPort": "80", "ToPort": "80", "AllowAnyIp": True},
-        {"IpProtocol": "6", "FromPort": "443", "ToPort": "443", "AllowAnyIp": True},
-        {"IpProtocol": "*", "FromPort": "*", "ToPort": "*", "AllowAnyIp": False},
+        dict(rule) for rule in load_policy()["security_group_ingress_rules"]
     ]
 
-    # Stores a tuple of CloudFormation resource name and message
-    messages = []
-
-    def validate_security_groups(self, resources, allowed_security_group_ingress_rules):
-        """Validate security group resources"""
-
-        for resource_name, rblock in resources.items():
-            if "SecurityGroupIngress" in rblock["Properties"]:
-                rproperties = rblock["Properties"]
-                rules = rproperties["SecurityGroupIngress"]
-                # Check if a list of ingress rules has been supplied
-                if isinstance(rules, list):
-                    for rule in rules:
-                        self.validate_security_group_rule(
-                            rule, allowed_security_group_ingress_rules, resource_name
-                        )
-                # Else check if an object is supplied - should contain a single ingress rule
-                elif isinstance(rules, dict):
-                    self.validate_security_group_rule(
-                        rules, allowed_security_group_ingress_rules, resource_name
-                    )
-            elif rblock["Type"] == "AWS::EC2::SecurityGroupIngress":
-                rule = rblock["Properties"]
-                self.validate_security_group_rule(
-                    rule, allowed_security_group_ingress_rules, resource_name
+    ingress_rule_tables = compile_ingress_rules(allowed_security_group_ingress_rules)
+
+    # The allow-list is quoted by every violation, it is rendered once
+    allowed_rules_text = SharedText(allowed_security_group_ingress_rules)
+
+    def __init__(self):
+        CloudFormationLintRule.__init__(self)
+        register(
+            self.id,
+            [
+                ("AWS::EC2::SecurityGroup", "SecurityGroupIngress", self.check_resource),
+                ("AWS::EC2::SecurityGroupIngress", None, self.check_resource),
+            ],
+        )
+
+    def check_resource(self, resource, attribute, visit):
+        """Matches for the ingress rules of the resource violating the allow-list"""
+
+        violations = self.validate_security_groups(
+            [resource], self.allowed_rules_text, visit.resolver
+        )
+        if visit.first:
+            violation = next(violations, None)
+            return [violation] if violation else None
+        return list(violations)
+
+    def validate_security_groups(self, resources, allowed_security_group_ingress_rules, resolver):
+        """Validate security group resources, yielding a Violation per invalid ingress rule"""
+
+        for resource in resources:
+            resource_name = resource.name
+            if "SecurityGroupIngress" in resource.property_keys:
+                rules = self.ingress_rules(resource.properties["SecurityGroupIngress"], resolver)
+            elif resource.type == "AWS::EC2::SecurityGroupIngress":
+                rules = [resource.properties]
+            else:
+                continue
+
+            for rule in rules:
+                violation = self.validate_security_group_rule(
+                    rule, allowed_security_group_ingress_rules, resource_name, resolver
                 )
+                if violation:
+                    yield violation
 
-    def validate_security_group_rule(
-        self, rule, allowed_security_group_ingress_rules, resource_name
-    ):
-        """Validate security group rule"""
-
-        for allowed_rule in allowed_security_group_ingress_rules:
-            if allowed_rule["IpProtocol"] != "*" and (
-                "IpProtocol" in rule and allowed_rule["IpProtocol"] != str(rule["IpProtocol"])
-            ):
-                """
-                If IpProtocol in customer rule does not match with allowed rule"s IpProtocol,
-                it means allowed rule is not matching with customer rule and we don't need to check remain properties in the rule.
-                """
+    def group_exposure(self, resources, resolver):
+        """Yield a Violation per security group whose rules together open ports to any IP"""
+
+        # Group -> (resource to report on, [(rule, (version, first, last))])
+        groups = {}
+        for resource in resources:
+            if resource.type == "AWS::EC2::SecurityGroup":
+                group = resource.name
+                if "SecurityGroupIngress" not in resource.property_keys:
+                    continue
+                rules = self.ingress_rules(resource.properties["SecurityGroupIngress"], resolver)
+            else:
+                group = self.ingress_group(resource.properties)
+                rules = [resource.properties]
+            if group is None:
                 continue
-            if allowed_rule["FromPort"] != "*" and (
-                "FromPort" in rule and allowed_rule["FromPort"] != str(rule["FromPort"])
-            ):
-                """
-                If FromPort in customer rule does not match with allowed rule"s FromPort,
-                it means allowed rule is not matching with customer rule and we don't need to check remain properties in the rule.
-                """
+
+            # Report on the group itself when it is defined in the template
+            if resource.type == "AWS::EC2::SecurityGroup" or group not in groups:
+                groups[group] = (resource.name, groups.get(group, (None, []))[1])
+            sources = groups[group][1]
+            for rule in rules:
+                interval = self.rule_interval(rule, resolver)
+                if interval:
+                    sources.append((rule, interval))
+
+        for group, (resource_name, sources) in groups.items():
+            # Ports and the allow-list only matter when the sources can cover
+            # an address space at all, which most groups fail quickly
+            versions = [
+                (version, end)
+                for version, end in sorted(ADDRESS_SPACE_END.items())
+                if covers_address_space(
+                    [interval[1:] for _, interval in sources if interval[0] == version], end
+                )
+            ]
+            if not versions:
                 continue
-            if allowed_rule["ToPort"] != "*" and (
-                "ToPort" in rule and allowed_rule["ToPort"] != str(rule["ToPort"])
-            ):
-                """
-                If ToPort in customer rule does not match with allowed rule"s ToPort,
-                it means allowed rule is not matching with customer rule and we don't need to check remain properties in the rule.
-                """
+            entries = []
+            for rule, interval in sources:
+                entry = self.exposure_entry(rule, interval, resolver)
+                if entry:
+                    entries.append(entry)
+
+            # Rules for every protocol ("-1") apply to each protocol as well, so
+            # they are looked at first and nothing more is reported when they expose
+            protocols = sorted(set(entry[0] for entry in entries), key=lambda p: (p != "-1", p))
+            for version, end in versions:
+                for protocol in protocols:
+                    ranges = exposed_port_ranges(
+                        [
+                            entry[1:3] + entry[4:]
+                            for entry in entries
+                            if entry[3] == version and entry[0] in (protocol, "-1")
+                        ],
+                        end,
+                    )
+                    for from_port, to_port in ranges:
+                        # noqa: E501
+                        message = "AMS - Ingress rules of SecurityGroup {0} together allow IPv{1} traffic from any IP on protocol {2} ports {3}-{4}, violates allowed rules"
+                        yield Violation(
+                            self.id,
+                            ["Resources", resource_name],
+                            message,
+                            group,
+                            version,
+                            protocol,
+                            from_port,
+                            to_port,
+                            attribute="SecurityGroupIngress",
+                        )
+                    if ranges and protocol == "-1":
+                        break
+
+    def ingress_group(self, properties):
+        """Security group an AWS::EC2::SecurityGroupIngress resource belongs to"""
+
+        group = properties.get("GroupId", properties.get("GroupName"))
+        if isinstance(group, str):
+            return group
+        if isinstance(group, dict) and len(group) == 1:
+            if isinstance(group.get("Ref"), str):
+                return group["Ref"]
+            get_att = group.get("Fn::GetAtt")
+            if isinstance(get_att, list) and get_att and isinstance(get_att[0], str):
+                return get_att[0]
+        return None
+
+    def rule_interval(self, rule, resolver):
+        """(IP version, first, last) of a rule's CIDR when it has one known value
+
+        CIDRs covering every address on their own are left out, rules using
+        them are reported by validate_security_group_rule().
+        """
+
+        if not isinstance(rule, dict):
+            return None
+        field = "CidrIp" if "CidrIp" in rule else "CidrIpv6"
+        cidrs = resolver.values(rule[field]) if field in rule else ()
+        if len(cidrs) != 1 or not isinstance(cidrs[0], str):
+            return None
+        interval = cidr_interval(cidrs[0])
+        if interval is None or interval[1] == 0 and interval[2] == ADDRESS_SPACE_END[interval[0]]:
+            return None
+        return interval
+
+    def exposure_entry(self, rule, interval, resolver):
+        """(protocol, from, to, version, first, last) of a rule for the exposure analysis
+
+        Only rules on ports not allowing any IP count, and only with a single
+        known value for every field.
+        """
+
+        resolved = {}
+        for field in INGRESS_KEY_FIELDS + INGRESS_CIDR_FIELDS:
+            if field in rule:
+                values = resolver.values(rule[field])
+                if len(values) != 1:
+                    return None
+                resolved[field] = values[0]
+
+        if self.lookup_allowed_rule(resolved) is not False:
+            return None
+
+        protocol = str(resolved.get("IpProtocol", "-1")).lower()
+        protocol = PROTOCOL_NUMBERS.get(protocol, protocol)
+        from_port, to_port = port_range(protocol, resolved.get("FromPort"), resolved.get("ToPort"))
+        return (protocol, from_port, to_port) + interval
+
+    def ingress_rules(self, rules, resolver):
+        """Yield the ingress rules of a SecurityGroupIngress property, a list or a single rule"""
+
+        for resolved_rules in resolver.values(rules):
+            if isinstance(resolved_rules, list):
+                for rule in resolved_rules:
+                    for resolved_rule in resolver.values(rule):
+                        yield resolved_rule
+            elif isinstance(resolved_rules, dict):
+                yield resolved_rules
+
+    def lookup_allowed_rule(self, rule):
+        """Return None if no allowed rule matches, else whether any IP is allowed
+
+        A field only known at deployment can hold any value, so it matches "*" alone.
+        """
+
+        present = tuple(field in rule for field in INGRESS_KEY_FIELDS)
+        table = self.ingress_rule_tables[present]
+        values = [
+            ["*"] if rule[field] is UNRESOLVED else [str(rule[field]), "*"]
+            for field in INGRESS_KEY_FIELDS
+            if field in rule
+        ]
+
+        allowed = None
+        for key in itertools.product(*values):
+            allow_any_ip = table.get(key)
+            if allow_any_ip:
+                return True
+            if allow_any_ip is False:
+                allowed = False
+        return allowed
+
+    def validate_security_group_rule(
+        self, rule, allowed_security_group_ingress_rules, resource_name, resolver
+    ):
+        """Validate security group rule, returning a Violation if it is not allowed
+
+        Every combination of the values the rule's fields can be deployed with is
+        checked. A field whose value is only known at deployment only matches
+        allowed rules accepting any value of it, and such a CIDR may be any IP.
+        """
+
+        message = "AMS - Invalid SecurityGroup rule found: {0}, violates allowed rules: {1}"
+        if not isinstance(rule, dict):
+            return Violation(
+                self.id,
+                ["Resources", resource_name],
+                message,
+                rule,
+                allowed_security_group_ingress_rules,
+            )
+
+        key_values = []
+        for field in INGRESS_KEY_FIELDS:
+            values = resolver.candidates(rule[field]) if field in rule else ()
+            if values:
+                key_values.append([(field, value) for value in values])
+        cidrs = [
+            (field, cidr)
+            for field in INGRESS_CIDR_FIELDS
+            if field in rule
+            for cidr in resolver.candidates(rule[field])
+            if cidr is UNRESOLVED or isinstance(cidr, str)
+        ]
+
+        for key in itertools.product(*key_values):
+            allow_any_ip = self.lookup_allowed_rule(dict(key))
+            if allow_any_ip:
                 continue
-            try:
-                if (
-                    allowed_rule["AllowAnyIp"] is False
-                    and "CidrIp" in rule
-                    and ipaddress.ip_network(rule["CidrIp"].strip(), False)
-                    == ipaddress.ip_network("0.0.0.0/0")
-                ):
-                    """
-                    If there is CidrIp in customer rule and it is 0.0.0.0/0 but AllowAnyIp is False,
-                    it means allowed rule is not matching with customer rule.
-                    """
+
+            attribute = None
+            if allow_any_ip is False:
+                # A prefix list or source security group is never "any IP"
+                for field, cidr in cidrs:
+                    if cidr is UNRESOLVED:
+                        attribute = field
+                        break
+                    any_ip = is_any_ip(cidr)
+                    if any_ip is None:
+                        # noqa: E501
+                        cidr_message = "AMS - {0} does not represent a valid IPv4 or IPv6 address. {0} value is: {1}"
+                        return Violation(
+                            self.id,
+                            ["Resources", resource_name],
+                            cidr_message,
+                            field,
+                            cidr.strip(),
+                            attribute=field,
+                        )
+                    if any_ip:
+                        attribute = field
+                        break
+                else:
                     continue
-            except ValueError:
-                self.messages.append(
-                    (
-                        resource_name,
-                        "AMS - CidrIp does not represent a valid IPv4 or IPv6 address. \
-                        CidrIp value is: %s",
-                        rule["CidrIp"].strip(),
-                    )
-                )
-                return
-            return
 
-        self.messages.append(
-            (
-                resource_name,
-                "AMS - Invalid SecurityGroup rule found: {0}, violates allowed rules: {1}".format(
-                    str(rule), allowed_security_group_ingress_rules
-                ),
+            return Violation(
+                self.id,
+                ["Resources", resource_name],
+                message,
+                rule,
+                allowed_security_group_ingress_rules,
+                attribute=attribute,
             )
-        )
+        return None
 
+    @instrument(is_any_ip, cidr_interval)
     def match(self, cfn):
         """Check EC2 Security Group Ingress Resource Parameters - AMS"""
 
-        matches = []
-        resources = cfn.get_resources(
-            resource_type=("AWS::EC2::SecurityGroup", "AWS::EC2::SecurityGroupIngress")
-        )
-        self.validate_security_groups(resources, self.allowed_security_group_ingress_rules)
+        # Violations are kept per invocation so nothing carries over between templates
+        return [violation.to_rule_match() for violation in self.iter_matches(cfn)]
+
+    def iter_matches(self, cfn):
+        """Yield a match per ingress rule violating the allow-list, then per exposed group
 
-        # Convert rule violations to RuleMatch objects
-        for resource_name, message in self.messages:
-            path = ["Resources", resource_name]
-            matches.append(RuleMatch(path, message))
+        A group's ingress rules can be spread over several resources, so the
+        exposure is worked out over every one of them in the template, also
+        when only some resources are evaluated again.
+        """
 
-        return matches
+        for violation in get_matches(cfn, self.id):
+            yield violation
+
+        index = get_resource_index(cfn)
+        if index.partial:
+            return
+        resources = index.template_of_type(
+            "AWS::EC2::SecurityGroup", "AWS::EC2::SecurityGroupIngress"
+        )
+        for violation in self.group_exposure(resources, get_resolver(cfn)):
+            yield violation
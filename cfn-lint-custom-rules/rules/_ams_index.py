@@ -0,0 +1,130 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+"""Shared per-template resource index for the AMS rules
+
+cfn-lint only loads rule files whose name starts with a letter or digit, so
+this helper module is imported by the rules but never registered as a rule.
+"""
+
+import time
+from collections import namedtuple
+
+from _ams_metrics import is_enabled, record
+
+# Attribute set on the cfnlint Template holding the index for that template
+INDEX_ATTRIBUTE = "ams_resource_index"
+
+IndexedResource = namedtuple(
+    "IndexedResource", ["position", "name", "type", "values", "properties", "property_keys"]
+)
+
+
+class ResourceIndex(object):
+    """Resources of a template grouped by type, built in a single pass
+
+    With resource_names only those resources are indexed, so the rules
+    re-evaluate just them; all_types and template_of_type() still cover every
+    resource so checks across the whole template stay correct. partial marks
+    a template holding only some of the resources of its file, checks spanning
+    several resources are then left to a pass over all of them.
+    """
+
+    def __init__(self, template, resource_names=None, partial=False):
+        self.template = template
+        self.partial = partial
+        self.scoped = resource_names is not None
+        # Unscoped index of the template, built on first use by template_of_type()
+        self.whole = None
+        self.resources = []
+        self.by_type = {}
+        self.all_types = set()
+        # Resource names that are missing the Type key
+        self.untyped = []
+
+        resources = template.get("Resources", {}) if isinstance(template, dict) else {}
+        if not isinstance(resources, dict):
+            return
+
+        if resource_names is not None:
+            resource_names = frozenset(resource_names)
+
+        for resource_name, resource_values in resources.items():
+            if not isinstance(resource_values, dict):
+                continue
+
+            resource_type = resource_values.get("Type")
+            if isinstance(resource_type, str):
+                self.all_types.add(resource_type)
+
+            if resource_names is not None and resource_name not in resource_names:
+                continue
+
+            if "Type" not in resource_values:
+                self.untyped.append(resource_name)
+                continue
+
+            properties = resource_values.get("Properties", {})
+            if not isinstance(properties, dict):
+                properties = {}
+
+            resource = IndexedResource(
+                len(self.resources),
+                resource_name,
+                resource_values["Type"],
+                resource_values,
+                properties,
+                frozenset(properties),
+            )
+            self.resources.append(resource)
+            if isinstance(resource.type, str):
+                self.by_type.setdefault(resource.type, []).append(resource)
+
+    @property
+    def types(self):
+        """Distinct resource types in the template"""
+        return self.by_type.keys()
+
+    def of_type(self, *resource_types):
+        """Resources matching any of the given types, in template order"""
+        if len(resource_types) == 1:
+            return self.by_type.get(resource_types[0], [])
+
+        found = []
+        for resource_type in resource_types:
+            found.extend(self.by_type.get(resource_type, []))
+        found.sort(key=lambda resource: resource.position)
+        return found
+
+    def template_of_type(self, *resource_types):
+        """Resources of the template matching any of the given types, even those not indexed"""
+        if not self.scoped:
+            return self.of_type(*resource_types)
+        if self.whole is None:
+            self.whole = ResourceIndex(self.template)
+        return self.whole.of_type(*resource_types)
+
+    def matching(self, resource_types):
+        """Resources whose type is a key of resource_types, in template order"""
+        return self.of_type(*[t for t in resource_types if t in self.by_type])
+
+
+def get_resource_index(cfn):
+    """Return the index for cfn, building it on first use"""
+
+    index = getattr(cfn, INDEX_ATTRIBUTE, None)
+    if index is not None and index.template is cfn.template:
+        record("index", cache_hits=1)
+        return index
+
+    start = time.perf_counter() if is_enabled() else 0
+    index = ResourceIndex(cfn.template)
+    setattr(cfn, INDEX_ATTRIBUTE, index)
+    if is_enabled():
+        record(
+            "index",
+            calls=1,
+            seconds=time.perf_counter() - start,
+            resources=len(index.resources) + len(index.untyped),
+        )
+    return index
@@ -0,0 +1,149 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+"""Opt-in timing and match-count instrumentation for the AMS rules
+
+Instrumentation is off unless enable() is called or the AMS_LINT_METRICS
+environment variable names a file; in that case the metrics are written to the
+file when the process exits, as Prometheus text if it ends in .prom and as JSON
+otherwise. While disabled the instrumented match() wrappers only check a flag.
+"""
+
+import atexit
+import functools
+import json
+import os
+import time
+
+METRICS_ENV = "AMS_LINT_METRICS"
+
+FIELDS = ("calls", "seconds", "resources", "matches", "cache_hits")
+
+PROMETHEUS_HELP = {
+    "calls": ("ams_rule_calls_total", "Number of match() calls"),
+    "seconds": ("ams_rule_seconds_total", "Wall time spent in match()"),
+    "resources": ("ams_rule_resources_visited_total", "Resources visited"),
+    "matches": ("ams_rule_matches_total", "Matches produced"),
+    "cache_hits": ("ams_rule_cache_hits_total", "Hits in the rule's memoization caches"),
+}
+
+# charged: seconds recorded by charge() so far, which the match() that
+# happened to spend them must not count again
+_state = {"enabled": False, "charged": 0.0}
+# Rule id -> {field: value}
+_metrics = {}
+
+
+def enable(enabled=True):
+    """Turn instrumentation on or off for this process"""
+
+    _state["enabled"] = enabled
+
+
+def is_enabled():
+    return _state["enabled"]
+
+
+def record(rule_id, **counts):
+    """Add counts (see FIELDS) to a rule's metrics, when enabled"""
+
+    if not _state["enabled"]:
+        return
+    rule_metrics = _metrics.get(rule_id)
+    if rule_metrics is None:
+        rule_metrics = _metrics[rule_id] = dict.fromkeys(FIELDS, 0)
+    for field, value in counts.items():
+        rule_metrics[field] += value
+
+
+def charge(rule_id, seconds):
+    """Record seconds spent on behalf of a rule while another rule's match() runs
+
+    The shared resource visit runs the callbacks of every rule from whichever
+    rule first asks for its matches; each rule is charged for its own.
+    """
+
+    if not _state["enabled"]:
+        return
+    record(rule_id, seconds=seconds)
+    _state["charged"] += seconds
+
+
+def instrument(*caches):
+    """Decorate a rule's match() to record time, matches and hits in the lru caches"""
+
+    def decorator(match):
+        @functools.wraps(match)
+        def wrapper(self, cfn):
+            if not _state["enabled"]:
+                return match(self, cfn)
+
+            hits = sum(cache.cache_info().hits for cache in caches)
+            charged = _state["charged"]
+            start = time.perf_counter()
+            matches = match(self, cfn)
+            elapsed = time.perf_counter() - start
+            record(
+                self.id,
+                calls=1,
+                seconds=elapsed - (_state["charged"] - charged),
+                matches=len(matches),
+                cache_hits=sum(cache.cache_info().hits for cache in caches) - hits,
+            )
+            return matches
+
+        return wrapper
+
+    return decorator
+
+
+def snapshot():
+    """Copy of the metrics recorded so far"""
+
+    return {rule_id: dict(values) for rule_id, values in _metrics.items()}
+
+
+def drain():
+    """Return the metrics recorded so far and reset them"""
+
+    metrics = snapshot()
+    _metrics.clear()
+    return metrics
+
+
+def merge(metrics):
+    """Add metrics from another process, as returned by drain()"""
+
+    for rule_id, values in metrics.items():
+        record(rule_id, **values)
+
+
+def to_json(metrics=None):
+    return json.dumps(snapshot() if metrics is None else metrics, indent=2, sort_keys=True)
+
+
+def to_prometheus(metrics=None):
+    """Metrics in the Prometheus text exposition format"""
+
+    metrics = snapshot() if metrics is None else metrics
+    lines = []
+    for field in FIELDS:
+        name, help_text = PROMETHEUS_HELP[field]
+        lines.append("# HELP {0} {1}".format(name, help_text))
+        lines.append("# TYPE {0} counter".format(name))
+        for rule_id in sorted(metrics):
+            lines.append('{0}{{rule="{1}"}} {2}'.format(name, rule_id, metrics[rule_id][field]))
+    return "\n".join(lines) + "\n"
+
+
+def write(path, metrics=None):
+    """Write metrics to path, Prometheus text for .prom files and JSON otherwise"""
+
+    text = to_prometheus(metrics) if path.endswith(".prom") else to_json(metrics) + "\n"
+    with open(path, "w") as metrics_file:
+        metrics_file.write(text)
+
+
+if os.environ.get(METRICS_ENV):
+    enable()
+    atexit.register(write, os.environ[METRICS_ENV])
@@ -0,0 +1,229 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+"""AMS policy tables, loaded once from ams_policy.json
+
+The JSON file is the single source of AMS policy data for the rules. On first
+load the normalized tables are marshalled into the user's cache directory, so
+later processes can skip JSON parsing; the marshalled form is only used while
+the digest of the JSON file it was built from still matches. Run this module as
+a script to rebuild the marshalled form explicitly.
+
+Cached lint results record the policy entries their template can depend on,
+with a digest of each (see entry_digests and dependencies), so a policy
+update only invalidates the results of templates touching changed entries.
+Every result depends on the policy version, bumping it invalidates them all.
+"""
+
+import hashlib
+import json
+import marshal
+import os
+import sys
+import tempfile
+from types import MappingProxyType
+
+POLICY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ams_policy.json")
+# Set to use a policy file other than the one shipped with the rules
+POLICY_FILE_ENV = "AMS_POLICY_FILE"
+COMPILED_SUFFIX = ".marshal"
+# Set to keep the marshalled policies in a directory other than the user's cache
+CACHE_DIR_ENV = "AMS_POLICY_CACHE_DIR"
+
+# Tables looked up by membership rather than iterated in order
+SET_TABLES = ("allowed_root_keys",)
+
+# How the rules look entries up: tables of resource types or keyed by resource
+# type, allow-lists also matched by service ("EC2::*" without "AWS::"), and
+# tables used as a whole by every template (None) or by templates with given
+# resource types. Tables not listed here count as used whole by every template.
+TYPE_TABLES = (
+    "manual_verification_resource_types",
+    "required_attributes",
+    "required_attribute_values",
+    "secrets_manager_attributes",
+    "unsupported_attributes",
+)
+SERVICE_TABLES = ("valid_resource_types",)
+WHOLE_TABLES = {
+    "allowed_root_keys": None,
+    "version": None,
+    "security_group_ingress_rules": (
+        "AWS::EC2::SecurityGroup",
+        "AWS::EC2::SecurityGroupIngress",
+    ),
+}
+
+_loaded = {}
+
+
+def normalize(value):
+    """Turn parsed JSON into marshallable, immutable containers (dicts are wrapped later)"""
+
+    if isinstance(value, dict):
+        return {key: normalize(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return tuple(normalize(item) for item in value)
+    return value
+
+
+def freeze(value):
+    """Wrap every dict of a normalized table in a read-only mapping"""
+
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, tuple):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def parse_policy(source):
+    """Normalize the JSON policy document in source (bytes)"""
+
+    policy = normalize(json.loads(source.decode("utf-8")))
+    for table in SET_TABLES:
+        policy[table] = frozenset(policy[table])
+    return policy
+
+
+def compiled_tag(digest):
+    """Identifies a marshalled policy built from a given JSON file by this Python
+
+    The digest covers the whole file, its version included.
+    """
+
+    return "{0}:{1}:{2}".format(digest, marshal.version, sys.version_info[:2])
+
+
+def compiled_path(path):
+    """Where the marshalled form of the policy file at path is kept
+
+    The cache directory is shared by every policy file, the name of each
+    marshalled form includes a digest of the policy file's path.
+    """
+
+    cache_dir = os.environ.get(CACHE_DIR_ENV) or os.path.join(
+        os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+        "amslint",
+    )
+    name = "{0}.{1}{2}".format(
+        os.path.basename(path),
+        hashlib.sha256(os.path.abspath(path).encode("utf-8")).hexdigest()[:16],
+        COMPILED_SUFFIX,
+    )
+    return os.path.join(cache_dir, name)
+
+
+def compile_policy(path, source=None):
+    """Parse path and write its marshalled form, returns the normalized policy"""
+
+    if source is None:
+        with open(path, "rb") as policy_file:
+            source = policy_file.read()
+
+    policy = parse_policy(source)
+    tag = compiled_tag(hashlib.sha256(source).hexdigest())
+    compiled = compiled_path(path)
+    os.makedirs(os.path.dirname(compiled), exist_ok=True)
+    # Write to a temporary file first so readers never see a partial policy
+    handle, temporary = tempfile.mkstemp(dir=os.path.dirname(compiled), suffix=".tmp")
+    try:
+        with os.fdopen(handle, "wb") as compiled_file:
+            marshal.dump((tag, policy), compiled_file)
+        os.replace(temporary, compiled)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+    return policy
+
+
+def read_policy(path):
+    """Normalized policy from the marshalled form when current, else from the JSON file"""
+
+    with open(path, "rb") as policy_file:
+        source = policy_file.read()
+    tag = compiled_tag(hashlib.sha256(source).hexdigest())
+
+    try:
+        with open(compiled_path(path), "rb") as compiled_file:
+            compiled_tag_value, policy = marshal.load(compiled_file)
+        if compiled_tag_value == tag:
+            return policy
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+
+    try:
+        return compile_policy(path, source)
+    except OSError:
+        # The cache directory may be read-only
+        return parse_policy(source)
+
+
+def load_policy(path=None):
+    """Frozen policy tables, loaded once per process and path"""
+
+    path = os.path.abspath(path or os.environ.get(POLICY_FILE_ENV) or POLICY_FILE)
+    if path not in _loaded:
+        _loaded[path] = freeze(read_policy(path))
+    return _loaded[path]
+
+
+def digest(value):
+    """Short digest of a policy value, frozen or normalized"""
+
+    def plain(item):
+        if isinstance(item, (dict, MappingProxyType)):
+            return dict(item)
+        return sorted(item)
+
+    text = json.dumps(value, sort_keys=True, default=plain)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def entry_digests(policy):
+    """Digest of every policy entry, keyed by (table, key) with key None for whole tables"""
+
+    digests = {}
+    for table, value in policy.items():
+        if table in TYPE_TABLES or table in SERVICE_TABLES:
+            if isinstance(value, (dict, MappingProxyType)):
+                for key, item in value.items():
+                    digests[(table, key)] = digest(item)
+            else:
+                # Membership is all that matters for a list of types
+                for key in value:
+                    digests[(table, key)] = "1"
+        else:
+            digests[(table, None)] = digest(value)
+    return digests
+
+
+def dependencies(policy, resource_types):
+    """Sorted (table, key) entries a template with resource_types can depend on
+
+    Entries are listed whether the policy has them or not, as adding an entry
+    changes results just like changing one does.
+    """
+
+    entries = set()
+    for table in policy:
+        if table in TYPE_TABLES or table in SERVICE_TABLES:
+            continue
+        used_by = WHOLE_TABLES.get(table)
+        if used_by is None or any(resource_type in resource_types for resource_type in used_by):
+            entries.add((table, None))
+
+    for resource_type in resource_types:
+        for table in TYPE_TABLES:
+            entries.add((table, resource_type))
+        name = resource_type[len("AWS::"):] if resource_type.startswith("AWS::") else resource_type
+        for table in SERVICE_TABLES:
+            entries.add((table, name))
+            entries.add((table, name.split("::", 1)[0] + "::*"))
+    return sorted(entries, key=lambda entry: (entry[0], entry[1] or ""))
+
+
+if __name__ == "__main__":
+    for policy_path in sys.argv[1:] or [POLICY_FILE]:
+        compile_policy(policy_path)
+        print("Compiled {0} to {1}".format(policy_path, compiled_path(policy_path)))
@@ -0,0 +1,296 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+"""Shared per-template evaluation of intrinsic functions for the AMS rules
+
+Ref, Fn::Sub, Fn::If and Fn::FindInMap are evaluated against the Parameters
+defaults (or allowed values), Mappings and Conditions of the template. A value resolves to a tuple
+of candidates, one per branch a condition cannot decide; candidates that cannot
+be known before deployment are UNRESOLVED. Results are memoized on the
+template, so every rule shares one evaluation of each expression.
+"""
+
+import itertools
+import re
+import time
+
+from _ams_metrics import is_enabled, record
+
+# Attribute set on the cfnlint Template holding the resolver for that template
+RESOLVER_ATTRIBUTE = "ams_resolver"
+
+# Above this many candidates an expression is left unresolved
+MAX_CANDIDATES = 32
+
+REGEX_SUB_VARIABLE = re.compile(r"\$\{([^!}][^}]*)\}")
+
+PSEUDO_PARAMETERS = {
+    "AWS::Partition": "aws",
+    "AWS::URLSuffix": "amazonaws.com",
+}
+
+
+class Unresolved(object):
+    """Marker for values only known at deployment time"""
+
+    def __repr__(self):
+        return "UNRESOLVED"
+
+
+UNRESOLVED = Unresolved()
+# Ref AWS::NoValue, the property is removed
+NO_VALUE = Unresolved()
+
+
+def is_intrinsic(value):
+    return isinstance(value, dict) and len(value) == 1 and next(iter(value)) in FUNCTIONS
+
+
+class Resolver(object):
+    """Evaluates intrinsic functions of one template"""
+
+    def __init__(self, template, region=None):
+        self.template = template
+        self.region = region
+        self.parameters = self.section("Parameters")
+        self.mappings = self.section("Mappings")
+        self.conditions = self.section("Conditions")
+        # id() of an expression -> (expression, candidates), the expression keeps the id alive
+        self.resolved = {}
+        self.evaluated_conditions = {}
+
+    def section(self, name):
+        section = self.template.get(name, {}) if isinstance(self.template, dict) else {}
+        return section if isinstance(section, dict) else {}
+
+    def resolve(self, value):
+        """Candidate values of value, may contain UNRESOLVED and NO_VALUE"""
+
+        if not is_intrinsic(value):
+            return (value,)
+
+        memoized = self.resolved.get(id(value))
+        if memoized is not None:
+            record("resolver", cache_hits=1)
+            return memoized[1]
+
+        function, arguments = next(iter(value.items()))
+        candidates = FUNCTIONS[function](self, arguments)
+        if len(candidates) > MAX_CANDIDATES:
+            candidates = (UNRESOLVED,)
+        self.resolved[id(value)] = (value, candidates)
+        return candidates
+
+    def candidates(self, value):
+        """Candidate values of value that are deployed, may contain UNRESOLVED
+
+        Rules that must not pass an unknown value, e.g. a port or a secret,
+        check these rather than values().
+        """
+
+        if not isinstance(value, dict):
+            return (value,)
+        return tuple(candidate for candidate in self.resolve(value) if candidate is not NO_VALUE)
+
+    def values(self, value):
+        """Candidate values of value that are known before deployment"""
+
+        if not isinstance(value, dict):
+            return (value,)
+        return tuple(
+            candidate
+            for candidate in self.resolve(value)
+            if candidate is not UNRESOLVED and candidate is not NO_VALUE
+        )
+
+    def resolve_all(self, values):
+        """Every combination of the candidates of values, None when unresolved or too many"""
+
+        return self.combine([self.resolve(value) for value in values])
+
+    def combine(self, options):
+        """Product of candidate tuples, None when unresolved or too many"""
+
+        combinations = 1
+        for candidates in options:
+            if UNRESOLVED in candidates or NO_VALUE in candidates:
+                return None
+            combinations *= len(candidates)
+        if combinations > MAX_CANDIDATES:
+            return None
+        return list(itertools.product(*options))
+
+    def ref(self, name):
+        if not isinstance(name, str):
+            return (UNRESOLVED,)
+        if name == "AWS::NoValue":
+            return (NO_VALUE,)
+        if name == "AWS::Region" and self.region:
+            return (self.region,)
+        if name in PSEUDO_PARAMETERS:
+            return (PSEUDO_PARAMETERS[name],)
+
+        parameter = self.parameters.get(name)
+        if not isinstance(parameter, dict):
+            # Resources and the other pseudo parameters
+            return (UNRESOLVED,)
+
+        # Any of the allowed values may be deployed, else assume the default
+        allowed_values = parameter.get("AllowedValues")
+        if isinstance(allowed_values, list) and allowed_values:
+            values = allowed_values
+        elif "Default" in parameter:
+            values = [parameter["Default"]]
+        else:
+            return (UNRESOLVED,)
+        if not all(isinstance(value, (str, int, float, bool)) for value in values):
+            return (UNRESOLVED,)
+        return tuple(str(value) for value in values)
+
+    def sub(self, arguments):
+        if isinstance(arguments, list) and len(arguments) == 2:
+            text, variables = arguments
+        else:
+            text, variables = arguments, {}
+        if not isinstance(text, str) or not isinstance(variables, dict):
+            return (UNRESOLVED,)
+
+        names = []
+        for name in REGEX_SUB_VARIABLE.findall(text):
+            if name not in names:
+                names.append(name)
+
+        options = []
+        for name in names:
+            if name in variables:
+                options.append(self.resolve(variables[name]))
+            elif "." in name:
+                # Fn::GetAtt of a resource
+                return (UNRESOLVED,)
+            else:
+                options.append(self.ref(name))
+
+        combinations = self.combine(options)
+        if combinations is None:
+            return (UNRESOLVED,)
+
+        candidates = []
+        for combination in combinations:
+            substitutions = dict(zip(names, combination))
+            if not all(isinstance(value, str) for value in combination):
+                return (UNRESOLVED,)
+            candidate = REGEX_SUB_VARIABLE.sub(
+                lambda variable: substitutions[variable.group(1)], text
+            ).replace("${!", "${")
+            if candidate not in candidates:
+                candidates.append(candidate)
+        return tuple(candidates)
+
+    def find_in_map(self, arguments):
+        if not isinstance(arguments, list) or len(arguments) != 3:
+            return (UNRESOLVED,)
+
+        combinations = self.resolve_all(arguments)
+        if combinations is None:
+            return (UNRESOLVED,)
+
+        candidates = []
+        for map_name, top_key, second_key in combinations:
+            try:
+                value = self.mappings[map_name][top_key][second_key]
+            except (KeyError, TypeError):
+                return (UNRESOLVED,)
+            for candidate in self.resolve(value):
+                if candidate not in candidates:
+                    candidates.append(candidate)
+        return tuple(candidates)
+
+    def if_(self, arguments):
+        if not isinstance(arguments, list) or len(arguments) != 3:
+            return (UNRESOLVED,)
+
+        condition = self.condition(arguments[0])
+        if condition is True:
+            return self.resolve(arguments[1])
+        if condition is False:
+            return self.resolve(arguments[2])
+
+        candidates = []
+        for candidate in self.resolve(arguments[1]) + self.resolve(arguments[2]):
+            if candidate not in candidates:
+                candidates.append(candidate)
+        return tuple(candidates)
+
+    def condition(self, name):
+        """Value of a named condition for every parameter candidate, None if it varies"""
+
+        if not isinstance(name, str):
+            return None
+        if name in self.evaluated_conditions:
+            return self.evaluated_conditions[name]
+
+        # Guards against conditions referring to each other
+        self.evaluated_conditions[name] = None
+        value = self.evaluate(self.conditions.get(name))
+        self.evaluated_conditions[name] = value
+        return value
+
+    def evaluate(self, expression):
+        """Three-valued evaluation of a condition expression"""
+
+        if not isinstance(expression, dict) or len(expression) != 1:
+            return None
+
+        function, arguments = next(iter(expression.items()))
+        if function == "Condition":
+            return self.condition(arguments)
+        if not isinstance(arguments, list):
+            return None
+
+        if function == "Fn::Equals" and len(arguments) == 2:
+            combinations = self.resolve_all(arguments)
+            if combinations is None:
+                return None
+            outcomes = {str(left) == str(right) for left, right in combinations}
+            return outcomes.pop() if len(outcomes) == 1 else None
+        if function == "Fn::Not" and len(arguments) == 1:
+            value = self.evaluate(arguments[0])
+            return None if value is None else not value
+        if function == "Fn::And":
+            values = [self.evaluate(argument) for argument in arguments]
+            if False in values:
+                return False
+            return None if None in values else True
+        if function == "Fn::Or":
+            values = [self.evaluate(argument) for argument in arguments]
+            if True in values:
+                return True
+            return None if None in values else False
+        return None
+
+
+FUNCTIONS = {
+    "Ref": Resolver.ref,
+    "Fn::Sub": Resolver.sub,
+    "Fn::If": Resolver.if_,
+    "Fn::FindInMap": Resolver.find_in_map,
+    "Fn::GetAtt": lambda resolver, arguments: (UNRESOLVED,),
+    "Fn::ImportValue": lambda resolver, arguments: (UNRESOLVED,),
+    "Fn::GetAZs": lambda resolver, arguments: (UNRESOLVED,),
+}
+
+
+def get_resolver(cfn):
+    """Return the resolver for cfn, building it on first use"""
+
+    resolver = getattr(cfn, RESOLVER_ATTRIBUTE, None)
+    if resolver is not None and resolver.template is cfn.template:
+        return resolver
+
+    start = time.perf_counter() if is_enabled() else 0
+    regions = getattr(cfn, "regions", None)
+    resolver = Resolver(cfn.template, regions[0] if regions else None)
+    setattr(cfn, RESOLVER_ATTRIBUTE, resolver)
+    if is_enabled():
+        record("resolver", calls=1, seconds=time.perf_counter() - start)
+    return resolver
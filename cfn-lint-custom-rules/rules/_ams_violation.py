@@ -0,0 +1,72 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+"""Compact violation records for the AMS rules
+
+A Violation keeps the rule id, the path as a tuple and the message format
+with references to its arguments; the message is only formatted when it is
+read. Arguments shared by many violations, such as an allow-list, are wrapped
+in SharedText so they are turned into text once per process. cfn-lint copies
+the attributes of what match() returns, so match() converts violations with
+to_rule_match().
+"""
+
+from cfnlint.rules import RuleMatch
+
+
+class SharedText(object):
+    """A value rendered with str() on first use, then reused"""
+
+    __slots__ = ("value", "text")
+
+    def __init__(self, value):
+        self.value = value
+        self.text = None
+
+    def __str__(self):
+        if self.text is None:
+            self.text = str(self.value)
+        return self.text
+
+
+class Violation(object):
+    """A rule match whose message is formatted when it is first read"""
+
+    __slots__ = ("rule_id", "path", "message_format", "arguments", "attribute", "_message")
+
+    # cfn-lint looks for sub-matches here, AMS rules have none
+    context = ()
+
+    def __init__(self, rule_id, path, message_format, *arguments, attribute=None):
+        self.rule_id = rule_id
+        self.path = tuple(path)
+        self.message_format = message_format
+        self.arguments = arguments
+        self.attribute = attribute
+        self._message = None
+
+    @property
+    def message(self):
+        if self._message is None:
+            self._message = self.message_format.format(*self.arguments)
+        return self._message
+
+    @property
+    def path_string(self):
+        return "/".join(map(str, self.path))
+
+    def __eq__(self, other):
+        return (list(self.path), self.message) == (list(other.path), other.message)
+
+    def __hash__(self):
+        return hash((self.path, self.message))
+
+    def __repr__(self):
+        return "Violation({0}, {1}, {2!r})".format(self.rule_id, self.path_string, self.message)
+
+    def to_rule_match(self):
+        """The cfn-lint RuleMatch of this violation"""
+
+        if self.attribute is None:
+            return RuleMatch(list(self.path), self.message)
+        return RuleMatch(list(self.path), self.message, attribute=self.attribute)
@@ -0,0 +1,183 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+"""Shared single pass over the resources of a template for the AMS rules
+
+Rules register callbacks per resource type, and optionally per property,
+instead of each looping over the resources. The resources of a template are
+then dispatched once through a type -> handlers table and the matches kept per
+rule id, so a rule costs nothing on templates without resources of its types.
+The pass is lazy: it advances one resource at a time as rules read their
+matches, so the rule reading first gets its matches while the template is
+still being visited, and later rules read what was kept for them. When only
+the first violation matters, the pass stops at the first one found.
+"""
+
+import time
+
+from _ams_index import get_resource_index
+from _ams_metrics import charge, is_enabled, record
+from _ams_resolve import get_resolver
+
+# Attribute set on the cfnlint Template holding the visit of that template
+VISIT_ATTRIBUTE = "ams_visit"
+# Attribute set (to True) on the cfnlint Template when its first violation is enough
+FIRST_VIOLATION_ATTRIBUTE = "ams_first_violation"
+
+# Rule id -> [(resource type, property or None, callback)]
+_handlers = {}
+# Resource type -> [(rule id, ((property or None, callback), ...))], built from _handlers
+_table = {}
+
+
+def register(rule_id, handlers):
+    """Set the handlers of a rule, replacing those of any earlier instance
+
+    handlers are (resource type, property, callback) tuples. The callback is
+    called as callback(resource, property, visit) for every resource of the
+    type having the property, or for every resource of the type when property
+    is None, and returns a list of Violation, or None when there is nothing to
+    report.
+    """
+
+    _handlers[rule_id] = list(handlers)
+    _table.clear()
+    for registered_id in sorted(_handlers):
+        callbacks = {}
+        for resource_type, attribute, callback in _handlers[registered_id]:
+            callbacks.setdefault(resource_type, []).append((attribute, callback))
+        for resource_type, type_callbacks in callbacks.items():
+            _table.setdefault(resource_type, []).append((registered_id, tuple(type_callbacks)))
+
+
+class Visit(object):
+    """Matches of the registered rules on one template, found in a single lazy pass
+
+    With rule_ids only the handlers of those rules run, e.g. to measure one rule.
+    """
+
+    def __init__(self, cfn, rule_ids=None):
+        self.cfn = cfn
+        self.template = cfn.template
+        self.index = get_resource_index(cfn)
+        # Callbacks may stop at their first violation too
+        self.first = getattr(cfn, FIRST_VIOLATION_ATTRIBUTE, False)
+        self.rule_ids = None if rule_ids is None else frozenset(rule_ids)
+        # Rule id -> matches found so far, in template order
+        self.matches = {rule_id: [] for rule_id in _handlers}
+        # Rule id -> exception raised by one of its callbacks
+        self.errors = {}
+        self.done = False
+        self._resolver = None
+        self._resources = iter(self.index.resources)
+
+    @property
+    def resolver(self):
+        """Resolver of the template, built when a callback first needs it"""
+
+        if self._resolver is None:
+            self._resolver = get_resolver(self.cfn)
+        return self._resolver
+
+    def step(self):
+        """Run the handlers over the next resource having any, done when none is left"""
+
+        for resource in self._resources:
+            rules = _table.get(resource.type) if isinstance(resource.type, str) else None
+            if rules is not None:
+                self.dispatch(resource, rules)
+                return
+        self.done = True
+
+    def complete(self):
+        """Visit every resource left"""
+
+        while not self.done:
+            self.step()
+
+    def dispatch(self, resource, rules):
+        """Run the handlers of rules over one resource
+
+        Each rule is charged for the time of its own callbacks, and the visit
+        for the rest, whichever rule's match() is reading matches.
+        """
+
+        measured = is_enabled()
+        start = time.perf_counter() if measured else 0
+        callbacks_seconds = 0
+        property_keys = resource.property_keys
+        stop = False
+
+        for rule_id, callbacks in rules:
+            if rule_id in self.errors or self.rule_ids is not None and rule_id not in self.rule_ids:
+                continue
+            rule_start = time.perf_counter() if measured else 0
+            try:
+                for attribute, callback in callbacks:
+                    if attribute is None or attribute in property_keys:
+                        found = callback(resource, attribute, self)
+                        if found:
+                            self.matches[rule_id].extend(found)
+                            stop = self.first
+            except Exception as err:  # pylint: disable=broad-except
+                # Only the failing rule is affected, it raises once its matches are read
+                self.errors[rule_id] = err
+                stop = self.first
+            if measured:
+                seconds = time.perf_counter() - rule_start
+                callbacks_seconds += seconds
+                record(rule_id, resources=1)
+                charge(rule_id, seconds)
+            if stop:
+                self.done = True
+                break
+
+        if measured:
+            charge("visitor", time.perf_counter() - start - callbacks_seconds)
+
+    def iter_matches(self, rule_id):
+        """Yield the matches of a rule, visiting resources as they are needed
+
+        Raises what the rule's callbacks raised after the matches found before.
+        """
+
+        matches = self.matches.get(rule_id, [])
+        position = 0
+        while True:
+            while position < len(matches):
+                yield matches[position]
+                position += 1
+            if rule_id in self.errors:
+                raise self.errors[rule_id]
+            if self.done:
+                return
+            self.step()
+
+    def get(self, rule_id):
+        """All matches of a rule, raises what its callbacks raised"""
+
+        return list(self.iter_matches(rule_id))
+
+
+def get_visit(cfn):
+    """Return the visit of cfn, started on first use"""
+
+    visit = getattr(cfn, VISIT_ATTRIBUTE, None)
+    if visit is not None and visit.template is cfn.template:
+        record("visitor", cache_hits=1)
+        return visit
+
+    visit = Visit(cfn)
+    setattr(cfn, VISIT_ATTRIBUTE, visit)
+    record("visitor", calls=1)
+    return visit
+
+
+def get_matches(cfn, rule_id):
+    """Iterator over the matches of a rule on cfn, from the shared visit
+
+    Matches are yielded as the visit finds them, so rules returning this from
+    iter_matches() produce their matches lazily.
+    """
+
+    return get_visit(cfn).iter_matches(rule_id)
@@ -0,0 +1,28 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from amslint.rules import lint_file, load_rules  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def rules():
+    return load_rules()
+
+
+@pytest.fixture
+def lint(rules):
+    """Records of the AMS rules for a template's text"""
+
+    def lint(content, filename="template.yaml"):
+        return lint_file(rules, filename, content=content)
+
+    return lint
@@ -0,0 +1,67 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+"""Aggregates of fleet shards add up to the aggregate of the whole fleet"""
+
+import io
+import json
+
+from amslint import aggregate
+
+
+def record(rule, resource_type="AWS::S3::Bucket", attribute=None):
+    return {"rule": rule, "resource_type": resource_type, "attribute": attribute}
+
+
+SHARDS = [
+    [
+        [record("E3094", "AWS::SecretsManager::Secret", "SecretString")] * 2,
+        [record("E3001"), record("E3094", "AWS::SecretsManager::Secret", "SecretString")],
+        [],
+    ],
+    [
+        [record("E3001")],
+        [record("E2599", "AWS::EC2::SecurityGroup", "SecurityGroupIngress")],
+    ],
+]
+
+
+def aggregate_of(templates):
+    result = aggregate.Aggregate()
+    for records in templates:
+        result.add_template(records)
+    return result
+
+
+def test_merged_shards_match_the_whole_fleet():
+    merged = aggregate.Aggregate()
+    for shard in SHARDS:
+        merged.merge(aggregate.Aggregate.from_dict(aggregate_of(shard).to_dict()))
+
+    whole = aggregate_of(SHARDS[0] + SHARDS[1])
+    assert (merged.templates, merged.failing) == (whole.templates, whole.failing) == (5, 4)
+    assert merged.entries() == whole.entries()
+    assert merged.entries()[:2] == [
+        ("E3094", "AWS::SecretsManager::Secret", "SecretString", 3, 2),
+        ("E3001", "AWS::S3::Bucket", None, 2, 2),
+    ]
+
+
+def test_report_merges_summary_files(tmp_path):
+    summaries = []
+    for number, shard in enumerate(SHARDS):
+        path = tmp_path / "shard-{0}.json".format(number)
+        path.write_text(json.dumps(aggregate_of(shard).to_dict()))
+        summaries.append(str(path))
+
+    out = io.StringIO()
+    assert aggregate.run(summaries, "summary-json", out) == 2
+    merged = aggregate.Aggregate.from_dict(json.loads(out.getvalue()))
+    assert merged.entries() == aggregate_of(SHARDS[0] + SHARDS[1]).entries()
+
+    out = io.StringIO()
+    aggregate.run(summaries, "summary", out, top=1)
+    lines = out.getvalue().splitlines()
+    assert lines[0] == "Templates: 5, with violations: 4, violations: 6"
+    assert lines[3].split() == ["E3094", "AWS::SecretsManager::Secret", "SecretString", "3", "2"]
+    assert lines[-1] == "... 2 more"
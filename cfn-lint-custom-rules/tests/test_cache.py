@@ -0,0 +1,75 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+"""Policy updates only invalidate the cached results they can affect"""
+
+import json
+import os
+
+from amslint import batch
+from amslint.cache import ResultCache
+from amslint.rules import import_rules_module
+
+policy_module = import_rules_module("_ams_policy")
+lint_uncached = batch.lint_uncached
+
+TEMPLATES = {
+    "db.yaml": "AWS::RDS::DBInstance",
+    "cluster.yaml": "AWS::RDS::DBCluster",
+    "bucket.yaml": "AWS::S3::Bucket",
+}
+
+
+def write_templates(directory):
+    paths = []
+    for name, resource_type in sorted(TEMPLATES.items()):
+        path = directory / name
+        path.write_text("Resources:\n  Resource:\n    Type: {0}\n".format(resource_type))
+        paths.append(str(path))
+    return paths
+
+
+def relinted(templates, cache_dir, policy_path, monkeypatch):
+    """Names of the templates linted again under the policy at policy_path"""
+
+    monkeypatch.setenv(policy_module.POLICY_FILE_ENV, policy_path)
+    linted = []
+
+    def spy(misses, *args, **kwargs):
+        linted.extend(os.path.basename(filename) for filename in misses)
+        return lint_uncached(misses, *args, **kwargs)
+
+    monkeypatch.setattr(batch, "lint_uncached", spy)
+    cache = ResultCache(cache_dir)
+    for _ in batch.lint_templates(templates, workers=1, cache=cache):
+        pass
+    return sorted(linted)
+
+
+def test_policy_update_relints_affected_templates(tmp_path, monkeypatch):
+    monkeypatch.setenv(policy_module.CACHE_DIR_ENV, str(tmp_path / "compiled"))
+    with open(policy_module.POLICY_FILE) as policy_file:
+        policy = json.load(policy_file)
+    templates = write_templates(tmp_path)
+    cache_dir = str(tmp_path / "results")
+
+    def write_policy(name):
+        path = tmp_path / name
+        path.write_text(json.dumps(policy))
+        return str(path)
+
+    assert relinted(templates, cache_dir, write_policy("original.json"), monkeypatch) == sorted(
+        TEMPLATES
+    )
+    assert relinted(templates, cache_dir, write_policy("original.json"), monkeypatch) == []
+
+    policy["secrets_manager_attributes"]["AWS::RDS::DBInstance"].append("Password")
+    assert relinted(templates, cache_dir, write_policy("secrets.json"), monkeypatch) == [
+        "db.yaml"
+    ]
+    assert relinted(templates, cache_dir, write_policy("again.json"), monkeypatch) == []
+
+    policy["version"] = str(int(policy["version"]) + 1)
+    assert relinted(templates, cache_dir, write_policy("version.json"), monkeypatch) == sorted(
+        TEMPLATES
+    )
@@ -0,0 +1,20 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+"""With --fail-fast the cheapest rules run first"""
+
+from cfnlint.rules import CloudFormationLintRule
+
+from amslint.rules import first_violation_order
+
+
+class NewRule(CloudFormationLintRule):
+    id = "E1000"
+
+
+def test_rules_without_a_cost_run_among_the_property_checks(rules):
+    order = [rule.id for rule in first_violation_order(rules + [NewRule()])]
+
+    assert order[:2] == ["E1099", "E3095"]
+    assert order[-1] == "E2599"
+    assert order.index("E1000") == 2
@@ -0,0 +1,134 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+"""Security group exposure from merged CIDR ranges, across resources in streaming and relint"""
+
+import yaml
+
+from amslint import streaming
+from amslint.incremental import changed_resources, relint
+from amslint.rules import decode_template, import_rules_module, lint_file
+from amslint.streaming import iter_stream_file
+
+ingress_module = import_rules_module("AMSSecurityGroupIngress")
+
+IPV4_END = ingress_module.ADDRESS_SPACE_END[4]
+IPV6_END = ingress_module.ADDRESS_SPACE_END[6]
+
+GROUP = """
+AWSTemplateFormatVersion: "2010-09-09"
+Resources:
+  SG:
+    Type: AWS::EC2::SecurityGroup
+    Properties:
+      GroupDescription: sg
+  Bucket:
+    Type: AWS::S3::Bucket
+"""
+
+INGRESS = """
+  {0}:
+    Type: AWS::EC2::SecurityGroupIngress
+    Properties:
+      GroupId: !Ref SG
+      IpProtocol: tcp
+      FromPort: 22
+      ToPort: 22
+      CidrIp: {1}
+"""
+
+LOWER_HALF = INGRESS.format("LowerHalf", "0.0.0.0/1")
+UPPER_HALF = INGRESS.format("UpperHalf", "128.0.0.0/1")
+
+
+def ordered(records):
+    return sorted(records, key=lambda record: (record["rule"], record["line"], record["message"]))
+
+
+def exposures(records):
+    return [record for record in records if record["attribute"] == "SecurityGroupIngress"]
+
+
+def test_stream_reports_split_exposure(rules, tmp_path):
+    template = tmp_path / "template.yaml"
+    template.write_text(GROUP + LOWER_HALF + UPPER_HALF)
+
+    full = lint_file(rules, str(template))
+    assert len(exposures(full)) == 1
+    assert ordered(iter_stream_file(rules, str(template))) == ordered(full)
+
+
+def test_stream_lints_json_the_yaml_parser_rejects_whole(rules, tmp_path, monkeypatch):
+    template = tmp_path / "template.json"
+    template.write_text(
+        '{"Resources": {"Secret": {"Type": "AWS::SecretsManager::Secret",'
+        ' "Properties": {"SecretString": "plain"}}}}'
+    )
+
+    def read_sections(filename):
+        # As for JSON indented with tabs, which cfn-lint reads with its JSON decoder
+        raise yaml.scanner.ScannerError(problem="found character '\\t' that cannot start any token")
+
+    monkeypatch.setattr(streaming, "read_sections", read_sections)
+    full = lint_file(rules, str(template))
+    assert [record["rule"] for record in full] == ["E3094"]
+    assert list(streaming.iter_stream_file(rules, str(template))) == full
+
+
+def test_relint_adds_and_drops_exposure(rules):
+    previous_content = GROUP + LOWER_HALF
+    previous_template, _ = decode_template("template.yaml", previous_content)
+    previous = lint_file(rules, "template.yaml", content=previous_content)
+    assert exposures(previous) == []
+
+    for content in (GROUP + LOWER_HALF + UPPER_HALF, GROUP + UPPER_HALF):
+        template, _ = decode_template("template.yaml", content)
+        changed = changed_resources(previous_template, template)
+        records = relint(rules, "template.yaml", template, previous, changed)
+        assert ordered(records) == ordered(lint_file(rules, "template.yaml", content=content))
+
+        previous_template, previous = template, records
+    assert exposures(previous) == []
+
+
+def entry(from_port, to_port, cidr):
+    _, first, last = ingress_module.cidr_interval(cidr)
+    return from_port, to_port, first, last
+
+
+def test_coverage_tree_counts_overlapping_intervals():
+    tree = ingress_module.CoverageTree([0, 10, 20, 30])
+    tree.add(0, 19, 1)
+    tree.add(10, 29, 1)
+    assert tree.covered()
+
+    tree.add(0, 19, -1)
+    assert not tree.covered()
+    tree.add(0, 9, 1)
+    assert tree.covered()
+
+
+def test_halves_cover_only_their_shared_ports():
+    entries = [entry(20, 25, "0.0.0.0/1"), entry(22, 30, "128.0.0.0/1")]
+    assert ingress_module.exposed_port_ranges(entries, IPV4_END) == [(22, 25)]
+
+
+def test_partial_overlap_leaves_a_gap():
+    entries = [entry(22, 22, "0.0.0.0/2"), entry(22, 22, "128.0.0.0/1")]
+    assert ingress_module.exposed_port_ranges(entries, IPV4_END) == []
+
+
+def test_ipv6_halves_cover_the_address_space():
+    entries = [entry(0, 100, "::/1"), entry(0, 100, "8000::/1")]
+    assert ingress_module.exposed_port_ranges(entries, IPV6_END) == [(0, 100)]
+    assert ingress_module.exposed_port_ranges(entries[:1], IPV6_END) == []
+
+
+def test_adjacent_exposed_port_ranges_are_merged():
+    entries = [
+        entry(10, 19, "0.0.0.0/0"),
+        entry(20, 29, "0.0.0.0/1"),
+        entry(20, 29, "128.0.0.0/1"),
+        entry(31, 40, "0.0.0.0/0"),
+    ]
+    assert ingress_module.exposed_port_ranges(entries, IPV4_END) == [(10, 29), (31, 40)]
@@ -0,0 +1,69 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+"""Relint gives the records of a full lint of the new template"""
+
+from amslint.incremental import changed_resources, relint
+from amslint.rules import decode_template, lint_file
+
+TEMPLATE = """
+AWSTemplateFormatVersion: "2010-09-09"
+Parameters:
+  Port:
+    Type: Number
+    Default: {0}
+Resources:
+{1}
+  Secret:
+    Type: AWS::SecretsManager::Secret
+    Properties:
+      SecretString: plain
+  SG:
+    Type: AWS::EC2::SecurityGroup
+    Properties:
+      GroupDescription: sg
+      SecurityGroupIngress:
+        - IpProtocol: tcp
+          FromPort: !Ref Port
+          ToPort: !Ref Port
+          CidrIp: 0.0.0.0/0
+"""
+
+BUCKET = """
+  Bucket:
+    Type: AWS::S3::Bucket
+    Properties:
+      BucketName: bucket
+"""
+
+
+def relinted(rules, previous_content, content):
+    previous_template, _ = decode_template("template.yaml", previous_content)
+    previous = lint_file(rules, "template.yaml", content=previous_content)
+    template, _ = decode_template("template.yaml", content)
+    changed = changed_resources(previous_template, template)
+    return changed, relint(rules, "template.yaml", template, previous, changed)
+
+
+def locations(records):
+    return sorted((record["rule"], record["line"], record["column"]) for record in records)
+
+
+def test_kept_records_follow_their_resource(rules):
+    content = TEMPLATE.format(443, BUCKET)
+    changed, records = relinted(rules, TEMPLATE.format(443, ""), content)
+
+    assert changed == {"Bucket"}
+    full = lint_file(rules, "template.yaml", content=content)
+    assert [record["rule"] for record in full] == ["E3094"]
+    assert locations(records) == locations(full)
+
+
+def test_parameter_change_relints_every_resource(rules):
+    content = TEMPLATE.format(22, "")
+    changed, records = relinted(rules, TEMPLATE.format(443, ""), content)
+
+    assert changed == {"Secret", "SG"}
+    full = lint_file(rules, "template.yaml", content=content)
+    assert "E2599" in [record["rule"] for record in full]
+    assert locations(records) == locations(full)
@@ -0,0 +1,72 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+"""Compiling the policy file and the entries cached results depend on"""
+
+import json
+import marshal
+
+import pytest
+
+from amslint.rules import import_rules_module
+
+policy_module = import_rules_module("_ams_policy")
+
+POLICY = {
+    "version": "1",
+    "allowed_root_keys": ["Resources"],
+    "valid_resource_types": ["S3::Bucket"],
+}
+
+
+def write_policy(directory, **changes):
+    path = directory / "ams_policy.json"
+    path.write_text(json.dumps(dict(POLICY, **changes)))
+    return str(path)
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    directory = tmp_path / "cache"
+    monkeypatch.setenv(policy_module.CACHE_DIR_ENV, str(directory))
+    return directory
+
+
+def test_compiled_policy_is_replaced_whole(tmp_path, cache_dir):
+    path = write_policy(tmp_path)
+    policy = policy_module.compile_policy(path)
+
+    assert sorted(entry.name for entry in tmp_path.iterdir()) == ["ams_policy.json", "cache"]
+    assert [entry.name for entry in cache_dir.iterdir()] == [
+        "ams_policy.json.{0}.marshal".format(
+            policy_module.hashlib.sha256(path.encode("utf-8")).hexdigest()[:16]
+        )
+    ]
+    assert policy_module.read_policy(path) == policy
+
+    path = write_policy(tmp_path, version="2")
+    assert policy_module.read_policy(path)["version"] == "2"
+
+
+def test_failed_compile_leaves_no_temporary_file(tmp_path, cache_dir, monkeypatch):
+    def dump(value, compiled_file):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(marshal, "dump", dump)
+    path = write_policy(tmp_path)
+
+    assert policy_module.read_policy(path)["version"] == "1"
+    assert list(cache_dir.iterdir()) == []
+
+
+def test_every_template_depends_on_the_version(tmp_path, cache_dir):
+    policy = policy_module.read_policy(write_policy(tmp_path))
+    bumped = policy_module.read_policy(write_policy(tmp_path, version="2"))
+
+    assert ("version", None) in policy_module.dependencies(policy, set())
+    digests = policy_module.entry_digests(policy)
+    bumped_digests = policy_module.entry_digests(bumped)
+    assert digests[("version", None)] != bumped_digests[("version", None)]
+    assert digests[("valid_resource_types", "S3::Bucket")] == bumped_digests[
+        ("valid_resource_types", "S3::Bucket")
+    ]
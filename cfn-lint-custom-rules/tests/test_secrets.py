@@ -0,0 +1,29 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+"""Secret attributes nested in lists of maps must be dynamic references"""
+
+BROKER = """
+Resources:
+  Broker:
+    Type: AWS::AmazonMQ::Broker
+    Properties:
+      Users:
+        - Username: admin
+          Password: "{{{{resolve:secretsmanager:mq-admin:SecretString:password}}}}"
+        - Username: app
+          Password: {0}
+"""
+
+
+def test_plain_password_in_list_item_is_reported(lint):
+    records = lint(BROKER.format("plain-text"))
+    assert [(record["rule"], record["path"]) for record in records] == [
+        ("E3096", ["Resources", "Broker", "Users", 1, "Password"])
+    ]
+    assert records[0]["attribute"] == "Users.*.Password"
+
+
+def test_referenced_passwords_in_list_items_pass(lint):
+    reference = '"{{resolve:ssm-secure:/mq/app:3}}"'
+    assert lint(BROKER.format(reference)) == []
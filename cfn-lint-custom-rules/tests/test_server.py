@@ -0,0 +1,63 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+"""Requests to the resident lint server"""
+
+import http.client
+import json
+import threading
+
+import pytest
+
+from amslint.server import Linter, make_server
+
+TEMPLATE = b"""
+Resources:
+  Bucket:
+    Type: AWS::S3::Bucket
+"""
+
+
+@pytest.fixture(scope="module")
+def server():
+    server = make_server(Linter(), port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def connection(server):
+    connection = http.client.HTTPConnection(*server.server_address, timeout=30)
+    yield connection
+    connection.close()
+
+
+def post(connection, body, content_length):
+    connection.putrequest("POST", "/lint?filename=template.yaml")
+    connection.putheader("Content-Length", content_length)
+    connection.endheaders(body)
+    response = connection.getresponse()
+    return response.status, response.getheader("Connection"), json.loads(response.read())
+
+
+@pytest.mark.parametrize("content_length", ["abc", "-5", "1.5"])
+def test_invalid_content_length_is_rejected(connection, content_length):
+    status, connection_header, body = post(connection, TEMPLATE, content_length)
+    assert status == 400
+    assert connection_header == "close"
+    assert body == {"error": "invalid Content-Length"}
+
+
+def test_connection_is_kept_alive(connection):
+    sockets = []
+    for _ in range(2):
+        status, connection_header, body = post(connection, TEMPLATE, str(len(TEMPLATE)))
+        assert status == 200
+        assert connection_header is None
+        assert body == []
+        sockets.append(connection.sock)
+    assert sockets[0] is not None
+    assert sockets[1] is sockets[0]
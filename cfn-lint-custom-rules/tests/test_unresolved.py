@@ -0,0 +1,87 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+"""Values only known at deployment must not pass the AMS checks"""
+
+TEMPLATE = """
+AWSTemplateFormatVersion: "2010-09-09"
+Parameters:
+  DBPassword:
+    Type: String
+    NoEcho: true
+  Port:
+    Type: Number
+  Cidr:
+    Type: String
+  Env:
+    Type: String
+Resources:
+{0}
+"""
+
+DB_INSTANCE = """
+  DB:
+    Type: AWS::RDS::DBInstance
+    Properties:
+      Engine: mysql
+      MasterUsername: admin
+      MasterUserPassword: {0}
+"""
+
+INGRESS = """
+  SG:
+    Type: AWS::EC2::SecurityGroup
+    Properties:
+      GroupDescription: sg
+      SecurityGroupIngress:
+        - IpProtocol: tcp
+          FromPort: {0}
+          ToPort: {0}
+          CidrIp: {1}
+"""
+
+
+def rule_ids(records):
+    return sorted(record["rule"] for record in records)
+
+
+def test_noecho_parameter_password_is_reported(lint):
+    records = lint(TEMPLATE.format(DB_INSTANCE.format("!Ref DBPassword")))
+    assert rule_ids(records) == ["E3096"]
+    assert records[0]["path"] == ["Resources", "DB", "MasterUserPassword"]
+
+
+def test_sub_dynamic_reference_password_passes(lint):
+    reference = (
+        '!Sub "{{resolve:secretsmanager:arn:${AWS::Partition}:secretsmanager:'
+        '${AWS::Region}:${AWS::AccountId}:secret:${Env}-db:SecretString:password}}"'
+    )
+    assert lint(TEMPLATE.format(DB_INSTANCE.format(reference))) == []
+
+
+def test_sub_not_a_dynamic_reference_is_reported(lint):
+    records = lint(TEMPLATE.format(DB_INSTANCE.format('!Sub "${Env}-password"')))
+    assert rule_ids(records) == ["E3096"]
+
+
+def test_unresolved_port_open_to_any_ip_is_reported(lint):
+    records = lint(TEMPLATE.format(INGRESS.format("!Ref Port", "0.0.0.0/0")))
+    assert rule_ids(records) == ["E2599"]
+
+
+def test_unresolved_port_on_private_range_passes(lint):
+    assert lint(TEMPLATE.format(INGRESS.format("!Ref Port", "10.0.0.0/8"))) == []
+
+
+def test_allowed_port_open_to_any_ip_passes(lint):
+    assert lint(TEMPLATE.format(INGRESS.format("443", "0.0.0.0/0"))) == []
+
+
+def test_unresolved_cidr_is_treated_as_any_ip(lint):
+    records = lint(TEMPLATE.format(INGRESS.format("22", "!Ref Cidr")))
+    assert rule_ids(records) == ["E2599"]
+    assert records[0]["attribute"] == "CidrIp"
+
+
+def test_unresolved_cidr_on_port_allowed_from_any_ip_passes(lint):
+    assert lint(TEMPLATE.format(INGRESS.format("443", "!Ref Cidr"))) == []
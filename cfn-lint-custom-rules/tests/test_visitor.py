@@ -0,0 +1,39 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+"""The shared resource visit yields matches while resources are left to visit"""
+
+from cfnlint.decode import decode_str
+from cfnlint.template import Template
+
+from amslint.rules import import_rules_module
+
+DB_INSTANCE = """
+  DB{0}:
+    Type: AWS::RDS::DBInstance
+    Properties:
+      Engine: mysql
+      MasterUsername: admin
+      MasterUserPassword: plain
+"""
+
+
+def template(resources):
+    content = "Resources:\n" + "".join(DB_INSTANCE.format(n) for n in range(resources))
+    return Template("template.yaml", decode_str(content)[0], ["us-east-1"])
+
+
+def test_matches_come_out_before_the_visit_ends(rules):
+    visitor = import_rules_module("_ams_visitor")
+    cfn = template(3)
+
+    matches = visitor.get_matches(cfn, "E3096")
+    first = next(matches)
+    visit = getattr(cfn, visitor.VISIT_ATTRIBUTE)
+    assert list(first.path[:2]) == ["Resources", "DB0"]
+    assert not visit.done
+
+    assert [match.path[1] for match in matches] == ["DB1", "DB2"]
+    assert visit.done
+    # Kept for the next rule reading them, and for a second read
+    assert [match.path[1] for match in visit.get("E3096")] == ["DB0", "DB1", "DB2"]